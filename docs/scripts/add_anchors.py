@@ -1,104 +1,177 @@
+import sys
+import argparse
 import logging
 from pathlib import Path
 import re
-from typing import Dict, List, Tuple
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+from .batch import ChangeManifest, add_batch_arguments, apply_batch, rewrite_file
+from .cache import DocCache, add_cache_arguments, open_cache
+from .config import add_path_arguments, configure_logging, resolve_paths
+from .anchors import header_ids
+from .instrument import add_instrument_arguments, session
+from .patch import Edit
+from .tokenizer import Token, tokenize
+
+if TYPE_CHECKING:
+    from .corpus import DocCorpus
 
 logger = logging.getLogger(__name__)
 
-def get_header_changes(content: str) -> List[Tuple[str, str]]:
-    """Find headers that need anchor updates or additions"""
+# Matches headers without an anchor, with an old-style {#anchor} or with a
+# {: #anchor}; used with match() on a single header line
+HEADER_ANCHOR_RE = re.compile(r'(#{1,6})\s+([^{\n]+?)(?:\s*\{(:?)\s*#([\w-]+)\s*\})?\s*$')
+
+def get_header_changes(content: str, tokens: Optional[List[Token]] = None) -> List[Edit]:
+    """
+    Find headers that need anchor updates or additions
+
+    Every header is pinned to the ID the toc extension gives it, so adding
+    anchors never changes a URL. Duplicate explicit IDs are renumbered the
+    way toc numbers duplicate slugs (_1, _2, ...).
+    """
+    if tokens is None:
+        tokens = tokenize(content)
     changes = []
-    processed_headers = set()  # Track what we've already processed
-    
-    # Pattern matches both headerless and old-style anchors
-    headers = re.finditer(
-        r'^(#{1,6})\s+([^{\n]+?)(?:\s*\{#([\w-]+)\})?\s*$',
-        content,
-        re.MULTILINE
-    )
-    
-    for match in headers:
+
+    for header, anchor in header_ids(tokens, dedupe=True):
+        match = HEADER_ANCHOR_RE.match(content, header.start, header.end)
+        if not match:
+            continue
         level = match.group(1)
         text = match.group(2).strip()
-        existing_anchor = match.group(3)  # Will be None if no anchor exists
-        
-        # Create a unique identifier for this header
-        header_id = f"{level}_{text}"
-        
-        # Skip if we've already processed this header
-        if header_id in processed_headers:
-            logger.debug(f"Skipping duplicate header: {header_id}")
-            continue
-            
-        processed_headers.add(header_id)
-        
+        new_style = match.group(3)
+        existing_anchor = match.group(4)  # Will be None if no anchor exists
+
         old = match.group(0)
-        if existing_anchor:
-            # Convert old {#anchor} to new {: #anchor} format
-            new = f"{level} {text} {{: #{existing_anchor}}}"
-            logger.debug(f"Converting existing anchor: {old} -> {new}")
+        if existing_anchor is None:
+            logger.debug(f"Adding new anchor to: {old}")
+        elif existing_anchor != anchor:
+            logger.debug(f"Renumbering duplicate anchor #{existing_anchor} to #{anchor}")
+        elif new_style:
+            continue
         else:
-            # Add new anchor
-            anchor = text.lower().replace(' ', '-')
-            anchor = re.sub(r'[^\w\-]', '', anchor)
-            new = f"{level} {text} {{: #{anchor}}}"
-            logger.debug(f"Adding new anchor: {old} -> {new}")
-        
+            # Convert old {#anchor} to new {: #anchor} format
+            logger.debug(f"Converting existing anchor: {old}")
+        new = f"{level} {text} {{: #{anchor}}}"
+
         # Only add if it's actually different
         if old != new:
-            changes.append((old, new))
-    
+            changes.append(Edit(old, new, match.start(), match.end()))
+
     return changes
 
-def add_missing_anchors(docs_dir: Path):
-    """Add missing anchors to markdown headers with confirmation prompts"""
-    logger.info("Scanning for headers without anchors...")
-    files_to_update: Dict[Path, List[tuple]] = {}
-    
-    # Collect all files needing updates
-    for md_file in docs_dir.rglob("*.md"):
+def find_header_changes(corpus: 'DocCorpus', paths: Optional[Iterable[Path]] = None
+                        ) -> Tuple[Dict[Path, List[Edit]], Dict[Path, List[Tuple[Path, str, str]]]]:
+    """
+    Anchor changes per file, and the inbound links (source, link, new ID)
+    each file's changes would break. With paths, only those files are checked.
+    """
+    files_to_update: Dict[Path, List[Edit]] = {}
+    breaking: Dict[Path, List[Tuple[Path, str, str]]] = {}
+    docs = [corpus.get(path) for path in paths if path in corpus] if paths is not None else corpus
+    for doc in docs:
+        md_file = doc.path
         logger.debug(f"Processing file: {md_file}")
-        with open(md_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        changes = get_header_changes(content)
+        changes = doc.header_changes
         if changes:
             logger.debug(f"Found {len(changes)} changes in {md_file}")
-            for old, new in changes:
-                logger.debug(f"  Change: {old.strip()} -> {new.strip()}")
+            for change in changes:
+                logger.debug(f"  Change: {change.old.strip()} -> {change.new.strip()}")
             files_to_update[md_file] = changes
+            links = corpus.breaking_links(doc)
+            if links:
+                breaking[md_file] = links
+    return files_to_update, breaking
+
+def print_header_changes(docs_dir: Path, files_to_update: Dict[Path, List[Edit]],
+                         breaking: Dict[Path, List[Tuple[Path, str, str]]]) -> None:
+    """Print the anchor changes of each file and the inbound links they break"""
+    for file_path, changes in files_to_update.items():
+        print(f"\nFile: {file_path.relative_to(docs_dir)}")
+        for change in changes:
+            print(f"  {change.old.strip()} -> {change.new.strip()}")
+        for source, link, anchor in breaking.get(file_path, []):
+            print(f"  ! {source.relative_to(docs_dir)} links to {link}, which becomes #{anchor}")
+
+def add_missing_anchors(docs_dir: Path, cache: Optional[DocCache] = None, apply: bool = False,
+                        dry_run: bool = False) -> Optional[ChangeManifest]:
+    """
+    Add missing anchors to markdown headers with confirmation prompts
+
+    With apply or dry_run set, no prompt is shown: the changes are applied (or
+    only planned) in batch and the resulting change manifest is returned.
+    Links from other files to anchors the changes renumber are reported in
+    both modes.
+    """
+    # Imported here because the corpus itself is built on get_header_changes
+    from .corpus import DocCorpus
+
+    logger.info("Scanning for headers without anchors...")
+    corpus = DocCorpus.load(docs_dir, cache=cache)
+    files_to_update, breaking = find_header_changes(corpus)
+    corpus.save_cache()
+
+    if apply or dry_run:
+        manifest = apply_batch(docs_dir, {file_path: {'anchors': changes}
+                                          for file_path, changes in files_to_update.items()},
+                               dry_run=dry_run)
+        for file_path, links in sorted(breaking.items()):
+            manifest.add_breaking_links(file_path, links)
+        return manifest
     
     if not files_to_update:
         logger.info("No files need anchor updates")
-        return
+        return None
     
     # Display changes in a simple format
     print("\nProposed changes:")
-    for file_path, changes in files_to_update.items():
-        print(f"\nFile: {file_path.relative_to(docs_dir)}")
-        for old, new in changes:
-            print(f"  {old.strip()} -> {new.strip()}")
+    print_header_changes(docs_dir, files_to_update, breaking)
     
     response = input("\nApply these changes? [y/N]: ").lower()
     if response != 'y':
         logger.info("Operation cancelled")
-        return
+        return None
     
     # Apply changes
     for file_path, changes in files_to_update.items():
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        for old, new in changes:
-            content = content.replace(old, new)
-        
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(content)
-            print(f"Updated {file_path.relative_to(docs_dir)}")
+        rewrite_file(file_path, changes)
+        print(f"Updated {file_path.relative_to(docs_dir)}")
     
     logger.info("Completed adding missing anchors")
+    return None
+
+def main(argv: Optional[List[str]] = None):
+    # Imported here, like the corpus it builds on
+    from .git_index import add_staged_arguments, staged_corpus
+
+    parser = argparse.ArgumentParser(description='Add missing anchors to markdown headers')
+    add_path_arguments(parser)
+    add_cache_arguments(parser)
+    add_batch_arguments(parser, choices=None)
+    add_staged_arguments(parser)
+    add_instrument_arguments(parser)
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    with session(stats=args.stats, profile=args.profile, trace=args.trace):
+        docs_dir = resolve_paths(args.docs_dir, args.config).docs_dir
+        if args.staged or args.since:
+            # Edits computed on staged content cannot be applied to the working tree
+            if args.apply or args.dry_run:
+                parser.error("--staged and --since only report; run without them to apply fixes")
+            corpus, paths = staged_corpus(docs_dir, since=args.since)
+            files_to_update, breaking = find_header_changes(corpus, paths)
+            if files_to_update:
+                print("\nStaged headers without anchors:")
+                print_header_changes(docs_dir, files_to_update, breaking)
+            sys.exit(1 if files_to_update else 0)
+
+        cache = open_cache(docs_dir, enabled=not args.no_cache, clear=args.clear_cache,
+                           max_entries=args.cache_size)
+        manifest = add_missing_anchors(docs_dir, cache=cache, apply=args.apply, dry_run=args.dry_run)
+        if manifest is not None:
+            manifest.write(args.manifest)
+            sys.exit(1 if manifest.errors else 0)
 
 if __name__ == "__main__":
-    logging.basicConfig(level=logging.INFO)
-    docs_dir = Path("docs")
-    add_missing_anchors(docs_dir)
+    main()
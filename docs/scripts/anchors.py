@@ -0,0 +1,147 @@
+import os
+import re
+import html
+import unicodedata
+from typing import Dict, List, Optional, Set, Tuple
+from .tokenizer import AnchorToken, HeaderToken, Token
+
+# A trailing attribute list on a header line, such as {: #id .class} or {#id}
+HEADER_ATTRS_RE = re.compile(r'\s*\{:?([^}]*)\}\s*$')
+ATTR_ID_RE = re.compile(r'#([^\s}]+)')
+# Inline markup removed from header text before slugifying, as the rendered
+# header is plain text by the time the toc extension sees it
+IMAGE_RE = re.compile(r'!\[[^\]]*\]\([^)]*\)')
+LINK_RE = re.compile(r'\[([^\]]*)\](?:\([^)]*\)|\[[^\]]*\])')
+CODE_RE = re.compile(r'(`+)(.+?)\1')
+TAG_RE = re.compile(r'<[^>]+>')
+EMPHASIS_RE = re.compile(r'(\*{1,3}|(?<!\w)_{1,3})(?=\S)(.+?)(?<=\S)\1')
+CLOSING_HASHES_RE = re.compile(r'\s+#+$')
+# Same as the toc extension: a trailing _<n> is incremented to make IDs unique
+IDCOUNT_RE = re.compile(r'^(.*)_([0-9]+)$')
+
+def slugify(value: str, separator: str = '-', unicode: bool = False) -> str:
+    """
+    Anchor ID the Python-Markdown toc extension generates for header text.
+
+    Accented Latin characters are folded to ASCII and other non-ASCII
+    characters, emoji included, are dropped, unless unicode is set (the
+    toc slugify_unicode variant).
+    """
+    if not unicode:
+        value = unicodedata.normalize('NFKD', value)
+        value = value.encode('ascii', 'ignore').decode('ascii')
+    value = re.sub(r'[^\w\s-]', '', value).strip().lower()
+    return re.sub(r'[{}\s]+'.format(re.escape(separator)), separator, value)
+
+def unique_id(anchor: str, used: Set[str]) -> str:
+    """Make anchor unique within used by appending _1, _2, ... and record it"""
+    while anchor in used or not anchor:
+        count = IDCOUNT_RE.match(anchor)
+        if count:
+            anchor = f"{count.group(1)}_{int(count.group(2)) + 1}"
+        else:
+            anchor = f"{anchor}_1"
+    used.add(anchor)
+    return anchor
+
+def heading_text(text: str) -> str:
+    """Plain text of a header as rendered: markup, tags and entities resolved"""
+    text = CLOSING_HASHES_RE.sub('', text)
+    text = IMAGE_RE.sub('', text)
+    text = LINK_RE.sub(r'\1', text)
+    text = CODE_RE.sub(r'\2', text)
+    text = TAG_RE.sub('', text)
+    text = EMPHASIS_RE.sub(r'\2', text)
+    return html.unescape(text)
+
+def explicit_id(header: HeaderToken) -> Tuple[Optional[str], str]:
+    """The ID set by a header's attribute list, if any, and the header text without it"""
+    text = header.text
+    attrs = HEADER_ATTRS_RE.search(text)
+    if attrs:
+        text = text[:attrs.start()]
+        explicit = ATTR_ID_RE.search(attrs.group(1))
+        if explicit:
+            return explicit.group(1), text
+    return None, text
+
+def header_ids(tokens: List[Token], dedupe: bool = False) -> List[Tuple[HeaderToken, str]]:
+    """
+    The ID of every header, in document order, computed in one pass.
+
+    Headers without an explicit ID get the toc extension's slug, made unique
+    against every ID already used in the file by a per-file counter. Explicit
+    IDs are kept as they are, which is what gets rendered; with dedupe set,
+    an explicit ID repeating an earlier one is made unique as well, giving
+    the IDs the file should have once its duplicates are fixed.
+    """
+    used = {token.id for token in tokens if isinstance(token, AnchorToken)}
+    explicit_seen: Set[str] = set()
+    ids = []
+    for token in tokens:
+        if not isinstance(token, HeaderToken):
+            continue
+        anchor, text = explicit_id(token)
+        if anchor is None:
+            anchor = unique_id(slugify(heading_text(text)), used)
+        elif dedupe and anchor in explicit_seen:
+            anchor = unique_id(anchor, used)
+        else:
+            explicit_seen.add(anchor)
+        ids.append((token, anchor))
+    return ids
+
+def collect_anchors(tokens: List[Token]) -> Set[str]:
+    """Every fragment a file can be linked to: header IDs and explicit anchors"""
+    anchors = {anchor for _, anchor in header_ids(tokens)}
+    anchors.update(token.id for token in tokens if isinstance(token, AnchorToken))
+    anchors.discard('')
+    return anchors
+
+def anchor_renames(tokens: List[Token]) -> Dict[str, str]:
+    """
+    IDs whose header changes once duplicate IDs are fixed, mapped to the ID
+    that header gets instead. Links to these IDs would break or silently
+    land on another header. An ID that keeps pointing at the header it
+    lands on today is not a rename, even if a later duplicate is renumbered.
+    """
+    pairs = list(zip(header_ids(tokens), header_ids(tokens, dedupe=True)))
+    kept = {old for (_, old), (_, new) in pairs if old == new}
+    return {old: new for (_, old), (_, new) in pairs if old != new and old not in kept}
+
+def split_fragment(link: str) -> Tuple[str, Optional[str]]:
+    """Split a link into its path and its fragment, None when there is no '#'"""
+    path, sep, fragment = link.partition('#')
+    return path, fragment if sep else None
+
+class AnchorIndex:
+    """
+    Anchor IDs of every markdown file in a corpus, keyed by absolute path.
+
+    Built from anchors already extracted with each file's tokens, so it costs
+    neither another read nor another walk of the tree; each fragment check is
+    a dictionary lookup followed by a set lookup.
+    """
+
+    def __init__(self):
+        self.anchors: Dict[str, Set[str]] = {}
+
+    def __contains__(self, path: str) -> bool:
+        return path in self.anchors
+
+    def __len__(self) -> int:
+        return len(self.anchors)
+
+    def get(self, path: str) -> Optional[Set[str]]:
+        return self.anchors.get(path)
+
+    def set(self, path: str, anchors: Set[str]) -> None:
+        self.anchors[os.path.abspath(path)] = anchors
+
+    def discard(self, path: str) -> None:
+        self.anchors.pop(os.path.abspath(path), None)
+
+    def has(self, path: str, fragment: str) -> bool:
+        """Whether the file at path defines fragment; files outside the index are not checked"""
+        anchors = self.anchors.get(path)
+        return anchors is None or fragment in anchors
@@ -0,0 +1,164 @@
+import sys
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+from .fileio import write_text_atomic
+from .instrument import count
+from .patch import Edit, apply_edits
+
+logger = logging.getLogger(__name__)
+
+APPLY_CHOICES = ('all', 'links', 'anchors', 'missing')
+
+def select_fix_kinds(apply: Optional[str]) -> Set[str]:
+    """Translate an --apply value into the set of fix kinds to run"""
+    if apply is None or apply == 'all':
+        return {'links', 'anchors', 'missing'}
+    return {apply}
+
+def rewrite_file(file_path: Path, edits: Sequence[Edit], dry_run: bool = False) -> bool:
+    """
+    Apply every edit for a file in a single read-modify-write.
+
+    Returns whether the content changed; the file is only written, atomically,
+    when it did and dry_run is not set. Raises a PatchError if the edits
+    overlap or the file changed since it was scanned.
+    """
+    content = file_path.read_text(encoding='utf-8')
+    original_content = content
+
+    content = apply_edits(content, edits)
+
+    if content == original_content:
+        return False
+    if not dry_run:
+        write_text_atomic(file_path, content)
+        count('files_written')
+    return True
+
+class ChangeManifest:
+    """Machine-readable record of the changes made, or planned, by a batch run"""
+
+    def __init__(self, docs_dir: Path, dry_run: bool = False):
+        self.docs_dir = docs_dir
+        self.dry_run = dry_run
+        self.files: List[Dict[str, Any]] = []
+        self.created: List[Dict[str, Any]] = []
+        self.broken_anchors: List[Dict[str, Any]] = []
+        self.breaking_links: List[Dict[str, Any]] = []
+        self.broken_external: List[Dict[str, Any]] = []
+        self.issues: List[Dict[str, Any]] = []
+
+    def _relative(self, path: Path) -> str:
+        try:
+            return Path(path).relative_to(self.docs_dir).as_posix()
+        except ValueError:
+            return Path(path).as_posix()
+
+    def add_file(self, file_path: Path, status: str, **fixes: List[Edit]) -> None:
+        """Record the edits of one file under their fix kind"""
+        entry: Dict[str, Any] = {'path': self._relative(file_path), 'status': status}
+        for kind, changes in fixes.items():
+            if changes:
+                entry[kind] = [edit._asdict() for edit in changes]
+        self.files.append(entry)
+
+    def add_created(self, file_path: Path, template: str, status: str) -> None:
+        """Record a file created from a template"""
+        self.created.append({'path': self._relative(file_path), 'template': template, 'status': status})
+
+    def add_broken_anchors(self, file_path: Path, links: List[str]) -> None:
+        """Record links whose #fragment does not exist; these are reported, never fixed"""
+        self.broken_anchors.append({'path': self._relative(file_path), 'links': links})
+
+    def add_broken_external(self, file_path: Path, links: List[str]) -> None:
+        """Record external links that failed their check; these are reported, never fixed"""
+        self.broken_external.append({'path': self._relative(file_path), 'links': links})
+
+    def add_breaking_links(self, file_path: Path, links: List[Tuple[Path, str, str]]) -> None:
+        """Record inbound links (source, link, new ID) that the anchor fixes of a file break"""
+        self.breaking_links.append({'path': self._relative(file_path),
+                                    'links': [{'source': self._relative(source), 'link': link, 'new_anchor': anchor}
+                                              for source, link, anchor in links]})
+
+    def add_issues(self, file_path: Path, rule: str, issues: List[Any]) -> None:
+        """Record the issues of another rule, e.g. an opt-in one; these are reported, never fixed"""
+        self.issues.append({'path': self._relative(file_path), 'rule': rule,
+                            'issues': [{'message': issue.message, 'line': issue.line, 'column': issue.column}
+                                       for issue in issues]})
+
+    @property
+    def errors(self) -> int:
+        return sum(1 for entry in self.files + self.created if entry['status'] == 'error')
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'docs_dir': str(self.docs_dir),
+            'dry_run': self.dry_run,
+            'files': self.files,
+            'created': self.created,
+            'broken_anchors': self.broken_anchors,
+            'breaking_links': self.breaking_links,
+            'broken_external': self.broken_external,
+            'issues': self.issues,
+            'summary': {
+                'files_changed': sum(1 for entry in self.files if entry['status'] in ('updated', 'would-update')),
+                'files_created': sum(1 for entry in self.created if entry['status'] in ('created', 'would-create')),
+                'broken_anchors': sum(len(entry['links']) for entry in self.broken_anchors),
+                'breaking_links': sum(len(entry['links']) for entry in self.breaking_links),
+                'broken_external': sum(len(entry['links']) for entry in self.broken_external),
+                'issues': sum(len(entry['issues']) for entry in self.issues),
+                'errors': self.errors,
+            },
+        }
+
+    def write(self, destination: str = '-') -> None:
+        """Write the manifest as JSON to a file, or to stdout for '-'"""
+        data = json.dumps(self.to_dict(), indent=2, ensure_ascii=False)
+        if destination == '-':
+            sys.stdout.write(data + '\n')
+        else:
+            write_text_atomic(Path(destination), data + '\n')
+            logger.info(f"Change manifest written to {destination}")
+
+def apply_batch(docs_dir: Path, file_fixes: Dict[Path, Dict[str, List[Edit]]],
+                dry_run: bool = False, manifest: Optional[ChangeManifest] = None) -> ChangeManifest:
+    """
+    Apply fixes grouped per file and per kind, e.g. {file: {'links': [...], 'anchors': [...]}}.
+
+    Every file is read and written once, whatever the number of fix kinds.
+    """
+    if manifest is None:
+        manifest = ChangeManifest(docs_dir, dry_run=dry_run)
+
+    for file_path in sorted(file_fixes):
+        fixes = file_fixes[file_path]
+        edits = [edit for changes in fixes.values() for edit in changes]
+        try:
+            if not rewrite_file(file_path, edits, dry_run=dry_run):
+                status = 'unchanged'
+            elif dry_run:
+                status = 'would-update'
+            else:
+                status = 'updated'
+                logger.info(f"Updated {manifest._relative(file_path)}")
+        except Exception as e:
+            logger.error(f"Error applying fixes to {file_path}: {str(e)}")
+            status = 'error'
+        manifest.add_file(file_path, status, **fixes)
+
+    return manifest
+
+def add_batch_arguments(parser, choices: Optional[Sequence[str]] = APPLY_CHOICES) -> None:
+    """Register the non-interactive --apply/--dry-run/--manifest flags"""
+    if choices:
+        parser.add_argument('--apply', choices=choices, default=None,
+                            help='Apply fixes of this kind without prompting')
+    else:
+        parser.add_argument('--apply', action='store_true',
+                            help='Apply all fixes without prompting')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Compute fixes without writing any file')
+    parser.add_argument('--manifest', default='-',
+                        help="Where to write the JSON change manifest in batch mode (default: '-' for stdout)")
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the documentation tooling on synthetic corpora.
+
+    docs-tool bench [--sizes 100,10000,100000] [--only NAME] [--output FILE]
+                    [--compare FILE]
+
+Each corpus is generated deterministically from its parameters (file count,
+links per file, header depth, code-fence density, broken-link ratio and a
+seed), so the same command measures the same input on every commit. Corpora
+are kept in the work directory and reused while their parameters match.
+
+Every benchmark is timed without instrumentation (best of --repeat runs),
+then run once more under tracemalloc for its peak Python memory; memory
+used by git processes is not included. Results are printed as a table and
+can be written as JSON and compared with an earlier run.
+"""
+import gc
+import io
+import sys
+import json
+import time
+import random
+import argparse
+import contextlib
+import logging
+import platform
+import posixpath
+import tempfile
+import tracemalloc
+from datetime import datetime, timezone
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+from .config import PACKAGE_ROOT, configure_logging
+
+logger = logging.getLogger(__name__)
+
+BENCH_VERSION = 1
+DEFAULT_SIZES = (100, 10000, 100000)
+# Pages per directory and directories per section of a generated corpus
+PAGES_PER_DIR = 50
+DIRS_PER_SECTION = 50
+MARKER_NAME = '.bench-corpus.json'
+WORDS = ('documentation', 'deployment', 'component', 'token', 'policy', 'network', 'design', 'review',
+         'release', 'theme', 'azure', 'pipeline', 'guide', 'reference', 'security', 'colour')
+
+class CorpusSpec(NamedTuple):
+    """Parameters of a synthetic corpus; equal specs generate identical files"""
+    files: int
+    links_per_file: int = 10
+    header_depth: int = 4        # deepest header level used, 2-6
+    fence_density: float = 0.3   # chance of a code fence in each section
+    broken_ratio: float = 0.05   # share of links pointing at a missing page
+    sections: int = 6            # sections (headers below the title) per page
+    seed: int = 1
+
+    @property
+    def name(self) -> str:
+        return (f"corpus-{self.files}-l{self.links_per_file}-h{self.header_depth}"
+                f"-f{self.fence_density:g}-b{self.broken_ratio:g}-s{self.sections}-r{self.seed}")
+
+def page_path(index: int) -> str:
+    """Path of the index-th page, relative to docs_dir"""
+    directory = index // PAGES_PER_DIR
+    return (f"section-{directory // DIRS_PER_SECTION:03d}/group-{directory % DIRS_PER_SECTION:02d}"
+            f"/page-{index:06d}.md")
+
+def _sentence(rng: random.Random, words: int = 12) -> str:
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+def generate_page(rng: random.Random, spec: CorpusSpec, index: int) -> str:
+    """Markdown of the index-th page: a title, then sections with links, fences and nested headers"""
+    source_dir = posixpath.dirname(page_path(index))
+    lines = [f"# Page {index}", "", _sentence(rng), ""]
+    links_left = spec.links_per_file
+    levels = max(1, spec.header_depth - 1)
+    for section in range(spec.sections):
+        lines += [f"{'#' * (2 + section % levels)} Section {section}", "", _sentence(rng)]
+        # Spread the links over the sections
+        count = links_left if section == spec.sections - 1 else min(links_left, -(-spec.links_per_file // spec.sections))
+        links_left -= count
+        for _ in range(count):
+            if rng.random() < spec.broken_ratio:
+                target = f"missing-{rng.randrange(10 ** 6)}.md"
+            else:
+                target = posixpath.relpath(page_path(rng.randrange(spec.files)), source_dir)
+                if rng.random() < 0.3:
+                    target += f"#section-{rng.randrange(spec.sections)}"
+            lines.append(f"See [{rng.choice(WORDS)}]({target}) for {_sentence(rng, 6).lower()}")
+        if rng.random() < spec.fence_density:
+            # Links and headers inside fences must be ignored by every check
+            lines += ["", "```markdown", "# Not a header", "[not a link](missing-in-fence.md)", "```"]
+        lines.append("")
+    return '\n'.join(lines)
+
+def generate_corpus(directory: Path, spec: CorpusSpec) -> Path:
+    """
+    Write the corpus for spec under directory/docs/src and return that docs
+    directory; an existing corpus generated from the same spec is reused.
+    """
+    docs_dir = directory / 'docs' / 'src'
+    marker = directory / MARKER_NAME
+    if marker.exists() and json.loads(marker.read_text(encoding='utf-8')) == spec._asdict():
+        return docs_dir
+
+    logger.info(f"Generating {spec.files} pages in {docs_dir}")
+    rng = random.Random(spec.seed)
+    created = set()
+    for index in range(spec.files):
+        file_path = docs_dir / page_path(index)
+        if file_path.parent not in created:
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            created.add(file_path.parent)
+        file_path.write_text(generate_page(rng, spec, index), encoding='utf-8')
+    (docs_dir / 'index.md').write_text("# Synthetic Corpus\n\nGenerated for benchmarks.\n", encoding='utf-8')
+    marker.write_text(json.dumps(spec._asdict()), encoding='utf-8')
+    return docs_dir
+
+def _git(directory: Path, *args: str) -> str:
+    import subprocess
+    result = subprocess.run(['git', '-c', 'user.name=bench', '-c', 'user.email=bench@example.invalid', *args],
+                            cwd=directory, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    return result.stdout.decode('utf-8').strip()
+
+def prepare_history(directory: Path, spec: CorpusSpec) -> Tuple[str, str]:
+    """
+    Give a corpus a base and a head commit for the change report: the head
+    edits one page in twenty, deletes one in a hundred and adds as many.
+    Returns (base, head); existing history of the same corpus is reused.
+    """
+    history = directory / '.bench-history.json'
+    if history.exists():
+        commits = json.loads(history.read_text(encoding='utf-8'))
+        return commits['base'], commits['head']
+
+    docs_dir = generate_corpus(directory, spec)
+    _git(directory, 'init', '-q')
+    _git(directory, 'add', '-A', 'docs')
+    _git(directory, 'commit', '-q', '-m', 'base')
+    base = _git(directory, 'rev-parse', 'HEAD')
+
+    rng = random.Random(spec.seed + 1)
+    for index in range(0, spec.files, 20):
+        file_path = docs_dir / page_path(index)
+        file_path.write_text(file_path.read_text(encoding='utf-8') + f"\n## Changes\n\n{_sentence(rng)}\n",
+                             encoding='utf-8')
+    for index in range(7, spec.files, 100):
+        (docs_dir / page_path(index)).unlink()
+        new_path = docs_dir / page_path(index).replace('page-', 'added-')
+        new_path.write_text(generate_page(rng, spec, index), encoding='utf-8')
+    _git(directory, 'add', '-A', 'docs')
+    _git(directory, 'commit', '-q', '-m', 'head')
+    head = _git(directory, 'rev-parse', 'HEAD')
+    history.write_text(json.dumps({'base': base, 'head': head}), encoding='utf-8')
+    return base, head
+
+class Benchmark(NamedTuple):
+    name: str
+    # Called once per corpus with (corpus directory, docs_dir, spec); returns the measured callable
+    setup: Callable[[Path, Path, CorpusSpec], Callable[[], Any]]
+    history: bool = False  # needs a git repository with a base and a head commit
+
+def _read_pages(docs_dir: Path) -> List[str]:
+    return [path.read_text(encoding='utf-8') for path in sorted(docs_dir.rglob('*.md'))]
+
+def _setup_find_links(directory: Path, docs_dir: Path, spec: CorpusSpec) -> Callable[[], Any]:
+    from .fix_links import find_links
+    pages = _read_pages(docs_dir)
+    return lambda: [find_links(content) for content in pages]
+
+def _setup_header_changes(directory: Path, docs_dir: Path, spec: CorpusSpec) -> Callable[[], Any]:
+    from .add_anchors import get_header_changes
+    pages = _read_pages(docs_dir)
+    return lambda: [get_header_changes(content) for content in pages]
+
+def _setup_missing_files(directory: Path, docs_dir: Path, spec: CorpusSpec) -> Callable[[], Any]:
+    from .create_templates import find_missing_files
+    return lambda: find_missing_files(docs_dir)
+
+def _setup_scan(directory: Path, docs_dir: Path, spec: CorpusSpec) -> Callable[[], Any]:
+    from .serve_docs import scan_documentation_issues
+    return lambda: scan_documentation_issues(docs_dir)
+
+def _setup_build_nav(directory: Path, docs_dir: Path, spec: CorpusSpec) -> Callable[[], Any]:
+    from .update_nav import build_nav
+    return lambda: build_nav(docs_dir)
+
+def _setup_report(directory: Path, docs_dir: Path, spec: CorpusSpec, report_format: str = 'txt',
+                  stream: bool = False) -> Callable[[], Any]:
+    if str(PACKAGE_ROOT) not in sys.path:
+        sys.path.insert(0, str(PACKAGE_ROOT))
+    from scripts.tools import doc_diff
+    base, head = prepare_history(directory, spec)
+
+    def run():
+        # The report runs its git commands from REPO_ROOT; it is put back so later imports see this repository
+        previous = doc_diff.REPO_ROOT
+        doc_diff.REPO_ROOT = directory
+        try:
+            # Reports go to a temporary directory, not into the corpus repository
+            with tempfile.TemporaryDirectory() as reports_dir, contextlib.redirect_stdout(io.StringIO()):
+                generator = doc_diff.DocReportGenerator(base, head, stream=stream, reports_dir=reports_dir)
+                try:
+                    generator.generate_report(report_format=report_format)
+                finally:
+                    generator.close()
+        finally:
+            doc_diff.REPO_ROOT = previous
+    return run
+
+BENCHMARKS: Dict[str, Benchmark] = {
+    'find_links': Benchmark('find_links', _setup_find_links),
+    'get_header_changes': Benchmark('get_header_changes', _setup_header_changes),
+    'find_missing_files': Benchmark('find_missing_files', _setup_missing_files),
+    'scan_documentation_issues': Benchmark('scan_documentation_issues', _setup_scan),
+    # build_nav replaced get_nav_structure when the nav started being built from page titles
+    'build_nav': Benchmark('build_nav', _setup_build_nav),
+    'generate_report': Benchmark('generate_report', _setup_report, history=True),
+    'generate_report_stream': Benchmark('generate_report_stream', partial(_setup_report, stream=True), history=True),
+    'generate_report_json': Benchmark('generate_report_json', partial(_setup_report, report_format='json'),
+                                      history=True),
+    'generate_report_jsonl': Benchmark('generate_report_jsonl', partial(_setup_report, report_format='jsonl'),
+                                       history=True),
+    'generate_report_md': Benchmark('generate_report_md', partial(_setup_report, report_format='md'),
+                                    history=True),
+    'generate_report_html': Benchmark('generate_report_html', partial(_setup_report, report_format='html'),
+                                      history=True),
+}
+
+def measure(run: Callable[[], Any], repeat: int = 1, memory: bool = True) -> Dict[str, Any]:
+    """Best wall time of repeat runs and, with memory, the tracemalloc peak of one more run"""
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - started)
+    result: Dict[str, Any] = {'seconds': min(times), 'runs': repeat, 'peak_bytes': None}
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            run()
+            result['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
+
+def run_benchmarks(work_dir: Path, specs: List[CorpusSpec], names: List[str], repeat: int = 1,
+                   memory: bool = True) -> List[Dict[str, Any]]:
+    """Run each benchmark on each corpus, generating corpora as needed"""
+    results = []
+    for spec in specs:
+        directory = work_dir / spec.name
+        for name in names:
+            benchmark = BENCHMARKS[name]
+            logger.info(f"Running {name} on {spec.files} files")
+            # The change report gets its own copy, so its commits never alter the shared corpus
+            bench_dir = directory.with_name(directory.name + '-git') if benchmark.history else directory
+            run = benchmark.setup(bench_dir, generate_corpus(bench_dir, spec), spec)
+            result = measure(run, repeat=repeat, memory=memory)
+            results.append({'benchmark': name, 'files': spec.files, **result})
+    return results
+
+def _format_bytes(size: Optional[int]) -> str:
+    return '-' if size is None else f"{size / (1024 * 1024):.1f}"
+
+def _ratio(new: Optional[float], old: Optional[float]) -> str:
+    if not new or not old:
+        return '-'
+    return f"{new / old:.2f}x"
+
+def print_table(results: List[Dict[str, Any]], baseline: Optional[Dict[Tuple[str, int], Dict[str, Any]]] = None,
+                out=None) -> None:
+    """Timing and peak-memory table, with ratios to a baseline run when given"""
+    out = out or sys.stdout
+    header = f"{'benchmark':<28}{'files':>8}{'time (s)':>12}{'peak (MiB)':>12}"
+    if baseline is not None:
+        header += f"{'time vs base':>14}{'peak vs base':>14}"
+    print(header, file=out)
+    print('-' * len(header), file=out)
+    for result in results:
+        line = (f"{result['benchmark']:<28}{result['files']:>8}{result['seconds']:>12.3f}"
+                f"{_format_bytes(result['peak_bytes']):>12}")
+        if baseline is not None:
+            old = baseline.get((result['benchmark'], result['files']), {})
+            line += (f"{_ratio(result['seconds'], old.get('seconds')):>14}"
+                     f"{_ratio(result['peak_bytes'], old.get('peak_bytes')):>14}")
+        print(line, file=out)
+
+def current_commit() -> Optional[str]:
+    try:
+        return _git(PACKAGE_ROOT, 'rev-parse', 'HEAD')
+    except Exception:
+        return None
+
+def results_document(results: List[Dict[str, Any]], specs: List[CorpusSpec]) -> Dict[str, Any]:
+    return {
+        'version': BENCH_VERSION,
+        'commit': current_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'corpora': [spec._asdict() for spec in specs],
+        'results': results,
+    }
+
+def load_baseline(path: Path) -> Dict[Tuple[str, int], Dict[str, Any]]:
+    data = json.loads(path.read_text(encoding='utf-8'))
+    if data.get('version') != BENCH_VERSION:
+        logger.warning(f"Baseline {path} has version {data.get('version')}, comparing anyway")
+    return {(result['benchmark'], result['files']): result for result in data.get('results', [])}
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Benchmark the documentation tooling on synthetic corpora')
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help='Comma-separated corpus sizes in files (default: %(default)s)')
+    parser.add_argument('--only', action='append', choices=BENCHMARKS, default=None,
+                        help='Run only this benchmark; may be repeated')
+    parser.add_argument('--links', type=int, default=CorpusSpec._field_defaults['links_per_file'],
+                        help='Links per file (default: %(default)s)')
+    parser.add_argument('--header-depth', type=int, default=CorpusSpec._field_defaults['header_depth'],
+                        help='Deepest header level, 2-6 (default: %(default)s)')
+    parser.add_argument('--fence-density', type=float, default=CorpusSpec._field_defaults['fence_density'],
+                        help='Chance of a code fence in each section (default: %(default)s)')
+    parser.add_argument('--broken-ratio', type=float, default=CorpusSpec._field_defaults['broken_ratio'],
+                        help='Share of links pointing at missing pages (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=CorpusSpec._field_defaults['seed'],
+                        help='Seed of the corpus generator (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='Timed runs per benchmark; the best is reported (default: 1)')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='Skip the tracemalloc run measuring peak memory')
+    parser.add_argument('--work-dir', default=None,
+                        help='Where corpora are generated and kept (default: a directory under the system temp dir)')
+    parser.add_argument('--output', default=None, help='Write the results as JSON to this file')
+    parser.add_argument('--compare', default=None, help='JSON results of an earlier run to compare with')
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    if not 2 <= args.header_depth <= 6:
+        parser.error('--header-depth must be between 2 and 6')
+    specs = [CorpusSpec(int(size), links_per_file=args.links, header_depth=args.header_depth,
+                        fence_density=args.fence_density, broken_ratio=args.broken_ratio, seed=args.seed)
+             for size in args.sizes.split(',') if size.strip()]
+    names = args.only or list(BENCHMARKS)
+    work_dir = Path(args.work_dir or Path(tempfile.gettempdir()) / 'docs-tool-bench')
+    work_dir.mkdir(parents=True, exist_ok=True)
+
+    # Per-file warnings about the deliberately broken links would swamp the table
+    logging.getLogger('docs.scripts.fix_links').setLevel(logging.ERROR)
+    results = run_benchmarks(work_dir, specs, names, repeat=args.repeat, memory=not args.no_memory)
+
+    baseline = load_baseline(Path(args.compare)) if args.compare else None
+    print()
+    print_table(results, baseline)
+    if args.output:
+        Path(args.output).write_text(json.dumps(results_document(results, specs), indent=2) + '\n',
+                                     encoding='utf-8')
+        logger.info(f"Results written to {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+import os
+import json
+import time
+import hashlib
+import logging
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+from .instrument import count
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 6
+DEFAULT_MAX_ENTRIES = 10000
+
+def default_cache_path(docs_dir: Path) -> Path:
+    """Location of the on-disk cache for a documentation directory"""
+    return docs_dir.parent / '.cache' / 'doc-checks.json'
+
+def content_hash(content: str) -> str:
+    """Stable hash of decoded file content"""
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+class DocCache:
+    """
+    Persistent per-file cache of extracted tokens and computed fixes.
+
+    Entries are keyed by absolute path and validated by mtime and size; when
+    those differ the file content is hashed and compared before the entry is
+    discarded, so a touched-but-unchanged file is still a hit. The number of
+    entries is bounded, least recently used entries are evicted on save.
+    """
+
+    def __init__(self, path: Path, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+        self._load()
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding='utf-8'))
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable cache {self.path}: {str(e)}")
+            return
+        if data.get('version') != CACHE_VERSION:
+            logger.debug(f"Discarding cache {self.path} with version {data.get('version')}")
+            return
+        self.entries = data.get('entries', {})
+
+    def clear(self) -> None:
+        """Drop every entry, in memory and on disk"""
+        self.entries = {}
+        self._dirty = False
+        if self.path.exists():
+            self.path.unlink()
+            logger.info(f"Cleared documentation cache {self.path}")
+
+    def get(self, file_path: Path) -> Optional[Dict[str, Any]]:
+        """Return the entry for file_path if the file is unchanged, else None"""
+        key = str(file_path.absolute())
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            count('cache_misses')
+            return None
+
+        try:
+            st = file_path.stat()
+            count('stat_calls')
+            if entry['mtime_ns'] != st.st_mtime_ns or entry['size'] != st.st_size:
+                if content_hash(file_path.read_text(encoding='utf-8')) != entry['sha256']:
+                    del self.entries[key]
+                    self._dirty = True
+                    self.misses += 1
+                    count('cache_misses')
+                    return None
+                entry['mtime_ns'] = st.st_mtime_ns
+                entry['size'] = st.st_size
+        except Exception as e:
+            logger.debug(f"Cache entry for {file_path} is unusable: {str(e)}")
+            self.misses += 1
+            count('cache_misses')
+            return None
+
+        entry['used'] = time.time()
+        self._dirty = True
+        self.hits += 1
+        count('cache_hits')
+        return entry
+
+    def put(self, file_path: Path, content: str, stat: Tuple[int, int], tokens: Dict[str, Any],
+            fixes: Optional[Dict[str, Any]] = None, tree: Optional[str] = None) -> None:
+        """
+        Store tokens, and fixes valid for the given tree key, for file_path.
+
+        stat is the (st_mtime_ns, st_size) of the file when content was read;
+        the file is not stat'ed again, as it may have changed since.
+        """
+        mtime_ns, size = stat
+        self.entries[str(file_path.absolute())] = {
+            'mtime_ns': mtime_ns,
+            'size': size,
+            'sha256': content_hash(content),
+            'used': time.time(),
+            'tokens': tokens,
+            'tree': tree,
+            'fixes': fixes or {},
+        }
+        self._dirty = True
+
+    def update_fixes(self, file_path: Path, fixes: Dict[str, Any], tree: Optional[str] = None) -> None:
+        """Replace the tree-dependent results of an existing entry"""
+        entry = self.entries.get(str(file_path.absolute()))
+        if entry is None or (entry.get('tree') == tree and entry.get('fixes') == fixes):
+            return
+        entry['tree'] = tree
+        entry['fixes'] = fixes
+        self._dirty = True
+
+    def save(self) -> None:
+        """Write the cache to disk, evicting the oldest entries beyond max_entries"""
+        if not self._dirty:
+            return
+
+        if len(self.entries) > self.max_entries:
+            newest = sorted(self.entries.items(), key=lambda item: item[1]['used'], reverse=True)
+            self.entries = dict(newest[:self.max_entries])
+
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(self.path.name + '.tmp')
+            tmp_path.write_text(json.dumps({'version': CACHE_VERSION, 'entries': self.entries}),
+                                encoding='utf-8')
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+            logger.debug(f"Saved {len(self.entries)} cache entries to {self.path} "
+                         f"({self.hits} hits, {self.misses} misses)")
+        except Exception as e:
+            logger.warning(f"Could not write cache {self.path}: {str(e)}")
+
+def open_cache(docs_dir: Path, enabled: bool = True, clear: bool = False,
+               max_entries: int = DEFAULT_MAX_ENTRIES) -> Optional[DocCache]:
+    """Open the cache for docs_dir according to the --no-cache/--clear-cache flags"""
+    cache = DocCache(default_cache_path(docs_dir), max_entries=max_entries)
+    if clear:
+        cache.clear()
+    return cache if enabled else None
+
+def add_cache_arguments(parser) -> None:
+    """Register the shared cache flags on an argparse parser"""
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Do not read or write the documentation cache')
+    parser.add_argument('--clear-cache', action='store_true',
+                        help='Invalidate the documentation cache before running')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_MAX_ENTRIES,
+                        help=f'Maximum number of cached files (default: {DEFAULT_MAX_ENTRIES})')
@@ -1,85 +1,97 @@
-import re
+import sys
+import argparse
 from pathlib import Path
-from typing import Set, Dict, List
+from typing import Dict, Iterable, List, Optional
 import logging
+from .cache import add_cache_arguments, open_cache
+from .config import add_path_arguments, configure_logging, resolve_paths
+from .corpus import DocCorpus, add_jobs_argument, resolve_jobs
+from .git_index import add_staged_arguments, staged_corpus
+from .instrument import add_instrument_arguments, session
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def extract_markdown_links(content: str) -> Set[str]:
-    """Extract all markdown links from content."""
-    # Match [text](link) pattern, capture only the link part
-    links = re.findall(r'\[([^\]]+)\]\(([^)]+)\)', content)
-    return {link for _, link in links if not link.startswith(('http://', 'https://', '#', 'mailto:'))}
-
-def check_missing_files(root_dir: Path) -> Dict[Path, List[str]]:
+def check_missing_files(root_dir: Path, corpus: Optional[DocCorpus] = None, jobs: int = 1,
+                        paths: Optional[Iterable[Path]] = None) -> Dict[Path, List[str]]:
     """
     Scan markdown files and return a dictionary of source files and their missing referenced files.
+
+    With paths, only those files of the corpus are scanned.
     """
     missing_files = {}
+    if corpus is None:
+        corpus = DocCorpus.load(root_dir)
+    if jobs > 1:
+        corpus.analyze(jobs)
+    docs = [corpus.get(path) for path in paths if path in corpus] if paths is not None else corpus
     
     # Scan all .md files
-    for md_file in root_dir.rglob('*.md'):
+    for doc in docs:
         try:
-            content = md_file.read_text(encoding='utf-8')
-            links = extract_markdown_links(content)
-            
-            # Check each link
-            file_missing_links = []
-            for link in links:
-                # Resolve the link path relative to the current file
-                if link.startswith('/'):
-                    target_path = root_dir / link.lstrip('/')
-                else:
-                    target_path = md_file.parent / link
-                
-                # Normalize the path
-                target_path = target_path.resolve()
-                
-                # Check if file exists
-                if not target_path.exists():
-                    file_missing_links.append(link)
-            
+            # Resolve each link relative to the current file and check it exists
+            file_missing_links = corpus.missing_links(doc)
             if file_missing_links:
-                missing_files[md_file] = file_missing_links
+                missing_files[doc.path] = file_missing_links
                 
         except Exception as e:
-            logger.error(f"Error processing {md_file}: {str(e)}")
+            logger.error(f"Error processing {doc.path}: {str(e)}")
     
     return missing_files
 
-def main():
-    # Get the root directory (assuming script is run from project root)
-    root_dir = Path('src')
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Report links to missing files in markdown files')
+    add_path_arguments(parser)
+    add_cache_arguments(parser)
+    add_jobs_argument(parser)
+    add_staged_arguments(parser)
+    add_instrument_arguments(parser)
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    with session(stats=args.stats, profile=args.profile, trace=args.trace):
+        root_dir = resolve_paths(args.docs_dir, args.config).docs_dir
     
-    if not root_dir.exists():
-        logger.error(f"Directory {root_dir} does not exist!")
-        return
+        if not root_dir.exists():
+            logger.error(f"Directory {root_dir} does not exist!")
+            return
     
-    logger.info(f"Scanning for missing files in {root_dir}...")
-    missing_files = check_missing_files(root_dir)
+        logger.info(f"Scanning for missing files in {root_dir}...")
+        if args.staged or args.since:
+            # Staged content is not what the cache describes, so it is not used
+            corpus, paths = staged_corpus(root_dir, since=args.since)
+            missing_files = check_missing_files(root_dir, corpus, paths=paths)
+        else:
+            cache = open_cache(root_dir, enabled=not args.no_cache, clear=args.clear_cache,
+                               max_entries=args.cache_size)
+            corpus = DocCorpus.load(root_dir, cache=cache)
+            missing_files = check_missing_files(root_dir, corpus, jobs=resolve_jobs(args.jobs))
+            corpus.save_cache()
     
-    if not missing_files:
-        print("No missing files found!")
-        return
+        if not missing_files:
+            print("No missing files found!")
+            return
     
-    print("\nMissing files report:")
-    print("=====================")
+        print("\nMissing files report:")
+        print("=====================")
     
-    for source_file, missing_links in missing_files.items():
-        print(f"\nIn {source_file.relative_to(root_dir)}:")
-        for link in missing_links:
-            print(f"  - Missing: {link}")
+        for source_file, missing_links in missing_files.items():
+            print(f"\nIn {source_file.relative_to(root_dir)}:")
+            for link in missing_links:
+                print(f"  - Missing: {link}")
     
-    # Create a list of unique missing files
-    all_missing = set()
-    for links in missing_files.values():
-        all_missing.update(links)
+        # Create a list of unique missing files
+        all_missing = set()
+        for links in missing_files.values():
+            all_missing.update(links)
     
-    print("\nSummary of unique files to create:")
-    print("================================")
-    for file in sorted(all_missing):
-        print(f"- {file}")
+        print("\nSummary of unique files to create:")
+        print("================================")
+        for file in sorted(all_missing):
+            print(f"- {file}")
+
+        if args.staged or args.since:
+            # Fail the pre-commit hook
+            sys.exit(1)
 
 if __name__ == "__main__":
     main()
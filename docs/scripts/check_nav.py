@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+import os
+import sys
+import time
+import fnmatch
+import logging
+import argparse
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from .config import add_path_arguments, configure_logging, resolve_paths
+from .instrument import add_instrument_arguments, phase, session
+from .path_index import PathIndex
+from .update_nav import load_block
+
+logger = logging.getLogger(__name__)
+
+class NavIssues:
+    def __init__(self):
+        self.orphans: List[str] = []
+        self.dead_entries: List[Tuple[str, str]] = []
+        self.duplicates: Dict[str, int] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self.orphans or self.dead_entries or self.duplicates)
+
+def iter_nav_pages(nav: Any, trail: str = '') -> Iterator[Tuple[str, str]]:
+    """Every page path of a nav tree with the titles leading to it, skipping external links"""
+    if isinstance(nav, list):
+        for item in nav:
+            yield from iter_nav_pages(item, trail)
+    elif isinstance(nav, dict):
+        for title, value in nav.items():
+            yield from iter_nav_pages(value, f"{trail} > {title}" if trail else str(title))
+    elif isinstance(nav, str):
+        if '://' not in nav and not nav.startswith(('/', 'mailto:')):
+            yield trail, nav.split('#', 1)[0]
+
+def _excluded(rel_path: str, patterns: List[str]) -> bool:
+    """Whether a page matches a not_in_nav pattern; patterns without a / match any directory"""
+    for pattern in patterns:
+        if pattern.startswith('/'):
+            if fnmatch.fnmatch(rel_path, pattern[1:]):
+                return True
+        elif fnmatch.fnmatch(rel_path, pattern) or fnmatch.fnmatch(os.path.basename(rel_path), pattern):
+            return True
+    return False
+
+def check_nav(config_file: Path, docs_dir: Optional[Path] = None,
+              index: Optional[PathIndex] = None) -> NavIssues:
+    """
+    Compare the nav of mkdocs.yml with the pages under its docs_dir.
+
+    The nav is parsed once and the tree indexed once; orphans (pages missing
+    from the nav), dead entries (nav paths with no page) and duplicates
+    (pages listed more than once) all fall out of set differences and a
+    counter. Pages matching the config's not_in_nav patterns are not orphans.
+    """
+    config = config_file.read_text(encoding='utf-8')
+    if docs_dir is None:
+        docs_dir = config_file.parent / (load_block(config, 'docs_dir') or 'docs')
+    if index is None:
+        index = PathIndex(docs_dir)
+
+    root = os.path.abspath(docs_dir)
+    # Dot files and directories are never built, as in mkdocs
+    pages = {rel_path for rel_path in (Path(os.path.relpath(path, root)).as_posix()
+                                       for path in index if path.endswith('.md'))
+             if not any(part.startswith('.') for part in rel_path.split('/'))}
+    entries = list(iter_nav_pages(load_block(config, 'nav') or []))
+    listed = Counter(Path(os.path.normpath(page)).as_posix() for _, page in entries)
+    patterns = [line.strip() for line in (load_block(config, 'not_in_nav') or '').splitlines()
+                if line.strip() and not line.strip().startswith('#')]
+
+    issues = NavIssues()
+    issues.orphans = sorted(page for page in pages - listed.keys() if not _excluded(page, patterns))
+    dead = listed.keys() - pages
+    issues.dead_entries = [(trail, page) for trail, page in entries
+                           if Path(os.path.normpath(page)).as_posix() in dead]
+    issues.duplicates = {page: count for page, count in sorted(listed.items()) if count > 1}
+    return issues
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Check that the mkdocs.yml nav matches the documentation tree')
+    add_path_arguments(parser)
+    parser.add_argument('--allow-orphans', action='store_true',
+                        help='Report pages missing from the nav without failing')
+    add_instrument_arguments(parser)
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    with session(stats=args.stats, profile=args.profile, trace=args.trace):
+        _, config_file, docs_dir = resolve_paths(args.docs_dir, args.config)
+        if config_file is None:
+            logger.error("mkdocs.yml not found")
+            sys.exit(2)
+
+        started = time.perf_counter()
+        with phase('check nav'):
+            issues = check_nav(config_file, docs_dir)
+        logger.debug(f"Checked nav in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+        if not issues:
+            print("Navigation matches the documentation tree.")
+            return
+
+        if issues.dead_entries:
+            print(f"\nNav entries without a page ({len(issues.dead_entries)}):")
+            for trail, page in issues.dead_entries:
+                print(f"  - {trail}: {page}")
+        if issues.duplicates:
+            print(f"\nPages listed more than once ({len(issues.duplicates)}):")
+            for page, count in issues.duplicates.items():
+                print(f"  - {page} ({count} times)")
+        if issues.orphans:
+            print(f"\nPages missing from the nav ({len(issues.orphans)}):")
+            for page in issues.orphans:
+                print(f"  - {page}")
+
+        failed = issues.dead_entries or issues.duplicates or (issues.orphans and not args.allow_orphans)
+        sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
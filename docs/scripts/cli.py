@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+docs-tool: one entry point for the documentation tooling.
+
+    docs-tool [-v|-q] [--timings] [--stats] [--profile FILE] [--trace FILE]
+              <command> [command options]
+
+Subcommands are imported only when run, so a quick `docs-tool check` does
+not pay for yaml, asyncio or mkdocs. Start-up (from this module being
+imported to the command being ready to run) is measured on every run and
+a warning is logged when it exceeds the budget.
+"""
+import time
+
+STARTED = time.perf_counter()
+
+import os
+import sys
+import argparse
+import importlib
+import logging
+from typing import Callable, Dict, List, NamedTuple, Optional
+from .config import PACKAGE_ROOT, add_path_arguments, configure_logging, resolve_paths
+from .instrument import add_instrument_arguments, phase, session
+
+logger = logging.getLogger(__name__)
+
+# Milliseconds allowed from start-up to running the command; the tool runs on every commit
+STARTUP_BUDGET_MS = float(os.environ.get('DOCS_TOOL_STARTUP_BUDGET_MS', 150))
+
+class Command(NamedTuple):
+    module: str      # imported when the command runs
+    function: str    # called with the remaining arguments
+    help: str
+
+COMMANDS: Dict[str, Command] = {
+    'check': Command('docs.scripts.cli', 'run_check', 'Report documentation issues without changing anything'),
+    'serve': Command('docs.scripts.serve_docs', 'main', 'Check documentation, then serve it with mkdocs'),
+    'fix-links': Command('docs.scripts.fix_links', 'main', 'Fix relative links'),
+    'anchors': Command('docs.scripts.add_anchors', 'main', 'Add missing header anchors'),
+    'missing': Command('docs.scripts.check_missing_files', 'main', 'Report links to missing files'),
+    'templates': Command('docs.scripts.create_templates', 'main', 'Create missing pages from templates'),
+    'nav': Command('docs.scripts.update_nav', 'main', 'Regenerate the mkdocs.yml nav'),
+    'check-nav': Command('docs.scripts.check_nav', 'main', 'Check the mkdocs.yml nav against the pages'),
+    'rename': Command('scripts.rename_docs', 'main', 'Rename pages to kebab-case and update links'),
+    'diff': Command('scripts.tools.doc_diff', 'main', 'Generate a documentation change report'),
+    'tree': Command('scripts.tools.git_tree', 'main', 'Print paths read from stdin as a tree'),
+    'terms': Command('docs.scripts.terminology', 'main', 'Report misspelled product names and banned phrases'),
+    'bench': Command('docs.scripts.benchmark', 'main', 'Benchmark the tooling on synthetic corpora'),
+}
+
+def load_command(name: str) -> Callable[[Optional[List[str]]], None]:
+    """Import the module of a command and return its entry point"""
+    command = COMMANDS[name]
+    if command.module.startswith('scripts.') and str(PACKAGE_ROOT) not in sys.path:
+        # Repository scripts live outside the docs package
+        sys.path.insert(0, str(PACKAGE_ROOT))
+    return getattr(importlib.import_module(command.module), command.function)
+
+def run_check(argv: Optional[List[str]] = None) -> None:
+    """Scan for every kind of issue and exit with status 1 if any is found"""
+    from .cache import add_cache_arguments, open_cache
+    from .corpus import add_jobs_argument, resolve_jobs
+    from .git_index import add_staged_arguments, staged_corpus
+    from .rules import create_rules, format_issue, registered_rules
+    from .serve_docs import scan_documentation_issues
+
+    rules = registered_rules()
+    parser = argparse.ArgumentParser(description='Report documentation issues without changing anything')
+    add_path_arguments(parser)
+    add_cache_arguments(parser)
+    add_jobs_argument(parser)
+    add_staged_arguments(parser)
+    parser.add_argument('--check-external', action='store_true',
+                        help='Also check http(s) links by requesting them')
+    parser.add_argument('--ignore', action='append', choices=list(rules), default=[], metavar='RULE',
+                        help='Do not run (or fail on) this rule; may be repeated. Rules: ' + ', '.join(rules))
+    parser.add_argument('--rule', action='append', choices=list(rules), default=[], metavar='RULE',
+                        help='Also run this rule, if it is off by default; may be repeated')
+    args = parser.parse_args(argv)
+
+    docs_dir = resolve_paths(args.docs_dir, args.config).docs_dir
+    corpus = None
+    paths = None
+    if args.staged or args.since:
+        # Staged content is not what the cache describes, so it is not used
+        corpus, paths = staged_corpus(docs_dir, since=args.since)
+        cache = None
+    else:
+        cache = open_cache(docs_dir, enabled=not args.no_cache, clear=args.clear_cache,
+                           max_entries=args.cache_size)
+    external = None
+    external_cache = None
+    if args.check_external and 'external' not in args.ignore:
+        from .external_links import ExternalLinkCache, ExternalLinkChecker, default_external_cache_path
+        external = ExternalLinkChecker()
+        if not args.no_cache:
+            external_cache = ExternalLinkCache(default_external_cache_path(docs_dir))
+    issues = scan_documentation_issues(docs_dir, cache=cache, jobs=resolve_jobs(args.jobs),
+                                       external=external, external_cache=external_cache,
+                                       corpus=corpus, paths=paths,
+                                       rules=create_rules(docs_dir, select=args.rule, ignore=args.ignore))
+
+    found = 0
+    for rule, cls in rules.items():
+        files = issues.files(rule)
+        if cls.advisory or not files:
+            continue
+        count = sum(len(items) for items in files.values())
+        found += count
+        print(f"\n{count} {cls.label} in {len(files)} files:")
+        for file_path in sorted(files):
+            for issue in files[file_path]:
+                print(f"  {file_path.relative_to(docs_dir)}: {format_issue(issue)}")
+
+    if not found:
+        print("No documentation issues found.")
+    sys.exit(1 if found else 0)
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog='docs-tool', description='Documentation tooling',
+        epilog='Run "docs-tool <command> --help" for the options of a command.',
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('-v', '--verbose', action='store_true', help='Log debug messages')
+    group.add_argument('-q', '--quiet', action='store_true', help='Log warnings and errors only')
+    parser.add_argument('--timings', action='store_true', help='Print the start-up time to stderr')
+    add_instrument_arguments(parser)
+    parser.add_argument('command', choices=COMMANDS, metavar='command',
+                        help='One of: ' + ', '.join(f"{name} ({command.help})" for name, command in COMMANDS.items()))
+    parser.add_argument('args', nargs=argparse.REMAINDER, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    configure_logging(verbose=args.verbose, quiet=args.quiet)
+    run = load_command(args.command)
+
+    startup_ms = (time.perf_counter() - STARTED) * 1000
+    if args.timings:
+        print(f"docs-tool {args.command}: start-up {startup_ms:.1f} ms (budget {STARTUP_BUDGET_MS:g} ms)",
+              file=sys.stderr)
+    if startup_ms > STARTUP_BUDGET_MS:
+        logger.warning(f"Start-up of '{args.command}' took {startup_ms:.0f} ms, "
+                       f"over the {STARTUP_BUDGET_MS:g} ms budget")
+
+    # Commands parse sys.argv-style lists; their usage lines show the full command
+    sys.argv[0] = f"docs-tool {args.command}"
+    with session(stats=args.stats, profile=args.profile, trace=args.trace):
+        with phase(args.command):
+            run(args.args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+import os
+import re
+import logging
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+# Read without yaml, which costs more to import than most checks take to run
+DOCS_DIR_RE = re.compile(r'^docs_dir:\s*[\'"]?([^\'"\s#]+)', re.MULTILINE)
+# Where mkdocs.yml may live relative to the project root, in order
+CONFIG_LOCATIONS = ('mkdocs.yml', 'docs/mkdocs.yml')
+# Repository root, for when no mkdocs.yml is found above the working directory
+PACKAGE_ROOT = Path(__file__).resolve().parent.parent.parent
+
+class DocsPaths(NamedTuple):
+    """The locations every documentation tool works from"""
+    root: Path                   # project root
+    config_file: Optional[Path]  # mkdocs.yml, None if there is none
+    docs_dir: Path               # directory holding the markdown pages (mkdocs docs_dir)
+
+def find_config(start: Optional[Path] = None) -> Optional[Path]:
+    """The mkdocs.yml of the project containing start (default: the working directory)"""
+    directory = Path(start or os.getcwd()).resolve()
+    for candidate in (directory, *directory.parents):
+        for location in CONFIG_LOCATIONS:
+            config_file = candidate / location
+            if config_file.is_file():
+                return config_file
+    for location in CONFIG_LOCATIONS:
+        config_file = PACKAGE_ROOT / location
+        if config_file.is_file():
+            return config_file
+    return None
+
+def resolve_paths(docs_dir: Optional[str] = None, config: Optional[str] = None,
+                  start: Optional[Path] = None) -> DocsPaths:
+    """
+    Project root, mkdocs.yml and docs directory, from explicit overrides or
+    else from the mkdocs.yml found above the working directory.
+
+    The docs directory is the config's docs_dir, resolved against the
+    config's directory as mkdocs does, so every tool checks the same pages
+    wherever it is started from.
+    """
+    config_file = Path(config).resolve() if config else find_config(start)
+    if config_file is None:
+        root = PACKAGE_ROOT
+        return DocsPaths(root, None, Path(docs_dir).resolve() if docs_dir else root / 'docs' / 'src')
+
+    root = config_file.parent.parent if config_file.parent.name == 'docs' else config_file.parent
+    if docs_dir:
+        return DocsPaths(root, config_file, Path(docs_dir).resolve())
+    match = DOCS_DIR_RE.search(config_file.read_text(encoding='utf-8'))
+    return DocsPaths(root, config_file, config_file.parent / (match.group(1) if match else 'docs'))
+
+def add_path_arguments(parser) -> None:
+    """Register the shared --docs-dir/--config overrides"""
+    parser.add_argument('--docs-dir', default=None,
+                        help='Directory holding the markdown pages (default: docs_dir of mkdocs.yml)')
+    parser.add_argument('--config', default=None,
+                        help='mkdocs.yml to use (default: found from the working directory)')
+
+def configure_logging(verbose: bool = False, quiet: bool = False) -> None:
+    """Set up logging once for every tool; later calls, and basicConfig calls, have no effect"""
+    level = logging.DEBUG if verbose else logging.WARNING if quiet else logging.INFO
+    logging.basicConfig(level=level, format='%(levelname)s:%(name)s:%(message)s')
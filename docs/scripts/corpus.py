@@ -0,0 +1,473 @@
+import os
+import hashlib
+import logging
+from functools import cached_property
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from .fix_links import find_links, fix_link, link_target
+from .add_anchors import get_header_changes
+from .anchors import AnchorIndex, anchor_renames, collect_anchors, split_fragment
+from .cache import DocCache
+from .instrument import count, phase
+from .patch import Edit
+from .path_index import PathIndex
+from .tokenizer import Token, link_tokens, tokenize
+
+logger = logging.getLogger(__name__)
+
+# Below this many files to analyze, process start-up costs more than it saves
+PARALLEL_MIN_FILES = 64
+
+# Reference links are covered by their definitions, autolinks are always external
+LOCAL_LINK_STYLES = ('inline', 'definition', 'html')
+
+def extract_markdown_links(content: str, tokens: Optional[List[Token]] = None) -> Set[str]:
+    """Extract the targets of all local links and images from content."""
+    if tokens is None:
+        tokens = tokenize(content)
+    return {token.target for token in link_tokens(tokens)
+            if token.style in LOCAL_LINK_STYLES and token.target
+            and not token.target.startswith(('http://', 'https://', '#', 'mailto:'))}
+
+def extract_fragment_links(content: str, tokens: Optional[List[Token]] = None) -> Set[str]:
+    """Extract the targets of all local links with a fragment, including same-page #links."""
+    if tokens is None:
+        tokens = tokenize(content)
+    return {token.target for token in link_tokens(tokens)
+            if token.style in LOCAL_LINK_STYLES and '#' in token.target
+            and not token.target.startswith(('http://', 'https://', 'mailto:'))}
+
+def extract_external_links(content: str, tokens: Optional[List[Token]] = None) -> Set[str]:
+    """Extract the http(s) URLs of all links and images, without their #fragment."""
+    if tokens is None:
+        tokens = tokenize(content)
+    return {token.target.split('#', 1)[0] for token in link_tokens(tokens)
+            if token.style != 'reference' and token.target.startswith(('http://', 'https://'))}
+
+class DocFile:
+    """A markdown file, read lazily and tokenized at most once."""
+
+    TOKEN_FIELDS = ('links', 'markdown_links', 'header_changes', 'anchors', 'fragment_links', 'anchor_renames',
+                    'external_links')
+
+    def __init__(self, path: Path, content: Optional[str] = None):
+        self.path = path
+        self._content = content
+        # (st_mtime_ns, st_size) of the file as read, which the cache validates entries by;
+        # None for content that did not come from the file, e.g. a staged blob
+        self.stat: Optional[Tuple[int, int]] = None
+        # Results that depend on the rest of the tree, keyed by check name
+        self.fixes: Dict[str, Any] = {}
+        # Issues found by token rules, keyed by rule and version; cached with the tokens
+        self.rule_results: Dict[str, List[list]] = {}
+
+    @property
+    def content(self) -> str:
+        if self._content is None:
+            with phase('read'):
+                with open(self.path, 'rb') as f:
+                    # Taken from the open file before reading it, so that a later change is never
+                    # cached as this content
+                    st = os.fstat(f.fileno())
+                    data = f.read()
+            self.stat = (st.st_mtime_ns, st.st_size)
+            count('files_read')
+            count('bytes_read', len(data))
+            # Newlines translated as read_text does
+            self._content = data.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+        return self._content
+
+    @cached_property
+    def tokens(self) -> List[Token]:
+        """The file's tokens; every other token property is derived from this single pass"""
+        content = self.content
+        with phase('tokenize'):
+            return tokenize(content)
+
+    @cached_property
+    def links(self) -> List[Tuple[str, int, int]]:
+        """Link matches as returned by find_links"""
+        return find_links(self.content, self.tokens)
+
+    @cached_property
+    def markdown_links(self) -> Set[str]:
+        """Local link targets as returned by extract_markdown_links"""
+        return extract_markdown_links(self.content, self.tokens)
+
+    @cached_property
+    def header_changes(self) -> List[Edit]:
+        """Header anchor changes as returned by get_header_changes"""
+        return get_header_changes(self.content, self.tokens)
+
+    @cached_property
+    def anchors(self) -> Set[str]:
+        """Header IDs and explicit anchors other files can link to"""
+        return collect_anchors(self.tokens)
+
+    @cached_property
+    def fragment_links(self) -> Set[str]:
+        """Local link targets carrying a #fragment, as returned by extract_fragment_links"""
+        return extract_fragment_links(self.content, self.tokens)
+
+    @cached_property
+    def anchor_renames(self) -> Dict[str, str]:
+        """Header IDs that fixing duplicate anchors would change, as returned by anchor_renames"""
+        return anchor_renames(self.tokens)
+
+    @cached_property
+    def external_links(self) -> Set[str]:
+        """External URLs as returned by extract_external_links"""
+        return extract_external_links(self.content, self.tokens)
+
+    def analyze_tokens(self) -> None:
+        """Compute every token field, so that the file need not be read again"""
+        for field in self.TOKEN_FIELDS:
+            getattr(self, field)
+
+    def export_tokens(self) -> Dict[str, Any]:
+        """JSON-serializable form of the tokens computed so far"""
+        tokens = {}
+        for field in self.TOKEN_FIELDS:
+            if field in self.__dict__:
+                value = self.__dict__[field]
+                tokens[field] = sorted(value) if isinstance(value, set) else value
+        if self.rule_results:
+            tokens['rules'] = self.rule_results
+        return tokens
+
+    def restore_tokens(self, tokens: Dict[str, Any]) -> None:
+        """Seed the token properties from a cache entry"""
+        if 'links' in tokens:
+            self.__dict__['links'] = [tuple(link) for link in tokens['links']]
+        if 'markdown_links' in tokens:
+            self.__dict__['markdown_links'] = set(tokens['markdown_links'])
+        if 'anchors' in tokens:
+            self.__dict__['anchors'] = set(tokens['anchors'])
+        if 'fragment_links' in tokens:
+            self.__dict__['fragment_links'] = set(tokens['fragment_links'])
+        if 'external_links' in tokens:
+            self.__dict__['external_links'] = set(tokens['external_links'])
+        if 'anchor_renames' in tokens:
+            self.__dict__['anchor_renames'] = dict(tokens['anchor_renames'])
+        if 'header_changes' in tokens:
+            self.__dict__['header_changes'] = [Edit(*change) for change in tokens['header_changes']]
+        if 'rules' in tokens:
+            self.rule_results = dict(tokens['rules'])
+
+    def is_analyzed(self, fixes: bool = True) -> bool:
+        """Whether every token, and with fixes every fix, used by the checkers is already known"""
+        return (all(field in self.__dict__ for field in self.TOKEN_FIELDS)
+                and (not fixes or ('link_fixes' in self.fixes and 'missing_links' in self.fixes)))
+
+    def restore_fixes(self, fixes: Dict[str, Any]) -> None:
+        """Seed tree-dependent results from a cache entry"""
+        if 'link_fixes' in fixes:
+            self.fixes['link_fixes'] = [Edit(*fix) for fix in fixes['link_fixes']]
+        if 'missing_links' in fixes:
+            self.fixes['missing_links'] = list(fixes['missing_links'])
+
+class DocCorpus:
+    """
+    All markdown files under a docs directory, collected in a single walk.
+
+    Checkers share one corpus so that each file is read once and each
+    tokenizer runs once per file, however many checks consume the result.
+    With a DocCache attached, unchanged files are not read at all.
+    """
+
+    def __init__(self, docs_dir: Path, files: Optional[Dict[Path, DocFile]] = None,
+                 cache: Optional[DocCache] = None):
+        self.docs_dir = docs_dir
+        self.files: Dict[Path, DocFile] = files if files is not None else {}
+        self.cache = cache
+
+    @classmethod
+    def load(cls, docs_dir: Path, cache: Optional[DocCache] = None) -> 'DocCorpus':
+        """Collect every markdown file under docs_dir, reusing cached results where valid"""
+        corpus = cls(docs_dir, cache=cache)
+        with phase('walk'):
+            md_files = list(docs_dir.rglob('*.md'))
+        for md_file in md_files:
+            doc = DocFile(md_file)
+            if cache is not None:
+                entry = cache.get(md_file)
+                if entry is not None:
+                    doc.restore_tokens(entry['tokens'])
+                    if entry.get('tree') == corpus.tree_key:
+                        doc.restore_fixes(entry['fixes'])
+            else:
+                try:
+                    doc.content
+                except Exception as e:
+                    logger.error(f"Error reading {md_file}: {str(e)}")
+                    continue
+            corpus.files[md_file] = doc
+        logger.debug(f"Loaded {len(corpus.files)} markdown files from {docs_dir}")
+        return corpus
+
+    @classmethod
+    def from_contents(cls, docs_dir: Path, contents: Dict[Path, str],
+                      path_index: Optional[PathIndex] = None) -> 'DocCorpus':
+        """
+        A corpus of the given files and content, e.g. blobs staged in git,
+        without reading or walking the working tree. Links are resolved
+        against path_index when given.
+        """
+        corpus = cls(docs_dir, {path: DocFile(path, content) for path, content in contents.items()})
+        if path_index is not None:
+            corpus.__dict__['path_index'] = path_index
+        return corpus
+
+    def add_content(self, path: Path, content: str) -> DocFile:
+        """Add a file with known content, e.g. one needed only for its anchors"""
+        doc = DocFile(path, content)
+        self.files[path] = doc
+        self.__dict__.pop('inbound_fragments', None)
+        self.__dict__.pop('anchor_index', None)
+        return doc
+
+    @cached_property
+    def path_index(self) -> PathIndex:
+        """Every path under docs_dir, used to resolve link targets without stat calls"""
+        return PathIndex(self.docs_dir)
+
+    @cached_property
+    def tree_key(self) -> str:
+        """
+        Fingerprint of every path under docs_dir.
+
+        Link fixes and missing-file results only depend on which paths exist,
+        so cached results are reused while this fingerprint is unchanged.
+        """
+        digest = hashlib.sha1()
+        for path in sorted(self.path_index):
+            digest.update(path.encode('utf-8', 'surrogateescape'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    @cached_property
+    def anchor_index(self) -> AnchorIndex:
+        """Anchor IDs of every file, gathered from tokens the checks extract anyway"""
+        index = AnchorIndex()
+        for doc in self:
+            try:
+                index.set(doc.path, doc.anchors)
+            except Exception as e:
+                logger.error(f"Error indexing anchors in {doc.path}: {str(e)}")
+        return index
+
+    @cached_property
+    def inbound_fragments(self) -> Dict[str, Dict[str, List[Tuple[Path, str]]]]:
+        """Every #fragment link as (source, link), keyed by target file and fragment"""
+        inbound: Dict[str, Dict[str, List[Tuple[Path, str]]]] = {}
+        for doc in self:
+            for link in sorted(doc.fragment_links):
+                path, fragment = split_fragment(link)
+                if not fragment:
+                    continue
+                target = self._resolve_local(path, doc) if path else os.path.abspath(doc.path)
+                inbound.setdefault(target, {}).setdefault(fragment, []).append((doc.path, link))
+        return inbound
+
+    def __iter__(self) -> Iterator[DocFile]:
+        return iter(self.files.values())
+
+    def __len__(self) -> int:
+        return len(self.files)
+
+    def __contains__(self, path: Path) -> bool:
+        return path in self.files
+
+    def get(self, path: Path) -> Optional[DocFile]:
+        return self.files.get(path)
+
+    def link_fixes(self, doc: DocFile, links: Optional[List[Tuple[str, int, int]]] = None) -> List[Edit]:
+        """
+        Link rewrites computed by fix_link for every link in doc. links, the
+        find_links matches of doc, are taken from its tokens unless given,
+        e.g. by the rule that collects them.
+        """
+        if 'link_fixes' not in doc.fixes:
+            links = doc.links if links is None else links
+            changes = []
+            with phase('link fixes'):
+                for link, start, end in links:
+                    old, new = fix_link(link, doc.path, self.docs_dir, self.path_index)
+                    if old != new:
+                        changes.append(Edit(old, new, start, end))
+            doc.fixes['link_fixes'] = changes
+        return doc.fixes['link_fixes']
+
+    def missing_links(self, doc: DocFile, links: Optional[Iterable[str]] = None) -> List[str]:
+        """Local links in doc whose target does not exist, without their #fragment; links as for link_fixes"""
+        if 'missing_links' not in doc.fixes:
+            links = set(doc.markdown_links if links is None else links)
+            missing = {}
+            with phase('missing links'):
+                for link in sorted(links):
+                    path, _ = split_fragment(link)
+                    if path and not self.path_index.exists(self._resolve_local(path, doc)):
+                        missing[path] = None
+            doc.fixes['missing_links'] = list(missing)
+        return doc.fixes['missing_links']
+
+    def broken_anchors(self, doc: DocFile, links: Optional[Iterable[str]] = None) -> List[str]:
+        """
+        Links in doc whose #fragment is not defined by the markdown file they
+        point to; links as for link_fixes.
+
+        Not cached with the other fixes: the result depends on the content of
+        other files, not only on which paths exist. Each link costs one lookup
+        in the anchor index.
+        """
+        broken = []
+        for link in sorted(set(doc.fragment_links if links is None else links)):
+            path, fragment = split_fragment(link)
+            if not fragment:
+                continue
+            target = self._resolve_local(path, doc) if path else os.path.abspath(doc.path)
+            if not self.anchor_index.has(target, fragment):
+                broken.append(link)
+        return broken
+
+    def _resolve_local(self, link: str, doc: DocFile) -> str:
+        """Resolve a local link target, root-relative when it starts with /"""
+        if link.startswith('/'):
+            return self.path_index.resolve(link.lstrip('/'), self.docs_dir)
+        return self.path_index.resolve(link, doc.path.parent)
+
+    def breaking_links(self, doc: DocFile) -> List[Tuple[Path, str, str]]:
+        """Links (source, link, new ID) into doc that its anchor fixes would break"""
+        renames = doc.anchor_renames
+        if not renames:
+            return []
+        inbound = self.inbound_fragments.get(os.path.abspath(doc.path), {})
+        return [(source, link, renames[fragment])
+                for fragment in sorted(renames) for source, link in inbound.get(fragment, [])]
+
+    def link_targets(self, doc: DocFile) -> Set[str]:
+        """Absolute paths of every local file doc links to"""
+        targets = {self._resolve_local(split_fragment(link)[0], doc) for link in doc.markdown_links}
+        for link, _, _ in doc.links:
+            target = link_target(link)
+            if target and not target.startswith('http'):
+                targets.add(self.path_index.resolve(split_fragment(target)[0], doc.path.parent))
+        return targets
+
+    def refresh(self, path: Path) -> DocFile:
+        """Replace the entry for a created or modified file with a fresh, unread one"""
+        doc = DocFile(path)
+        self.files[path] = doc
+        self.__dict__.pop('inbound_fragments', None)
+        if 'anchor_index' in self.__dict__:
+            try:
+                self.anchor_index.set(path, doc.anchors)
+            except Exception as e:
+                logger.error(f"Error indexing anchors in {path}: {str(e)}")
+                self.anchor_index.discard(path)
+        return doc
+
+    def remove(self, path: Path) -> None:
+        """Drop the entry for a deleted file"""
+        self.files.pop(path, None)
+        self.__dict__.pop('inbound_fragments', None)
+        if 'anchor_index' in self.__dict__:
+            self.anchor_index.discard(path)
+
+    def analyze(self, jobs: int = 1, engine=None) -> None:
+        """
+        Compute tokens and fixes for every file not already served from the cache.
+
+        With a RuleEngine, its token rules are run on each file while its
+        tokens are at hand, and link fixes and missing links are left to the
+        rules reporting them, which resolve what they collected. With jobs > 1 the per-file work is spread over a
+        process pool; results are merged back in corpus order, so every
+        consumer sees exactly what the serial path would produce.
+        """
+        pending = [doc for doc in self if not doc.is_analyzed(fixes=engine is None)
+                   or (engine is not None and engine.needs(doc))]
+        if jobs <= 1 or len(pending) < PARALLEL_MIN_FILES:
+            for doc in pending:
+                try:
+                    _analyze(self, doc, engine)
+                except Exception as e:
+                    logger.error(f"Error analyzing {doc.path}: {str(e)}")
+            return
+
+        # Imported here: multiprocessing is slow to import and serial runs never need it
+        from concurrent.futures import ProcessPoolExecutor
+
+        logger.debug(f"Analyzing {len(pending)} files with {jobs} processes")
+        paths = [doc.path for doc in pending]
+        chunksize = max(1, len(paths) // (jobs * 4))
+        # Each worker receives the path index once instead of walking the tree itself
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                 initargs=(self.docs_dir, self.path_index,
+                                           engine.file_engine() if engine is not None else None)) as executor:
+            results = executor.map(_analyze_file, paths, chunksize=chunksize)
+            for doc, (content, stat, tokens, fixes, error) in zip(pending, results):
+                if error:
+                    logger.error(f"Error analyzing {doc.path}: {error}")
+                    continue
+                doc._content = content
+                doc.stat = stat
+                # Read in a worker, whose counters are not collected
+                count('files_read_by_workers')
+                doc.restore_tokens(tokens)
+                doc.restore_fixes(fixes)
+
+    def save_cache(self) -> None:
+        """Persist tokens and fixes computed during this run"""
+        if self.cache is None:
+            return
+        for doc in self:
+            if doc._content is None:
+                # Tokens came from the cache, only fixes may have been recomputed
+                self.cache.update_fixes(doc.path, doc.fixes, tree=self.tree_key)
+                continue
+            if doc.stat is None:
+                # Not the content of the file on disk, which the entry would be validated against
+                continue
+            self.cache.put(doc.path, doc.content, doc.stat, doc.export_tokens(),
+                           fixes=doc.fixes, tree=self.tree_key)
+        self.cache.save()
+
+def _analyze(corpus: DocCorpus, doc: DocFile, engine=None) -> None:
+    """Compute the tokens of doc and run the engine's token rules, or compute its fixes without an engine"""
+    if engine is None:
+        corpus.link_fixes(doc)
+        corpus.missing_links(doc)
+    doc.analyze_tokens()
+    if engine is not None:
+        engine.analyze(doc)
+
+_worker_corpus: Optional[DocCorpus] = None
+_worker_engine = None
+
+def _init_worker(docs_dir: Path, path_index: PathIndex, engine=None) -> None:
+    """Process pool initializer: set up an empty corpus sharing the parent's path index"""
+    global _worker_corpus, _worker_engine
+    _worker_corpus = DocCorpus(docs_dir)
+    _worker_corpus.__dict__['path_index'] = path_index
+    _worker_engine = engine
+
+def _analyze_file(path: Path) -> Tuple[Optional[str], Optional[Tuple[int, int]], Dict[str, Any], Dict[str, Any],
+                                        Optional[str]]:
+    """Process pool worker: analyze a single file outside of the parent's corpus"""
+    doc = DocFile(path)
+    try:
+        _analyze(_worker_corpus, doc, _worker_engine)
+    except Exception as e:
+        return None, None, {}, {}, str(e)
+    return doc.content, doc.stat, doc.export_tokens(), doc.fixes, None
+
+def resolve_jobs(jobs: int) -> int:
+    """Translate a --jobs value into a worker count, 0 meaning one per CPU"""
+    if jobs <= 0:
+        return os.cpu_count() or 1
+    return jobs
+
+def add_jobs_argument(parser) -> None:
+    """Register the shared --jobs flag on an argparse parser"""
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='Number of processes used to analyze files (0 = one per CPU, default: 1)')
@@ -1,18 +1,117 @@
 #!/usr/bin/env python3
-import os
+import re
 import sys
+import fnmatch
+import argparse
 import logging
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Set, List
-import re
+from typing import Dict, Iterable, List, Optional, Tuple
 from datetime import datetime
+from .corpus import DocCorpus, add_jobs_argument, resolve_jobs
+from .batch import ChangeManifest, add_batch_arguments
+from .config import add_path_arguments, configure_logging, resolve_paths
+from .fileio import write_text_atomic
+from .instrument import add_instrument_arguments, session
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+TEMPLATES_DIR = Path(__file__).parent / "templates"
+# A {field} placeholder or a doubled brace; any other brace, such as an
+# attribute list like {: #overview}, is literal text
+PLACEHOLDER_RE = re.compile(r'\{\{|\}\}|\{([A-Za-z_]\w*)\}')
+# Ordered (glob, template) rules matched against the lowercased link path;
+# the first match wins
+DEFAULT_ROUTES: List[Tuple[str, str]] = [
+    ('*components*', 'component'),
+    ('*tokens*', 'token'),
+    ('*changelog*', 'changelog'),
+    ('*', 'guide'),
+]
+
+class Template:
+    """A template split once into literal text and placeholder names"""
+
+    def __init__(self, name: str, text: str):
+        self.name = name
+        self.parts: List[Tuple[str, Optional[str]]] = []
+        position = 0
+        for match in PLACEHOLDER_RE.finditer(text):
+            literal = text[position:match.start()]
+            if match.group(1) is None:
+                literal += match.group(0)[0]
+            self.parts.append((literal, match.group(1)))
+            position = match.end()
+        self.parts.append((text[position:], None))
+        self.fields = {field for _, field in self.parts if field is not None}
+
+    def render(self, context: Dict[str, str]) -> str:
+        """Fill in every placeholder; a field missing from context raises KeyError"""
+        return ''.join(literal + context[field] if field is not None else literal
+                       for literal, field in self.parts)
+
+class TemplateRegistry:
+    """
+    Every template of a directory, read and compiled once, with the ordered
+    glob rules routing a path to its template.
+    """
+
+    def __init__(self, templates_dir: Path = TEMPLATES_DIR, routes: Optional[List[Tuple[str, str]]] = None):
+        self.templates: Dict[str, Template] = {}
+        self.routes = list(routes if routes is not None else DEFAULT_ROUTES)
+        for template_path in sorted(templates_dir.glob('*.md')):
+            try:
+                self.templates[template_path.stem] = Template(template_path.stem,
+                                                              template_path.read_text(encoding='utf-8'))
+            except Exception as e:
+                logger.error(f"Error loading template {template_path.stem}: {str(e)}")
+
+    def route(self, file_path: str) -> str:
+        """Name of the template for a path: the template of the first matching rule"""
+        path_lower = file_path.lower()
+        for pattern, template_name in self.routes:
+            if fnmatch.fnmatchcase(path_lower, pattern):
+                return template_name
+        return self.routes[-1][1] if self.routes else 'guide'
+
+    def render(self, file_path: str, template_name: Optional[str] = None) -> str:
+        """Content of a new page at file_path, or '' if its template is missing or fails"""
+        template_name = template_name or self.route(file_path)
+        template = self.templates.get(template_name)
+        if template is None:
+            logger.error(f"Error loading template {template_name}: no such template")
+            return ""
+        try:
+            return template.render(template_context(file_path))
+        except KeyError as e:
+            logger.error(f"Template {template_name} uses unknown field {str(e)}")
+            return ""
+
+def load_routes(routes_file: Path) -> List[Tuple[str, str]]:
+    """Ordered routing rules from a YAML list of {pattern: ..., template: ...} mappings"""
+    import yaml
+    rules = yaml.safe_load(routes_file.read_text(encoding='utf-8')) or []
+    return [(str(rule['pattern']).lower(), str(rule['template'])) for rule in rules]
+
+@lru_cache(maxsize=None)
+def default_registry() -> TemplateRegistry:
+    return TemplateRegistry()
+
+def template_context(file_path: str) -> Dict[str, str]:
+    """Values available to every template for a page at file_path"""
+    title = Path(file_path).stem.replace('-', ' ').title()
+    return {
+        'title': title,
+        'description': f"Guide for {title.lower()}",
+        'component_name': title.replace(' ', ''),
+        'component_path': str(Path(file_path).parent.name),
+        'token_type': title.lower(),
+        'date': datetime.now().strftime("%Y-%m-%d"),
+    }
+
 def load_template(template_name: str) -> str:
     """Load template content from file."""
-    template_path = Path(__file__).parent / "templates" / f"{template_name}.md"
+    template_path = TEMPLATES_DIR / f"{template_name}.md"
     try:
         return template_path.read_text(encoding='utf-8')
     except Exception as e:
@@ -21,137 +120,146 @@ def load_template(template_name: str) -> str:
 
 def determine_template_type(file_path: str) -> str:
     """Determine the appropriate template type based on the file path."""
-    path_lower = file_path.lower()
-    
-    if "components" in path_lower:
-        return "component"
-    elif "tokens" in path_lower:
-        return "token"
-    elif "changelog" in path_lower:
-        return "changelog"
-    else:
-        return "guide"
+    return default_registry().route(file_path)
 
 def create_template_content(file_path: str, template_type: str) -> str:
     """Create content based on template type and file path."""
-    template = load_template(template_type)
-    if not template:
-        return ""
-        
-    title = Path(file_path).stem.replace('-', ' ').title()
-    
-    if template_type == "component":
-        component_name = title.replace(' ', '')
-        component_path = str(Path(file_path).parent.name)
-        return template.format(
-            title=title,
-            component_name=component_name,
-            component_path=component_path
-        )
-    
-    elif template_type == "token":
-        token_type = title.lower()
-        return template.format(
-            title=title,
-            token_type=token_type
-        )
-    
-    elif template_type == "changelog":
-        return template.format(
-            date=datetime.now().strftime("%Y-%m-%d")
-        )
-    
-    else:  # guide
-        return template.format(
-            title=title,
-            description=f"Guide for {title.lower()}"
-        )
-
-def extract_markdown_links(content: str) -> Set[str]:
-    """Extract all markdown links from content."""
-    links = re.findall(r'\[([^\]]+)\]\(([^)]+)\)', content)
-    return {link for _, link in links if not link.startswith(('http://', 'https://', '#', 'mailto:'))}
-
-def find_missing_files(docs_dir: Path) -> Dict[Path, List[str]]:
-    """Scan markdown files and return a dictionary of source files and their missing referenced files."""
+    return default_registry().render(file_path, template_type)
+
+def find_missing_files(docs_dir: Path, corpus: Optional[DocCorpus] = None, jobs: int = 1,
+                       paths: Optional[Iterable[Path]] = None) -> Dict[Path, List[str]]:
+    """
+    Scan markdown files and return a dictionary of source files and their missing referenced files.
+
+    With paths, only those files of the corpus are scanned.
+    """
     missing_files = {}
+    if corpus is None:
+        corpus = DocCorpus.load(docs_dir)
+    if jobs > 1:
+        corpus.analyze(jobs)
+    docs = [corpus.get(path) for path in paths if path in corpus] if paths is not None else corpus
     
-    for md_file in docs_dir.rglob('*.md'):
+    for doc in docs:
         try:
-            content = md_file.read_text(encoding='utf-8')
-            links = extract_markdown_links(content)
-            
-            file_missing_links = []
-            for link in links:
-                target_path = (docs_dir / link.lstrip('/')) if link.startswith('/') else (md_file.parent / link)
-                target_path = target_path.resolve()
-                
-                if not target_path.exists():
-                    file_missing_links.append(link)
-            
+            file_missing_links = corpus.missing_links(doc)
             if file_missing_links:
-                missing_files[md_file] = file_missing_links
+                missing_files[doc.path] = file_missing_links
                 
         except Exception as e:
-            logger.error(f"Error processing {md_file}: {str(e)}")
+            logger.error(f"Error processing {doc.path}: {str(e)}")
     
     return missing_files
 
-def create_missing_files(docs_dir: Path, missing_files: Dict[Path, List[str]]) -> None:
-    """Create template files for missing documents."""
+def render_missing_files(docs_dir: Path, missing: Iterable[str],
+                         registry: Optional[TemplateRegistry] = None) -> List[Tuple[Path, str, Optional[str]]]:
+    """
+    Render every missing page in one pass: (path, template, content) per page,
+    content None for a page that already exists and '' when rendering failed.
+    """
+    registry = registry or default_registry()
+    rendered = []
+    for file_path in sorted(set(missing)):
+        full_path = docs_dir / file_path.lstrip('/')
+        template_type = registry.route(file_path)
+        if full_path.exists():
+            rendered.append((full_path, template_type, None))
+        else:
+            rendered.append((full_path, template_type, registry.render(file_path, template_type)))
+    return rendered
+
+def create_missing_files(docs_dir: Path, missing_files: Dict[Path, List[str]], dry_run: bool = False,
+                         manifest: Optional[ChangeManifest] = None,
+                         registry: Optional[TemplateRegistry] = None) -> None:
+    """
+    Create template files for missing documents.
+
+    All pages are rendered first, then written as UTF-8 with an atomic
+    replace, creating each new directory once.
+    """
     all_missing = set()
     for links in missing_files.values():
         all_missing.update(links)
-    
-    for file_path in sorted(all_missing):
+
+    created_dirs = set()
+    for full_path, template_type, content in render_missing_files(docs_dir, all_missing, registry):
+        file_path = full_path.relative_to(docs_dir)
         try:
-            full_path = docs_dir / file_path.lstrip('/')
-            full_path.parent.mkdir(parents=True, exist_ok=True)
-            
-            if not full_path.exists():
-                template_type = determine_template_type(str(file_path))
-                content = create_template_content(str(file_path), template_type)
-                if content:
-                    full_path.write_text(content)
+            if content is None:
+                status = 'exists'
+            elif not content:
+                logger.error(f"Failed to create content for {file_path}")
+                status = 'error'
+            elif dry_run:
+                status = 'would-create'
+            else:
+                if full_path.parent not in created_dirs:
+                    full_path.parent.mkdir(parents=True, exist_ok=True)
+                    created_dirs.add(full_path.parent)
+                write_text_atomic(full_path, content, encoding='utf-8')
+                status = 'created'
+                if manifest is None:
                     print(f"Created {template_type} template file: {file_path}")
-                else:
-                    logger.error(f"Failed to create content for {file_path}")
         except Exception as e:
             logger.error(f"Error creating {file_path}: {str(e)}")
+            status = 'error'
+        if manifest is not None:
+            manifest.add_created(full_path, template_type, status)
 
-def main():
-    try:
-        root_dir = Path(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        logger.info(f"Project root directory: {root_dir}")
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Create template files for missing documents')
+    add_path_arguments(parser)
+    add_jobs_argument(parser)
+    add_batch_arguments(parser, choices=None)
+    parser.add_argument('--routes', default=None,
+                        help='YAML list of {pattern, template} rules routing new pages to templates')
+    add_instrument_arguments(parser)
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    with session(stats=args.stats, profile=args.profile, trace=args.trace):
+        try:
+            root_dir, _, docs_dir = resolve_paths(args.docs_dir, args.config)
+            logger.info(f"Project root directory: {root_dir}")
         
-        docs_dir = root_dir / "src"
-        if not docs_dir.exists():
-            logger.error(f"Documentation directory not found: {docs_dir}")
-            sys.exit(1)
+            if not docs_dir.exists():
+                logger.error(f"Documentation directory not found: {docs_dir}")
+                sys.exit(1)
         
-        print("\nScanning for missing files...")
-        missing_files = find_missing_files(docs_dir)
+            registry = TemplateRegistry(routes=load_routes(Path(args.routes))) if args.routes else None
+
+            batch = args.apply or args.dry_run
+            if not batch:
+                print("\nScanning for missing files...")
+            missing_files = find_missing_files(docs_dir, jobs=resolve_jobs(args.jobs))
         
-        if not missing_files:
-            print("No missing files found!")
-            return
+            if batch:
+                manifest = ChangeManifest(docs_dir, dry_run=args.dry_run)
+                create_missing_files(docs_dir, missing_files, dry_run=args.dry_run, manifest=manifest,
+                                     registry=registry)
+                manifest.write(args.manifest)
+                sys.exit(1 if manifest.errors else 0)
+
+            if not missing_files:
+                print("No missing files found!")
+                return
         
-        print("\nMissing files report:")
-        print("=====================")
+            print("\nMissing files report:")
+            print("=====================")
         
-        for source_file, missing_links in missing_files.items():
-            print(f"\nIn {source_file.relative_to(docs_dir)}:")
-            for link in missing_links:
-                print(f"  - Missing: {link}")
+            for source_file, missing_links in missing_files.items():
+                print(f"\nIn {source_file.relative_to(docs_dir)}:")
+                for link in missing_links:
+                    print(f"  - Missing: {link}")
         
-        response = input("\nWould you like to create template files for missing documents? [y/N] ").lower()
-        if response == 'y':
-            create_missing_files(docs_dir, missing_files)
-            print("\nTemplate creation completed!")
+            response = input("\nWould you like to create template files for missing documents? [y/N] ").lower()
+            if response == 'y':
+                create_missing_files(docs_dir, missing_files, registry=registry)
+                print("\nTemplate creation completed!")
         
-    except Exception as e:
-        logger.error(f"Unexpected error: {e}", exc_info=True)
-        sys.exit(1)
+        except Exception as e:
+            logger.error(f"Unexpected error: {e}", exc_info=True)
+            sys.exit(1)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,357 @@
+import ssl
+import json
+import base64
+import time
+import asyncio
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from urllib.parse import SplitResult, quote, unquote, urljoin, urlsplit
+from urllib.request import getproxies_environment, proxy_bypass_environment
+from .fileio import write_text_atomic
+from .instrument import count
+
+logger = logging.getLogger(__name__)
+
+EXTERNAL_CACHE_VERSION = 1
+DEFAULT_TTL = 24 * 60 * 60
+# A host that did not answer is retried sooner than a page that did
+DEFAULT_NO_RESPONSE_TTL = 60 * 60
+DEFAULT_PER_HOST = 4
+DEFAULT_CONCURRENCY = 32
+DEFAULT_TIMEOUT = 10.0
+MAX_REDIRECTS = 5
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+# Servers answering these are up but refused this request; not a broken link
+UNCERTAIN_STATUSES = (401, 403, 429)
+USER_AGENT = 'phoenixvc-docs-link-checker/1.0'
+# Characters left as they are when percent-encoding the request target (RFC 3986 reserved and unreserved)
+PATH_SAFE = "/%:@!$&'()*+,;=-._~"
+QUERY_SAFE = PATH_SAFE + '?'
+
+class LinkResult(NamedTuple):
+    """Outcome of checking a URL; status is None when no response was received"""
+    url: str
+    ok: bool
+    status: Optional[int]
+    error: Optional[str] = None
+
+    @property
+    def responded(self) -> bool:
+        """Whether the server answered at all; timeouts and connection errors did not"""
+        return self.status is not None
+
+def default_external_cache_path(docs_dir: Path) -> Path:
+    """Location of the on-disk external link results for a documentation directory"""
+    return docs_dir.parent / '.cache' / 'external-links.json'
+
+class ExternalLinkCache:
+    """
+    Results of previous external link checks, keyed by URL and kept for ttl
+    seconds, so repeat runs only request expired URLs. Checks that got no
+    response at all are kept for the shorter no_response_ttl, so a dead host
+    is not retried on every run. Uncertain answers (rate limiting,
+    authentication) are never cached.
+    """
+
+    def __init__(self, path: Path, ttl: float = DEFAULT_TTL, no_response_ttl: float = DEFAULT_NO_RESPONSE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.no_response_ttl = min(ttl, no_response_ttl)
+        self.entries: Dict[str, Dict] = {}
+        self._dirty = False
+        if path.exists():
+            try:
+                data = json.loads(path.read_text(encoding='utf-8'))
+                if data.get('version') == EXTERNAL_CACHE_VERSION:
+                    self.entries = data.get('entries', {})
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable external link cache {path}: {str(e)}")
+
+    def _expired(self, entry: Dict, now: float) -> bool:
+        ttl = self.ttl if entry['status'] is not None else self.no_response_ttl
+        return now - entry['checked'] > ttl
+
+    def get(self, url: str) -> Optional[LinkResult]:
+        entry = self.entries.get(url)
+        if entry is None or self._expired(entry, time.time()):
+            count('external_cache_misses')
+            return None
+        count('external_cache_hits')
+        return LinkResult(url, entry['ok'], entry['status'], entry.get('error'))
+
+    def put(self, result: LinkResult) -> None:
+        if result.status in UNCERTAIN_STATUSES:
+            return
+        self.entries[result.url] = {'ok': result.ok, 'status': result.status,
+                                    'error': result.error, 'checked': time.time()}
+        self._dirty = True
+
+    def save(self) -> None:
+        """Write the cache, dropping expired entries"""
+        now = time.time()
+        expired = [url for url, entry in self.entries.items() if self._expired(entry, now)]
+        for url in expired:
+            del self.entries[url]
+        if not self._dirty and not expired:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            write_text_atomic(self.path, json.dumps({'version': EXTERNAL_CACHE_VERSION, 'entries': self.entries}))
+            self._dirty = False
+        except Exception as e:
+            logger.warning(f"Could not write external link cache {self.path}: {str(e)}")
+
+Connection = Tuple[asyncio.StreamReader, asyncio.StreamWriter]
+
+class ConnectionPool:
+    """
+    Idle keep-alive HTTP connections, keyed by scheme, host and port.
+
+    Only connections whose response had no body left to read (HEAD requests)
+    are returned to the pool; anything else is closed. New connections go
+    through the proxy set for their scheme in proxies, by default the
+    http_proxy/https_proxy environment variables, unless no_proxy names the
+    host. Proxies are spoken to in plain HTTP: http requests are sent to
+    them with an absolute target, https ones through a CONNECT tunnel.
+    """
+
+    def __init__(self, proxies: Optional[Dict[str, str]] = None):
+        self.idle: Dict[Tuple[str, str, int], List[Connection]] = {}
+        self.proxies = getproxies_environment() if proxies is None else proxies
+        self._ssl = ssl.create_default_context()
+
+    def proxy(self, scheme: str, host: str) -> Optional[SplitResult]:
+        """The proxy requests for host go through, or None"""
+        proxy = self.proxies.get(scheme)
+        if not proxy or proxy_bypass_environment(host, self.proxies):
+            return None
+        # Proxies are often given without a scheme (host:port)
+        return urlsplit(proxy if '://' in proxy else f"http://{proxy}")
+
+    def reuse(self, key: Tuple[str, str, int]) -> Optional[Connection]:
+        """An idle connection for key that still looks open, or None"""
+        connections = self.idle.get(key)
+        while connections:
+            reader, writer = connections.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer
+            writer.close()
+        return None
+
+    async def connect(self, scheme: str, host: str, port: int) -> Connection:
+        """A new connection to host, through its proxy if it has one"""
+        tls = self._ssl if scheme == 'https' else None
+        proxy = self.proxy(scheme, host)
+        if proxy is None:
+            return await asyncio.open_connection(host, port, ssl=tls, server_hostname=host if tls else None)
+        reader, writer = await asyncio.open_connection(proxy.hostname, proxy.port or 80)
+        if tls is None:
+            return reader, writer
+        try:
+            writer.write((f"CONNECT {host}:{port} HTTP/1.1\r\nHost: {host}:{port}\r\n"
+                          f"{proxy_authorization(proxy)}\r\n").encode('ascii'))
+            await writer.drain()
+            status, _ = await _read_head(reader)
+            if status != 200:
+                raise ConnectionError(f"proxy {proxy.hostname} refused to connect: {status}")
+            await writer.start_tls(tls, server_hostname=host)
+        except BaseException:
+            writer.close()
+            raise
+        return reader, writer
+
+    def release(self, key: Tuple[str, str, int], connection: Connection) -> None:
+        self.idle.setdefault(key, []).append(connection)
+
+    async def close(self) -> None:
+        for connections in self.idle.values():
+            for _, writer in connections:
+                writer.close()
+                try:
+                    await writer.wait_closed()
+                except Exception:
+                    pass
+        self.idle.clear()
+
+def proxy_authorization(proxy: SplitResult) -> str:
+    """Proxy-Authorization header line for the credentials in a proxy URL, if any"""
+    if proxy.username is None:
+        return ''
+    credentials = f"{unquote(proxy.username)}:{unquote(proxy.password or '')}"
+    return f"Proxy-Authorization: Basic {base64.b64encode(credentials.encode('utf-8')).decode('ascii')}\r\n"
+
+async def _read_head(reader: asyncio.StreamReader) -> Tuple[int, Dict[str, str]]:
+    """Read the status line and headers of a response"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("connection closed without a response")
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return status, headers
+
+async def _exchange(pool: ConnectionPool, key: Tuple[str, str, int], connection: Connection,
+                    method: str, request: bytes) -> Tuple[int, Dict[str, str]]:
+    """Send a request over a connection and read the response head, pooling the connection if it can be reused"""
+    reader, writer = connection
+    count('http_requests')
+    reusable = False
+    try:
+        writer.write(request)
+        await writer.drain()
+        status, headers = await _read_head(reader)
+        reusable = method == 'HEAD' and headers.get('connection', '').lower() != 'close'
+        return status, headers
+    finally:
+        if reusable:
+            pool.release(key, connection)
+        else:
+            writer.close()
+
+async def _request(pool: ConnectionPool, method: str, url: str) -> Tuple[int, Dict[str, str]]:
+    """Send one request and read the status line and headers; the body is never read"""
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = parts.hostname or ''
+    port = parts.port or (443 if scheme == 'https' else 80)
+    # The request line and headers must be ASCII: percent-encode the target
+    # (leaving existing escapes alone) and IDNA-encode international host names
+    target = quote(parts.path or '/', safe=PATH_SAFE)
+    if parts.query:
+        target += '?' + quote(parts.query, safe=QUERY_SAFE)
+    host_header = parts.netloc.rsplit('@', 1)[-1]
+    if not host_header.isascii():
+        host = host.encode('idna').decode('ascii')
+        host_header = host_header.encode('idna').decode('ascii')
+    extra = ''
+    proxy = pool.proxy(scheme, host)
+    if proxy is not None and scheme == 'http':
+        target = f"http://{host_header}{target}"
+        extra = proxy_authorization(proxy)
+    request = (f"{method} {target} HTTP/1.1\r\nHost: {host_header}\r\nUser-Agent: {USER_AGENT}\r\n"
+               f"Accept: */*\r\nConnection: keep-alive\r\n{extra}\r\n").encode('ascii')
+
+    key = (scheme, host, port)
+    connection = pool.reuse(key)
+    if connection is not None:
+        try:
+            return await _exchange(pool, key, connection, method, request)
+        except ConnectionError:
+            # The server closed the idle connection, which says nothing about
+            # the link: retry once on a new connection, whose failure counts
+            count('stale_connections')
+    return await _exchange(pool, key, await pool.connect(scheme, host, port), method, request)
+
+async def _fetch(pool: ConnectionPool, method: str, url: str) -> Tuple[int, str]:
+    """Status of url after following redirects, and the final URL"""
+    for _ in range(MAX_REDIRECTS + 1):
+        status, headers = await _request(pool, method, url)
+        if status not in REDIRECT_STATUSES or 'location' not in headers:
+            return status, url
+        url = urljoin(url, headers['location'])
+        if urlsplit(url).scheme not in ('http', 'https'):
+            return status, url
+    raise ConnectionError(f"more than {MAX_REDIRECTS} redirects")
+
+class ExternalLinkChecker:
+    """
+    Checks URLs concurrently with asyncio, at most per_host requests to any
+    one host and concurrency requests overall, over pooled keep-alive
+    connections (through proxies, see ConnectionPool). Each URL is tried
+    with HEAD first and, if that fails or is refused, with GET, as many
+    servers handle HEAD poorly.
+
+    A URL is broken when it answers with an error status, other than the
+    uncertain 401/403/429, or does not answer at all. The latter have no
+    status and are described by their error, e.g. a timeout.
+    """
+
+    def __init__(self, per_host: int = DEFAULT_PER_HOST, concurrency: int = DEFAULT_CONCURRENCY,
+                 timeout: float = DEFAULT_TIMEOUT, proxies: Optional[Dict[str, str]] = None):
+        self.per_host = per_host
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.proxies = proxies
+
+    async def check_all(self, urls: Iterable[str]) -> Dict[str, LinkResult]:
+        pool = ConnectionPool(self.proxies)
+        overall = asyncio.Semaphore(self.concurrency)
+        hosts: Dict[str, asyncio.Semaphore] = {}
+
+        async def check(url: str) -> LinkResult:
+            host = (urlsplit(url).hostname or '').lower()
+            limit = hosts.setdefault(host, asyncio.Semaphore(self.per_host))
+            # The host's slot first: a task queued behind a busy host must not
+            # hold one of the overall slots other hosts could use meanwhile
+            async with limit, overall:
+                return await self._check(pool, url)
+
+        try:
+            results = await asyncio.gather(*(check(url) for url in urls))
+        finally:
+            await pool.close()
+        return {result.url: result for result in results}
+
+    async def _check(self, pool: ConnectionPool, url: str) -> LinkResult:
+        error = None
+        status = None
+        for method in ('HEAD', 'GET'):
+            try:
+                status, _ = await asyncio.wait_for(_fetch(pool, method, url), self.timeout)
+                error = None
+            except asyncio.TimeoutError:
+                status, error = None, f"timed out after {self.timeout:g}s"
+            except Exception as e:
+                status, error = None, str(e) or type(e).__name__
+            if status is not None and status < 400:
+                break
+        ok = status is not None and (status < 400 or status in UNCERTAIN_STATUSES)
+        logger.debug(f"Checked {url}: {status or error}")
+        return LinkResult(url, ok, status, error)
+
+def check_external_links(urls: Iterable[str], cache: Optional[ExternalLinkCache] = None,
+                         checker: Optional[ExternalLinkChecker] = None) -> Dict[str, LinkResult]:
+    """
+    Check every URL once, requesting only those without an unexpired cached
+    result, and return the result of each URL.
+    """
+    results: Dict[str, LinkResult] = {}
+    pending = []
+    for url in sorted(set(urls)):
+        cached = cache.get(url) if cache is not None else None
+        if cached is not None:
+            results[url] = cached
+        else:
+            pending.append(url)
+
+    if pending:
+        logger.info(f"Checking {len(pending)} external links ({len(results)} cached)")
+        checked = asyncio.run((checker or ExternalLinkChecker()).check_all(pending))
+        results.update(checked)
+        if cache is not None:
+            for result in checked.values():
+                cache.put(result)
+    if cache is not None:
+        cache.save()
+    return results
+
+def describe(result: LinkResult) -> str:
+    """One-line description of a failed check, for reports"""
+    return f"{result.url} ({result.status})" if result.responded else f"{result.url} (no response: {result.error})"
+
+def add_external_arguments(parser) -> None:
+    """Register the flags enabling and tuning the external link check"""
+    parser.add_argument('--check-external', action='store_true',
+                        help='Also check http(s) links by requesting them')
+    parser.add_argument('--external-ttl', type=float, default=DEFAULT_TTL,
+                        help=f'Seconds to reuse an external link result (default: {DEFAULT_TTL})')
+    parser.add_argument('--no-response-ttl', type=float, default=DEFAULT_NO_RESPONSE_TTL,
+                        help=f'Seconds to reuse a check that got no response (default: {DEFAULT_NO_RESPONSE_TTL})')
+    parser.add_argument('--per-host', type=int, default=DEFAULT_PER_HOST,
+                        help=f'Concurrent requests per host for the external check (default: {DEFAULT_PER_HOST})')
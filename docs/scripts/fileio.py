@@ -0,0 +1,30 @@
+import os
+import tempfile
+from pathlib import Path
+
+def write_text_atomic(path: Path, content: str, encoding: str = 'utf-8') -> None:
+    """
+    Write content to path through a temporary file in the same directory.
+
+    The file is swapped in with os.replace, so readers (mkdocs serve, the
+    watcher, a concurrent checker) never see a partially written file.
+    """
+    path = Path(path)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding=encoding) as f:
+            f.write(content)
+        if path.exists():
+            os.chmod(tmp_name, path.stat().st_mode & 0o7777)
+        else:
+            # mkstemp creates 0600 files; match what write_text would have done
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(tmp_name, 0o666 & ~umask)
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
@@ -1,21 +1,41 @@
 #!/usr/bin/env python3
 import os
 import re
+import sys
 import logging
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 import argparse
+from .anchors import split_fragment
+from .batch import ChangeManifest, add_batch_arguments, apply_batch, rewrite_file
+from .cache import DocCache, add_cache_arguments, open_cache
+from .config import add_path_arguments, configure_logging, resolve_paths
+from .instrument import add_instrument_arguments, session
+from .patch import Edit
+from .path_index import PathIndex
+from .tokenizer import Token, link_tokens, tokenize
 
 logger = logging.getLogger(__name__)
 
-def find_links(content: str) -> List[Tuple[str, int, int]]:
-    """Find all markdown links in content"""
+def find_links(content: str, tokens: Optional[List[Token]] = None) -> List[Tuple[str, int, int]]:
+    """Find all inline markdown links in content, from the closing ] to the closing )"""
+    if tokens is None:
+        tokens = tokenize(content)
     links = []
-    for match in re.finditer(r'\]\((\.\.\/)*([^)]+)\)', content):
-        links.append((match.group(0), match.start(), match.end()))
+    for token in link_tokens(tokens):
+        if token.style == 'inline':
+            links.append((content[token.text_end:token.end], token.text_end, token.end))
     return links
 
-def fix_link(match: str, current_file: Path, docs_dir: Path) -> Tuple[str, str]:
+def link_target(match: str) -> Optional[str]:
+    """Return the target fix_link resolves for a find_links match, if any"""
+    link_match = re.match(r'\]\((\.\.\/)*([^)]+)\)', match)
+    if not link_match:
+        return None
+    return link_match.group(2)
+
+def fix_link(match: str, current_file: Path, docs_dir: Path,
+             index: Optional[PathIndex] = None) -> Tuple[str, str]:
     """
     Calculate the proper relative path for a link
     
@@ -23,94 +43,111 @@ def fix_link(match: str, current_file: Path, docs_dir: Path) -> Tuple[str, str]:
         match: Original link text
         current_file: Path object of the current markdown file
         docs_dir: Root directory of documentation
+        index: Optional PathIndex used instead of resolving against the filesystem
     
     Returns:
         Tuple of (original link, fixed link)
     """
-    link_pattern = r'\]\((\.\.\/)*([^)]+)\)'
-    link_match = re.match(link_pattern, match)
-    if not link_match:
+    link = link_target(match)
+    if link is None:
         return match, match
 
-    link = link_match.group(2)
     if link.startswith('http'):
         return match, match
+
+    # Only the path is resolved; a #fragment is carried over unchanged and
+    # validated separately against the anchor index
+    link, fragment = split_fragment(link)
+    if not link:
+        return match, match
+    suffix = f'#{fragment}' if fragment is not None else ''
     
     try:
+        if index is not None:
+            target = index.resolve(link, current_file.parent)
+            if not index.exists(target):
+                logger.warning(f"Target file does not exist: {target}")
+                return match, match
+
+            rel_path = os.path.relpath(target, index.resolve('.', current_file.parent))
+            return match, f']({rel_path}{suffix})'
+
         target = (current_file.parent / link).resolve()
-        if not target.exists() and not link.startswith('#'):
+        if not target.exists():
             logger.warning(f"Target file does not exist: {target}")
             return match, match
         
         rel_path = os.path.relpath(target, current_file.parent)
-        return match, f']({rel_path})'
+        return match, f']({rel_path}{suffix})'
     except Exception as e:
         logger.error(f"Error processing link {link}: {str(e)}")
         return match, match
 
-def fix_relative_links(docs_dir: str) -> None:
-    """Fix relative links in markdown files with confirmation prompts"""
+def fix_relative_links(docs_dir: str, cache: Optional[DocCache] = None, apply: bool = False,
+                       dry_run: bool = False) -> Optional[ChangeManifest]:
+    """
+    Fix relative links in markdown files with confirmation prompts
+
+    With apply or dry_run set, no prompt is shown: the fixes are applied (or
+    only planned) in batch and the resulting change manifest is returned.
+    """
+    # Imported here because the corpus itself is built on find_links/fix_link
+    from .corpus import DocCorpus
+
     docs_path = Path(docs_dir)
     if not docs_path.exists():
         logger.error(f"Documentation directory does not exist: {docs_dir}")
-        return
+        return None
 
     logger.info("Scanning for relative links to fix...")
-    files_to_update: Dict[Path, List[Tuple[str, str]]] = {}
+    files_to_update: Dict[Path, List[Edit]] = {}
 
     # First pass: collect all files needing updates
-    for file in docs_path.rglob('*.md'):
+    corpus = DocCorpus.load(docs_path, cache=cache)
+    for doc in corpus:
         try:
-            content = file.read_text(encoding='utf-8')
-            links = find_links(content)
-            
-            if links:
-                changes = []
-                for link, _, _ in links:
-                    old, new = fix_link(link, file, docs_path)
-                    if old != new:
-                        changes.append((old, new))
-                
-                if changes:
-                    files_to_update[file] = changes
+            changes = corpus.link_fixes(doc)
+            if changes:
+                files_to_update[doc.path] = changes
         except Exception as e:
-            logger.error(f"Error processing file {file}: {str(e)}")
+            logger.error(f"Error processing file {doc.path}: {str(e)}")
             continue
+    corpus.save_cache()
+
+    if apply or dry_run:
+        return apply_batch(docs_path, {file_path: {'links': changes} for file_path, changes in files_to_update.items()},
+                           dry_run=dry_run)
 
     if not files_to_update:
         logger.info("No files need link updates")
-        return
+        return None
 
     # Display summary and get confirmation
     print("\nFiles needing link updates:")
     for file_path, changes in files_to_update.items():
         print(f"\n{file_path.relative_to(docs_path)}:")
-        for old, new in changes:
-            print(f"  Old: {old}")
-            print(f"  New: {new}")
+        for change in changes:
+            print(f"  Old: {change.old}")
+            print(f"  New: {change.new}")
 
     response = input("\nWould you like to proceed with these changes? [y/N]: ").lower()
     
     if response != 'y':
         logger.info("Operation cancelled by user")
-        return
+        return None
 
     # Second pass: apply confirmed changes
     for file_path, changes in files_to_update.items():
         try:
-            content = file_path.read_text(encoding='utf-8')
-            
             print(f"\nUpdating {file_path.relative_to(docs_path)}")
             print("Changes to be made:")
-            for old, new in changes:
-                print(f"  {old} -> {new}")
+            for change in changes:
+                print(f"  {change.old} -> {change.new}")
             
             response = input("Proceed with this file? [y/N]: ").lower()
             
             if response == 'y':
-                for old, new in changes:
-                    content = content.replace(old, new)
-                file_path.write_text(content, encoding='utf-8')
+                rewrite_file(file_path, changes)
                 print(f"Updated {file_path.relative_to(docs_path)}")
             else:
                 print(f"Skipped {file_path.relative_to(docs_path)}")
@@ -120,14 +157,25 @@ def fix_relative_links(docs_dir: str) -> None:
             continue
 
     logger.info("Completed fixing relative links")
+    return None
 
-if __name__ == '__main__':
+def main(argv: Optional[List[str]] = None):
     parser = argparse.ArgumentParser(description='Fix relative links in markdown files')
-    parser.add_argument('--docs-dir', default='docs', help='Documentation directory path')
-    args = parser.parse_args()
-    
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s'
-    )
-    fix_relative_links(args.docs_dir)
+    add_path_arguments(parser)
+    add_cache_arguments(parser)
+    add_batch_arguments(parser, choices=None)
+    add_instrument_arguments(parser)
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    with session(stats=args.stats, profile=args.profile, trace=args.trace):
+        docs_dir = resolve_paths(args.docs_dir, args.config).docs_dir
+        cache = open_cache(docs_dir, enabled=not args.no_cache, clear=args.clear_cache,
+                           max_entries=args.cache_size)
+        manifest = fix_relative_links(str(docs_dir), cache=cache, apply=args.apply, dry_run=args.dry_run)
+        if manifest is not None:
+            manifest.write(args.manifest)
+            sys.exit(1 if manifest.errors else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+import os
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+from .corpus import DocCorpus
+from .path_index import PathIndex
+
+logger = logging.getLogger(__name__)
+
+# Pages whose links usually name their directory rather than the file
+INDEX_PAGES = ('index.md', 'README.md')
+
+class StagedChanges(NamedTuple):
+    """Markdown files of a commit, as absolute paths"""
+    changed: List[Path]  # added, modified or renamed-to files
+    removed: List[Path]  # deleted files and the old names of renamed ones
+
+def _git(repo_root: Path, *args: str, input: Optional[bytes] = None, ok_codes: Tuple[int, ...] = (0,)) -> bytes:
+    # Imported here: only the staged checks start git, and subprocess is slow to import
+    import subprocess
+    result = subprocess.run(['git', *args], cwd=repo_root, input=input,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode not in ok_codes:
+        raise RuntimeError(f"git {args[0]} failed: {result.stderr.decode('utf-8', 'replace').strip()}")
+    return result.stdout
+
+def repo_root(path: Path) -> Path:
+    """Top-level directory of the git work tree containing path"""
+    return Path(_git(path, 'rev-parse', '--show-toplevel').decode('utf-8').strip())
+
+def staged_changes(root: Path, docs_dir: Path, since: Optional[str] = None) -> StagedChanges:
+    """
+    Markdown files under docs_dir that differ between the index and HEAD,
+    or the since revision, read with a single git diff.
+
+    --name-status rather than --name-only, so that deletions and renames
+    come out of the same call.
+    """
+    args = ['diff', '--cached', '--name-status', '-z', '-M', '--no-ext-diff']
+    if since:
+        args.append(since)
+    fields = _git(root, *args, '--', os.path.relpath(docs_dir, root)).decode('utf-8').split('\0')
+
+    changed: List[Path] = []
+    removed: List[Path] = []
+    i = 0
+    while i < len(fields) - 1:
+        status = fields[i][:1]
+        if status in ('R', 'C'):
+            old, new = fields[i + 1], fields[i + 2]
+            i += 3
+            if status == 'R' and old.endswith('.md'):
+                removed.append(root / old)
+        else:
+            new = fields[i + 1]
+            i += 2
+            if status == 'D':
+                if new.endswith('.md'):
+                    removed.append(root / new)
+                continue
+        if new.endswith('.md'):
+            changed.append(root / new)
+    return StagedChanges(changed, removed)
+
+def read_staged(root: Path, paths: Iterable[Path]) -> Dict[Path, str]:
+    """Staged content of every file, read with a single git cat-file; files not in the index are left out"""
+    paths = list(paths)
+    if not paths:
+        return {}
+    request = ''.join(f":{Path(os.path.relpath(path, root)).as_posix()}\n" for path in paths)
+    output = _git(root, 'cat-file', '--batch', input=request.encode('utf-8'))
+
+    contents: Dict[Path, str] = {}
+    position = 0
+    for path in paths:
+        end = output.index(b'\n', position)
+        header = output[position:end].split()
+        position = end + 1
+        if header[-1] == b'missing':
+            continue
+        size = int(header[2])
+        try:
+            contents[path] = output[position:position + size].decode('utf-8')
+        except UnicodeDecodeError as e:
+            logger.error(f"Error reading staged {path}: {str(e)}")
+        position += size + 1
+    return contents
+
+def staged_paths(root: Path, docs_dir: Path) -> List[str]:
+    """Absolute paths of every file under docs_dir in the index"""
+    output = _git(root, 'ls-files', '--cached', '-z', '--', os.path.relpath(docs_dir, root))
+    return [os.path.join(root, name) for name in output.decode('utf-8').split('\0') if name]
+
+def linking_candidates(root: Path, docs_dir: Path, removed: Iterable[Path]) -> List[Path]:
+    """
+    Staged markdown files that may link to a removed file: those mentioning its
+    name, or its directory's name for index pages, found with a single git grep.
+    """
+    patterns: Set[str] = set()
+    for path in removed:
+        patterns.add(path.name)
+        if path.name in INDEX_PAGES:
+            patterns.add(path.parent.name)
+    if not patterns:
+        return []
+    args = ['grep', '--cached', '-l', '-z', '-F']
+    for pattern in sorted(patterns):
+        args += ['-e', pattern]
+    # git grep exits with 1 when nothing matches
+    output = _git(root, *args, '--', os.path.relpath(docs_dir, root), ok_codes=(0, 1))
+    return [root / name for name in output.decode('utf-8').split('\0') if name.endswith('.md')]
+
+def staged_corpus(docs_dir: Path, since: Optional[str] = None) -> Tuple[DocCorpus, List[Path]]:
+    """
+    A corpus of staged content for a pre-commit check, and the files to check.
+
+    The files to check are the changed markdown files plus those linking to a
+    file the commit deletes or renames. Links are resolved against the files
+    of the index, and the pages checked files link to are loaded for their
+    anchors only. Nothing in the working tree is read, and
+    the cost follows the size of the commit rather than of the tree.
+    """
+    docs_dir = Path(os.path.abspath(docs_dir))
+    root = repo_root(docs_dir)
+    changes = staged_changes(root, docs_dir, since)
+    logger.debug(f"{len(changes.changed)} changed and {len(changes.removed)} removed markdown files")
+
+    index = PathIndex(docs_dir, staged_paths(root, docs_dir))
+    candidates = [path for path in linking_candidates(root, docs_dir, changes.removed)
+                  if path not in changes.changed]
+    contents = read_staged(root, changes.changed + candidates)
+    corpus = DocCorpus.from_contents(docs_dir, contents, index)
+
+    removed = {os.path.abspath(path) for path in changes.removed}
+    checked = [path for path in changes.changed if path in corpus]
+    for path in candidates:
+        doc = corpus.get(path)
+        if doc is None:
+            continue
+        if corpus.link_targets(doc) & removed:
+            checked.append(path)
+        else:
+            corpus.remove(path)
+
+    # Pages the checked files link to, loaded for their anchors only
+    targets = set()
+    for path in checked:
+        for target in corpus.link_targets(corpus.get(path)):
+            if target.endswith('.md') and Path(target) not in corpus and index.exists(target):
+                targets.add(Path(target))
+    for path, content in read_staged(root, sorted(targets)).items():
+        corpus.add_content(path, content)
+
+    logger.info(f"Checking {len(checked)} staged markdown files")
+    return corpus, checked
+
+def add_staged_arguments(parser) -> None:
+    """Register the mutually exclusive --staged/--since flags"""
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--staged', action='store_true',
+                       help='Check only the staged markdown files, and files linking to ones it removes')
+    group.add_argument('--since', metavar='REV', default=None,
+                       help='Like --staged, for every change between REV and the index')
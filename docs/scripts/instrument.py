@@ -0,0 +1,143 @@
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+from .fileio import write_text_atomic
+
+logger = logging.getLogger(__name__)
+
+class Stats:
+    """
+    Phase timers, counters and, when tracing, Chrome trace events of one run.
+
+    Recording is off until a session enables it; until then phase() and
+    count() cost a flag check.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.tracing = False
+        self.origin = time.perf_counter()
+        self.counters: Counter = Counter()
+        # Phase name -> [calls, seconds]; nested phases are included in their parents
+        self.phases: Dict[str, List[float]] = {}
+        self.events: List[Dict[str, Any]] = []
+
+STATS = Stats()
+
+class _Phase:
+    __slots__ = ('name', 'started')
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self) -> '_Phase':
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        ended = time.perf_counter()
+        totals = STATS.phases.get(self.name)
+        if totals is None:
+            totals = STATS.phases[self.name] = [0, 0.0]
+        totals[0] += 1
+        totals[1] += ended - self.started
+        if STATS.tracing:
+            STATS.events.append({'name': self.name, 'cat': 'docs', 'ph': 'X',
+                                 'ts': (self.started - STATS.origin) * 1e6, 'dur': (ended - self.started) * 1e6,
+                                 'pid': os.getpid(), 'tid': threading.get_ident()})
+
+class _NoPhase:
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc_info) -> None:
+        return None
+
+_NO_PHASE = _NoPhase()
+
+def phase(name: str):
+    """Context manager timing a phase of the run, e.g. `with phase('walk'): ...`"""
+    return _Phase(name) if STATS.enabled else _NO_PHASE
+
+def count(name: str, n: int = 1) -> None:
+    """Add n to a counter such as files_read or cache_hits"""
+    if STATS.enabled:
+        STATS.counters[name] += n
+
+def format_stats(stats: Stats = STATS) -> str:
+    """Phase and counter summary, slowest phases first"""
+    lines = [f"{'phase':<32}{'calls':>10}{'total (ms)':>14}"]
+    for name, (calls, seconds) in sorted(stats.phases.items(), key=lambda item: -item[1][1]):
+        lines.append(f"{name:<32}{calls:>10}{seconds * 1000:>14.1f}")
+    if stats.counters:
+        lines.append('')
+        lines.append(f"{'counter':<32}{'value':>10}")
+        for name, value in sorted(stats.counters.items()):
+            lines.append(f"{name:<32}{value:>10}")
+    return '\n'.join(lines)
+
+def trace_document(stats: Stats = STATS) -> Dict[str, Any]:
+    """The recorded phases as Chrome trace JSON (chrome://tracing, Perfetto), with the final counters"""
+    events = list(stats.events)
+    if stats.counters:
+        events.append({'name': 'counters', 'ph': 'C', 'ts': (time.perf_counter() - stats.origin) * 1e6,
+                       'pid': os.getpid(), 'args': dict(stats.counters)})
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+@contextmanager
+def session(stats: bool = False, profile: Optional[str] = None, trace: Optional[str] = None) -> Iterator[None]:
+    """
+    Record the enclosed run and, on the way out (including sys.exit and
+    Ctrl-C), print the --stats summary to stderr, dump the cProfile data to
+    profile and write the Chrome trace to trace.
+
+    Sessions nest: an inner session only adds what no outer one records.
+    """
+    own_stats = (stats or trace is not None) and not STATS.enabled
+    own_trace = trace is not None and not STATS.tracing
+    if own_stats:
+        STATS.enabled = True
+    if own_trace:
+        STATS.tracing = True
+    profiler = None
+    if profile:
+        # Imported here: only --profile needs it
+        import cProfile
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler, e.g. an outer --profile, is already running
+            logger.warning(f"A profiler is already active; not writing {profile}")
+            profiler = None
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(profile)
+            logger.info(f"Profile written to {profile}")
+        if own_trace:
+            write_text_atomic(Path(trace), json.dumps(trace_document()))
+            logger.info(f"Trace written to {trace}")
+            STATS.tracing = False
+        if own_stats:
+            if stats:
+                print('\n' + format_stats(), file=sys.stderr)
+            STATS.enabled = False
+
+def add_instrument_arguments(parser) -> None:
+    """Register the shared --stats/--profile/--trace flags"""
+    parser.add_argument('--stats', action='store_true',
+                        help='Print phase timings and counters (files read, cache hits, ...) to stderr at exit')
+    parser.add_argument('--profile', metavar='FILE', default=None,
+                        help='Write cProfile data for the run to FILE (view with pstats or snakeviz)')
+    parser.add_argument('--trace', metavar='FILE', default=None,
+                        help='Write the phases of the run to FILE as Chrome trace JSON')
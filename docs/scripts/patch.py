@@ -0,0 +1,66 @@
+from typing import Iterable, List, NamedTuple, Tuple
+
+class Edit(NamedTuple):
+    """Replace content[start:end], which must read old, with new"""
+    old: str
+    new: str
+    start: int
+    end: int
+
+class PatchError(ValueError):
+    """Raised when a set of edits cannot be applied to a file"""
+
+class OverlappingEditError(PatchError):
+    pass
+
+class StaleEditError(PatchError):
+    pass
+
+def _nest(outer: Edit, inner: List[Edit]) -> Edit:
+    """
+    outer with the edits within it applied to its replacement.
+
+    This is how e.g. a link fix inside a header line survives the anchor fix
+    that rewrites the whole line: the replacement must still read each inner
+    old text at the same offset, else the edits conflict.
+    """
+    try:
+        new = apply_edits(outer.new, [edit._replace(start=edit.start - outer.start, end=edit.end - outer.start)
+                                      for edit in inner])
+    except PatchError as e:
+        raise OverlappingEditError(f"Edits within {outer.start}-{outer.end} conflict with it: {str(e)}")
+    return outer._replace(new=new)
+
+def apply_edits(content: str, edits: Iterable[Edit]) -> str:
+    """
+    Apply every edit to content in one linear splice.
+
+    Edits are located by the offsets recorded when the file was scanned, so
+    identical text elsewhere in the file is never touched. Duplicate edits
+    are applied once, and an edit within another is applied to the other's
+    replacement. Edits that partially overlap, or whose span no longer reads
+    old (the file changed since it was scanned), raise a PatchError.
+    """
+    groups: List[Tuple[Edit, List[Edit]]] = []
+    # Outer edits first, so that the edits within them follow
+    for edit in sorted(set(edits), key=lambda e: (e.start, -e.end)):
+        if content[edit.start:edit.end] != edit.old:
+            raise StaleEditError(f"Expected {edit.old!r} at {edit.start}-{edit.end}, "
+                                 f"found {content[edit.start:edit.end]!r}")
+        if groups and edit.start < groups[-1][0].end:
+            outer, inner = groups[-1]
+            if edit.end > outer.end:
+                raise OverlappingEditError(f"Edit at {edit.start}-{edit.end} overlaps edit at "
+                                           f"{outer.start}-{outer.end}")
+            inner.append(edit)
+        else:
+            groups.append((edit, []))
+
+    parts: List[str] = []
+    position = 0
+    for edit, inner in groups:
+        parts.append(content[position:edit.start])
+        parts.append(_nest(edit, inner).new if inner else edit.new)
+        position = edit.end
+    parts.append(content[position:])
+    return ''.join(parts)
@@ -0,0 +1,96 @@
+import os
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Set, Tuple, Union
+from .instrument import count, phase
+
+logger = logging.getLogger(__name__)
+
+class PathIndex:
+    """
+    Every file and directory under a root, collected with one os.scandir walk.
+
+    Link targets are resolved by string normalization and checked with a set
+    lookup instead of Path.resolve()/exists(), so checking thousands of links
+    costs no stat calls. Resolutions are memoized per source directory. Paths
+    outside the root fall back to os.path.exists, memoized as well.
+
+    Unlike Path.resolve(), normalization does not follow symlinks.
+
+    Given paths, such as the files of the git index, the index holds those
+    files and their parent directories instead of walking the root.
+    """
+
+    def __init__(self, root: Union[str, Path], paths: Optional[Iterable[str]] = None):
+        self.root = os.path.abspath(root)
+        self.paths: Set[str] = {self.root}
+        self._prefix = os.path.join(self.root, '')
+        self._resolved: Dict[Tuple[str, str], str] = {}
+        self._outside: Dict[str, bool] = {}
+        if paths is None:
+            with phase('index paths'):
+                self._walk()
+        else:
+            for path in paths:
+                self.add(path)
+
+    def _walk(self) -> None:
+        stack = [self.root]
+        while stack:
+            directory = stack.pop()
+            count('dirs_scanned')
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        self.paths.add(entry.path)
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+            except OSError as e:
+                logger.debug(f"Cannot index {directory}: {str(e)}")
+        logger.debug(f"Indexed {len(self.paths)} paths under {self.root}")
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.paths)
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def add(self, path: str) -> None:
+        """Record a created file or directory, including any new parent directories"""
+        path = os.path.abspath(path)
+        while path not in self.paths and path.startswith(self._prefix):
+            self.paths.add(path)
+            path = os.path.dirname(path)
+
+    def discard(self, path: str) -> None:
+        """Forget a deleted file or directory and everything below it"""
+        path = os.path.abspath(path)
+        if path not in self.paths:
+            return
+        self.paths.discard(path)
+        children = os.path.join(path, '')
+        self.paths.difference_update([p for p in self.paths if p.startswith(children)])
+
+    def resolve(self, link: str, source_dir: Union[str, Path]) -> str:
+        """Absolute, normalized path of link relative to source_dir"""
+        key = (str(source_dir), link)
+        count('links_resolved')
+        resolved = self._resolved.get(key)
+        if resolved is None:
+            resolved = os.path.normpath(os.path.join(os.path.abspath(source_dir), link))
+            self._resolved[key] = resolved
+        return resolved
+
+    def exists(self, path: str) -> bool:
+        """Whether an absolute, normalized path exists"""
+        if path == self.root or path.startswith(self._prefix):
+            return path in self.paths
+        exists = self._outside.get(path)
+        if exists is None:
+            count('stat_calls')
+            exists = self._outside[path] = os.path.exists(path)
+        return exists
+
+    def relative(self, path: str) -> str:
+        """path relative to the index root, with forward slashes"""
+        return os.path.relpath(path, self.root).replace(os.sep, '/')
@@ -0,0 +1,385 @@
+import logging
+import importlib
+from bisect import bisect_right
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple, Type
+from .add_anchors import get_header_changes
+from .anchors import split_fragment
+from .corpus import LOCAL_LINK_STYLES, DocCorpus, DocFile
+from .instrument import phase
+from .patch import Edit
+from .tokenizer import HeaderToken, LinkToken, Token
+
+if TYPE_CHECKING:
+    # asyncio and ssl are only imported when external links are checked
+    from .external_links import ExternalLinkCache, ExternalLinkChecker
+
+logger = logging.getLogger(__name__)
+
+# Token kinds a rule can visit, as returned by the kind of each token
+TOKEN_KINDS = ('link', 'image', 'header', 'anchor', 'code', 'comment', 'front_matter')
+
+# Names of the built-in rules, also the categories of `docs-tool check --ignore`
+LINKS = 'links'
+ANCHORS = 'anchors'
+BREAKING = 'breaking'
+MISSING = 'missing'
+FRAGMENTS = 'fragments'
+EXTERNAL = 'external'
+
+class Issue(NamedTuple):
+    """One finding of a rule; line and column are 1-based and only known for token rules"""
+    rule: str
+    path: Path
+    message: str
+    line: Optional[int] = None
+    column: Optional[int] = None
+    edit: Optional[Edit] = None   # the automatic fix, for fixable rules
+    detail: Any = None            # rule-specific data, e.g. the missing link
+
+def format_issue(issue: Issue) -> str:
+    """The message of an issue, prefixed with line:column when known"""
+    if issue.line is None:
+        return issue.message
+    return f"{issue.line}:{issue.column}: {issue.message}"
+
+class IssueReport:
+    """Every issue of a scan, grouped by rule and then by file in the order found"""
+
+    def __init__(self):
+        self.rules: Dict[str, Dict[Path, List[Issue]]] = {}
+
+    def add(self, issue: Issue) -> None:
+        self.rules.setdefault(issue.rule, {}).setdefault(issue.path, []).append(issue)
+
+    def files(self, rule: str) -> Dict[Path, List[Issue]]:
+        """Issues of a rule per file"""
+        return self.rules.get(rule, {})
+
+    def edits(self, rule: str) -> Dict[Path, List[Edit]]:
+        """Fixes of a fixable rule per file"""
+        return {path: [issue.edit for issue in issues] for path, issues in self.files(rule).items()}
+
+    def details(self, rule: str) -> Dict[Path, List[Any]]:
+        """Rule-specific details per file, e.g. the links of the missing rule"""
+        return {path: [issue.detail for issue in issues] for path, issues in self.files(rule).items()}
+
+    def count(self, rule: str) -> int:
+        return sum(len(issues) for issues in self.files(rule).values())
+
+    def __bool__(self) -> bool:
+        return any(self.rules.values())
+
+class FileContext:
+    """What a token rule sees of the file being visited, and where it reports"""
+
+    def __init__(self, doc: DocFile):
+        self.doc = doc
+        self.path = doc.path
+        self.results: Dict[str, List[list]] = {}
+        self._line_starts: Optional[List[int]] = None
+
+    @property
+    def content(self) -> str:
+        return self.doc.content
+
+    def position(self, offset: int) -> Tuple[int, int]:
+        """1-based line and column of a character offset"""
+        if self._line_starts is None:
+            content = self.content
+            starts = [0]
+            position = content.find('\n')
+            while position != -1:
+                starts.append(position + 1)
+                position = content.find('\n', position + 1)
+            self._line_starts = starts
+        line = bisect_right(self._line_starts, offset)
+        return line, offset - self._line_starts[line - 1] + 1
+
+    def report(self, rule: str, message: str, start: Optional[int] = None,
+               edit: Optional[Edit] = None, detail: Any = None) -> None:
+        """Record an issue at character offset start"""
+        line, column = self.position(start) if start is not None else (None, None)
+        # Kept in the JSON form of the doc cache, which stores it with the tokens
+        self.results.setdefault(rule, []).append([message, line, column, list(edit) if edit else None, detail])
+
+class Rule:
+    """
+    A check run over every scanned file.
+
+    Token rules list the token kinds they visit in `kinds` and implement
+    visit_<kind>(token, context) for each, plus begin/end for per-file
+    state. All token rules share one pass over a file's tokens, and their
+    results are cached with the tokens, so an unchanged file is neither
+    read nor visited again. Rules that depend on the rest of the tree
+    implement check(), which runs on the cached tokens of every scanned
+    file, and finish(), which runs once after all files. Token rules can
+    be tree-dependent too: they then override report().
+    """
+    name = ''
+    label = ''            # heading of the rule's issues in reports, e.g. "links to missing files"
+    kinds: Tuple[str, ...] = ()
+    default = True        # run unless ignored; other rules run only when selected
+    advisory = False      # issues only explain another rule's fixes and never fail a check
+    version = 1           # bump when the rule's results change, to invalidate cached ones
+
+    @classmethod
+    def create(cls, docs_dir: Path) -> 'Rule':
+        """The rule as configured for docs_dir; rules reading configuration files override this"""
+        return cls()
+
+    @property
+    def key(self) -> str:
+        """Key of the rule's cached results"""
+        return f"{self.name}@{self.version}"
+
+    def begin(self, context: FileContext) -> None:
+        pass
+
+    def end(self, context: FileContext) -> None:
+        pass
+
+    def report(self, corpus: DocCorpus, doc: DocFile, results: List[list], report: IssueReport) -> None:
+        """
+        Report the results of a token rule for doc. Results only depend on
+        the file; rules whose issues also depend on the rest of the tree
+        collect candidates instead and resolve them here.
+        """
+        for message, line, column, edit, detail in results:
+            report.add(Issue(self.name, doc.path, message, line, column, Edit(*edit) if edit else None, detail))
+
+    def check(self, corpus: DocCorpus, doc: DocFile, report: IssueReport) -> None:
+        pass
+
+    def finish(self, corpus: DocCorpus, docs: List[DocFile], report: IssueReport) -> None:
+        pass
+
+RULES: Dict[str, Type[Rule]] = {}
+
+# Modules registering further rules, imported when the registry is first used
+RULE_MODULES = ('.terminology',)
+
+def register_rule(cls: Type[Rule]) -> Type[Rule]:
+    """Class decorator adding a rule to the registry under its name"""
+    RULES[cls.name] = cls
+    return cls
+
+def registered_rules() -> Dict[str, Type[Rule]]:
+    """The registry, including the rules of RULE_MODULES"""
+    for module in RULE_MODULES:
+        importlib.import_module(module, __package__)
+    return RULES
+
+def create_rules(docs_dir: Path, select: Iterable[str] = (), ignore: Iterable[str] = ()) -> List[Rule]:
+    """Instances, configured for docs_dir, of the default rules plus the selected ones, less the ignored ones"""
+    rules = registered_rules()
+    select = set(select)
+    ignore = set(ignore)
+    unknown = (select | ignore) - set(rules)
+    if unknown:
+        raise ValueError(f"Unknown rules: {', '.join(sorted(unknown))}")
+    return [cls.create(docs_dir) for name, cls in rules.items()
+            if (cls.default or name in select) and name not in ignore]
+
+def _dispatch(rules: Sequence[Rule]) -> Dict[str, List[Callable[[Token, FileContext], None]]]:
+    """Token kind -> visit methods of the rules visiting it"""
+    dispatch: Dict[str, List[Callable[[Token, FileContext], None]]] = {}
+    for rule in rules:
+        for kind in rule.kinds:
+            dispatch.setdefault(kind, []).append(getattr(rule, f"visit_{kind}"))
+    return dispatch
+
+class RuleEngine:
+    """Runs a set of rules over the files of a corpus and collects their issues"""
+
+    def __init__(self, rules: Sequence[Rule]):
+        self.rules = list(rules)
+        self.token_rules = [rule for rule in self.rules if rule.kinds]
+        self.dispatch = _dispatch(self.token_rules)
+
+    def file_engine(self) -> 'RuleEngine':
+        """An engine with the token rules only, as sent to analysis workers"""
+        return RuleEngine(self.token_rules)
+
+    def needs(self, doc: DocFile) -> bool:
+        """Whether some token rule has no results for doc yet"""
+        return any(rule.key not in doc.rule_results for rule in self.token_rules)
+
+    def analyze(self, doc: DocFile) -> None:
+        """Run the token rules doc has no results for, in a single pass over its tokens"""
+        rules = [rule for rule in self.token_rules if rule.key not in doc.rule_results]
+        if not rules:
+            return
+        dispatch = self.dispatch if len(rules) == len(self.token_rules) else _dispatch(rules)
+        tokens = doc.tokens
+        context = FileContext(doc)
+        with phase('rules'):
+            for rule in rules:
+                rule.begin(context)
+            for token in tokens:
+                visitors = dispatch.get(token.kind)
+                if visitors:
+                    for visit in visitors:
+                        visit(token, context)
+            for rule in rules:
+                rule.end(context)
+        for rule in rules:
+            # Drop results of other versions of the rule, so they do not pile up in the cache
+            for key in [key for key in doc.rule_results if key.split('@', 1)[0] == rule.name]:
+                del doc.rule_results[key]
+            doc.rule_results[rule.key] = context.results.get(rule.name, [])
+
+    def check(self, corpus: DocCorpus, doc: DocFile, report: IssueReport) -> None:
+        """Report the issues of a single file"""
+        try:
+            self.analyze(doc)
+            for rule in self.token_rules:
+                rule.report(corpus, doc, doc.rule_results.get(rule.key, []), report)
+            for rule in self.rules:
+                rule.check(corpus, doc, report)
+        except Exception as e:
+            logger.error(f"Error scanning {doc.path}: {str(e)}")
+
+    def run(self, corpus: DocCorpus, docs: List[DocFile], report: Optional[IssueReport] = None) -> IssueReport:
+        """Report the issues of docs, which are analyzed already"""
+        report = report if report is not None else IssueReport()
+        with phase('file checks'):
+            for doc in docs:
+                self.check(corpus, doc, report)
+        for rule in self.rules:
+            try:
+                rule.finish(corpus, docs, report)
+            except Exception as e:
+                logger.error(f"Error running rule {rule.name}: {str(e)}")
+        return report
+
+def _positions(results: List[list]) -> Dict[str, Tuple[int, int]]:
+    """Line and column of the first occurrence of each collected link"""
+    positions: Dict[str, Tuple[int, int]] = {}
+    for link, line, column, _, _ in results:
+        positions.setdefault(link, (line, column))
+    return positions
+
+def _is_local(token: LinkToken) -> bool:
+    """Whether a link token is a local link or #link, selected as the corpus extract_*_links functions do"""
+    return (token.style in LOCAL_LINK_STYLES and bool(token.target)
+            and not token.target.startswith(('http://', 'https://', 'mailto:')))
+
+@register_rule
+class LinkFixRule(Rule):
+    """Relative links that resolve better elsewhere in the tree"""
+    name = LINKS
+    label = "links to fix"
+    kinds = ('link', 'image')
+
+    def visit_link(self, token: LinkToken, context: FileContext) -> None:
+        if token.style == 'inline':
+            # Only collected here: whether the link needs fixing depends on the tree
+            context.report(self.name, context.content[token.text_end:token.end], token.text_end,
+                           detail=[token.text_end, token.end])
+
+    visit_image = visit_link
+
+    def report(self, corpus: DocCorpus, doc: DocFile, results: List[list], report: IssueReport) -> None:
+        positions = {start: (line, column) for _, line, column, _, (start, _) in results}
+        links = [(link, start, end) for link, _, _, _, (start, end) in results]
+        for edit in corpus.link_fixes(doc, links):
+            line, column = positions.get(edit.start, (None, None))
+            report.add(Issue(self.name, doc.path, f"{edit.old} -> {edit.new}", line, column, edit=edit))
+
+@register_rule
+class HeaderAnchorRule(Rule):
+    """Headers without an explicit anchor, or with a duplicate one"""
+    name = ANCHORS
+    label = "headers without anchors"
+    kinds = ('header', 'anchor')
+
+    def __init__(self):
+        self.tokens: List[Token] = []
+
+    def begin(self, context: FileContext) -> None:
+        self.tokens = []
+
+    def visit_header(self, token: HeaderToken, context: FileContext) -> None:
+        self.tokens.append(token)
+
+    visit_anchor = visit_header
+
+    def end(self, context: FileContext) -> None:
+        # Header IDs are made unique against every anchor of the file, so they are computed once all are seen
+        for edit in get_header_changes(context.content, self.tokens):
+            context.report(self.name, edit.old.strip(), edit.start, edit=edit)
+
+@register_rule
+class BreakingLinkRule(Rule):
+    """Links from other files to header IDs that the anchor fixes of a file renumber"""
+    name = BREAKING
+    label = "links broken by anchor fixes"
+    advisory = True
+
+    def check(self, corpus: DocCorpus, doc: DocFile, report: IssueReport) -> None:
+        if not doc.header_changes:
+            return
+        for source, link, anchor in corpus.breaking_links(doc):
+            report.add(Issue(self.name, doc.path,
+                             f"{link} in {source.relative_to(corpus.docs_dir)} (now #{anchor})",
+                             detail=(source, link, anchor)))
+
+@register_rule
+class MissingFileRule(Rule):
+    """Local links to files that do not exist"""
+    name = MISSING
+    label = "links to missing files"
+    kinds = ('link', 'image')
+
+    def visit_link(self, token: LinkToken, context: FileContext) -> None:
+        if _is_local(token) and not token.target.startswith('#'):
+            context.report(self.name, token.target, token.start)
+
+    visit_image = visit_link
+
+    def report(self, corpus: DocCorpus, doc: DocFile, results: List[list], report: IssueReport) -> None:
+        positions = _positions([[split_fragment(link)[0], *rest] for link, *rest in results])
+        for link in corpus.missing_links(doc, (link for link, *_ in results)):
+            report.add(Issue(self.name, doc.path, link, *positions.get(link, (None, None)), detail=link))
+
+@register_rule
+class BrokenFragmentRule(Rule):
+    """Links to #fragments that the target page does not define"""
+    name = FRAGMENTS
+    label = "links to missing anchors"
+    kinds = ('link', 'image')
+
+    def visit_link(self, token: LinkToken, context: FileContext) -> None:
+        if _is_local(token) and '#' in token.target:
+            context.report(self.name, token.target, token.start)
+
+    visit_image = visit_link
+
+    def report(self, corpus: DocCorpus, doc: DocFile, results: List[list], report: IssueReport) -> None:
+        positions = _positions(results)
+        for link in corpus.broken_anchors(doc, positions):
+            report.add(Issue(self.name, doc.path, link, *positions.get(link, (None, None)), detail=link))
+
+@register_rule
+class ExternalLinkRule(Rule):
+    """http(s) links that fail, each distinct URL of the scanned files requested once"""
+    name = EXTERNAL
+    label = "broken external links"
+    default = False
+
+    def __init__(self, checker: Optional['ExternalLinkChecker'] = None,
+                 cache: Optional['ExternalLinkCache'] = None):
+        self.checker = checker
+        self.cache = cache
+
+    def finish(self, corpus: DocCorpus, docs: List[DocFile], report: IssueReport) -> None:
+        from .external_links import ExternalLinkChecker, check_external_links, describe
+        checker = self.checker or ExternalLinkChecker()
+        with phase('external links'):
+            results = check_external_links((url for doc in docs for url in doc.external_links),
+                                           cache=self.cache, checker=checker)
+        for doc in docs:
+            for url in sorted(doc.external_links):
+                if not results[url].ok:
+                    report.add(Issue(self.name, doc.path, describe(results[url]), detail=url))
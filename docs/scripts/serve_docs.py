@@ -1,45 +1,45 @@
 #!/usr/bin/env python3
 import os
+import argparse
 import sys
-import subprocess
 import re
 import logging
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional
-from .fix_links import find_links, fix_link
-from .add_anchors import get_header_changes
-from .create_templates import find_missing_files, create_missing_files
-
-class DocIssues:
-    def __init__(self):
-        self.files_needing_links: Dict[Path, List[Tuple[str, str]]] = {}
-        self.files_needing_anchors: Dict[Path, List[Tuple[str, str]]] = {}
-        self.files_missing: Dict[Path, List[str]] = {}
-
-logging.basicConfig(level=logging.INFO)
+from typing import TYPE_CHECKING, Dict, List, Set, Optional
+from .create_templates import create_missing_files
+from .corpus import DocCorpus, add_jobs_argument, resolve_jobs
+from .cache import DocCache, add_cache_arguments, open_cache
+from .batch import ChangeManifest, add_batch_arguments, apply_batch, rewrite_file, select_fix_kinds
+from .config import add_path_arguments, configure_logging, resolve_paths
+from .instrument import add_instrument_arguments, phase, session
+from .patch import Edit
+from .rules import (ANCHORS, BREAKING, EXTERNAL, FRAGMENTS, LINKS, MISSING, RULES, ExternalLinkRule, IssueReport,
+                    Rule, RuleEngine, create_rules, format_issue, registered_rules)
+
+if TYPE_CHECKING:
+    # asyncio and ssl are only imported when external links are checked
+    from .external_links import ExternalLinkCache, ExternalLinkChecker
+
 logger = logging.getLogger(__name__)
 
-def apply_fixes_to_file(file_path: Path, docs_dir: Path, fixes_links: Optional[List[Tuple[str, str]]] = None,
-                       fixes_anchors: Optional[List[Tuple[str, str]]] = None) -> bool:
+def apply_fixes_to_file(file_path: Path, docs_dir: Path, fixes_links: Optional[List[Edit]] = None,
+                       fixes_anchors: Optional[List[Edit]] = None) -> bool:
     """Apply fixes to a single file"""
     try:
-        content = file_path.read_text(encoding='utf-8')
-        original_content = content
-
+        edits = []
         if fixes_links:
             logger.debug(f"Applying {len(fixes_links)} link fixes to {file_path}")
-            for old, new in fixes_links:
-                logger.debug(f"  Link fix: {old} -> {new}")
-                content = content.replace(old, new)
+            for fix in fixes_links:
+                logger.debug(f"  Link fix: {fix.old} -> {fix.new}")
+            edits.extend(fixes_links)
 
         if fixes_anchors:
             logger.debug(f"Applying {len(fixes_anchors)} anchor fixes to {file_path}")
-            for old, new in fixes_anchors:
-                logger.debug(f"  Anchor fix: {old} -> {new}")
-                content = content.replace(old, new)
+            for fix in fixes_anchors:
+                logger.debug(f"  Anchor fix: {fix.old} -> {fix.new}")
+            edits.extend(fixes_anchors)
 
-        if content != original_content:
-            file_path.write_text(content, encoding='utf-8')
+        if rewrite_file(file_path, edits):
             logger.info(f"Updated {file_path.relative_to(docs_dir)}")
         else:
             logger.debug(f"No changes needed for {file_path}")
@@ -49,37 +49,70 @@ def apply_fixes_to_file(file_path: Path, docs_dir: Path, fixes_links: Optional[L
         logger.error(f"Error applying fixes to {file_path}: {str(e)}")
         return False
 
-def scan_documentation_issues(docs_dir: Path) -> DocIssues:
-    """Scan documentation for all types of issues"""
-    issues = DocIssues()
-
-    # Scan for missing files first
-    issues.files_missing = find_missing_files(docs_dir)
-
-    # Scan for link and anchor issues
-    for file in docs_dir.rglob('*.md'):
-        try:
-            content = file.read_text(encoding='utf-8')
-
-            # Check for link fixes
-            links = find_links(content)
-            if links:
-                changes = []
-                for link, _, _ in links:
-                    old, new = fix_link(link, file, docs_dir)
-                    if old != new:
-                        changes.append((old, new))
-                if changes:
-                    issues.files_needing_links[file] = changes
-
-            # Check for anchor fixes
-            changes = get_header_changes(content)
-            if changes:
-                issues.files_needing_anchors[file] = changes
-
-        except Exception as e:
-            logger.error(f"Error scanning {file}: {str(e)}")
-
+def apply_documentation_fixes(docs_dir: Path, issues: IssueReport, kinds: Set[str],
+                              dry_run: bool = False) -> ChangeManifest:
+    """Apply the selected kinds of fixes without prompting, one write per file"""
+    file_fixes: Dict[Path, Dict[str, List[Edit]]] = {}
+    if 'links' in kinds:
+        for file_path, changes in issues.edits(LINKS).items():
+            file_fixes.setdefault(file_path, {})['links'] = changes
+    if 'anchors' in kinds:
+        for file_path, changes in issues.edits(ANCHORS).items():
+            file_fixes.setdefault(file_path, {})['anchors'] = changes
+
+    manifest = apply_batch(docs_dir, file_fixes, dry_run=dry_run)
+
+    missing = issues.details(MISSING)
+    if 'missing' in kinds and missing:
+        create_missing_files(docs_dir, missing, dry_run=dry_run, manifest=manifest)
+
+    # Broken fragments have no automatic fix; they are reported only
+    for file_path, links in sorted(issues.details(FRAGMENTS).items()):
+        manifest.add_broken_anchors(file_path, links)
+    for file_path, links in sorted(issues.files(EXTERNAL).items()):
+        manifest.add_broken_external(file_path, [issue.message for issue in links])
+    if 'anchors' in kinds:
+        for file_path, links in sorted(issues.details(BREAKING).items()):
+            manifest.add_breaking_links(file_path, links)
+    for rule, files in issues.rules.items():
+        if rule not in (LINKS, ANCHORS, BREAKING, MISSING, FRAGMENTS, EXTERNAL):
+            for file_path, found in sorted(files.items()):
+                manifest.add_issues(file_path, rule, found)
+
+    return manifest
+
+def scan_documentation_issues(docs_dir: Path, cache: Optional[DocCache] = None, jobs: int = 1,
+                              external: Optional['ExternalLinkChecker'] = None,
+                              external_cache: Optional['ExternalLinkCache'] = None,
+                              corpus: Optional[DocCorpus] = None,
+                              paths: Optional[List[Path]] = None,
+                              rules: Optional[List[Rule]] = None) -> IssueReport:
+    """
+    Scan documentation for all types of issues
+
+    Runs the given rules, by default those enabled by default. External links
+    are only requested when an ExternalLinkChecker is given. With paths, only
+    those files of the corpus are checked, e.g. the staged files of a commit;
+    the rest of the corpus only serves link targets.
+    """
+    rules = create_rules(docs_dir) if rules is None else list(rules)
+    if external is not None:
+        rules = [rule for rule in rules if rule.name != EXTERNAL]
+        rules.append(ExternalLinkRule(external, external_cache))
+    engine = RuleEngine(rules)
+
+    # Read and tokenize every file once, shared by all rules below
+    with phase('load'):
+        if corpus is None:
+            corpus = DocCorpus.load(docs_dir, cache=cache)
+    with phase('analyze'):
+        corpus.analyze(jobs, engine=engine)
+    docs = [corpus.get(path) for path in paths if path in corpus] if paths is not None else list(corpus)
+
+    issues = engine.run(corpus, docs)
+
+    with phase('save cache'):
+        corpus.save_cache()
     return issues
 
 def fix_relative_links(content: str, base_path: str) -> str:
@@ -92,15 +125,31 @@ def fix_relative_links(content: str, base_path: str) -> str:
 
     return re.sub(pattern, replace_link, content)
 
-def handle_documentation_fixes(docs_dir: Path, issues: DocIssues) -> None:
+def handle_documentation_fixes(docs_dir: Path, issues: IssueReport) -> None:
     """Handle all documentation fixes based on user input"""
-    if not any([issues.files_needing_links, issues.files_needing_anchors, issues.files_missing]):
+    if not issues:
         print("No documentation issues found.")
         return
 
+    # Issues without an automatic fix need a human decision, so they are only listed
+    for rule, files in issues.rules.items():
+        if rule in (LINKS, ANCHORS, BREAKING, MISSING) or not files:
+            continue
+        print(f"\nFound {len(files)} files with {RULES[rule].label}")
+        for file_path in sorted(files.keys()):
+            print(f"\nFile: {file_path.relative_to(docs_dir)}")
+            for issue in files[file_path]:
+                print(f"  - {format_issue(issue)}")
+
+    # Link and anchor fixes are collected first and written together, so
+    # each file is rewritten once from the offsets recorded by the scan
+    selected_links: Dict[Path, List[Edit]] = {}
+    selected_anchors: Dict[Path, List[Edit]] = {}
+
     # Handle link fixes
-    if issues.files_needing_links:
-        print(f"\nFound {len(issues.files_needing_links)} files needing link fixes")
+    needing_links = issues.edits(LINKS)
+    if needing_links:
+        print(f"\nFound {len(needing_links)} files needing link fixes")
         print("How would you like to handle link fixes?")
         print("1. Apply all link fixes automatically")
         print("2. Review and apply link fixes file by file")
@@ -108,21 +157,25 @@ def handle_documentation_fixes(docs_dir: Path, issues: DocIssues) -> None:
         mode = input("Enter your choice (1-3): ")
 
         if mode == "1":
-            for file_path in issues.files_needing_links:
-                apply_fixes_to_file(file_path, docs_dir, fixes_links=issues.files_needing_links[file_path])
+            selected_links.update(needing_links)
         elif mode == "2":
-            for file_path in sorted(issues.files_needing_links.keys()):
+            for file_path in sorted(needing_links.keys()):
                 print(f"\nFile: {file_path.relative_to(docs_dir)}")
                 print("Link fixes needed:")
-                for old, new in issues.files_needing_links[file_path]:
-                    print(f"  Old: {old}")
-                    print(f"  New: {new}")
+                for fix in needing_links[file_path]:
+                    print(f"  Old: {fix.old}")
+                    print(f"  New: {fix.new}")
                 if input(f"\nApply link fixes to this file? [y/N]: ").lower() == 'y':
-                    apply_fixes_to_file(file_path, docs_dir, fixes_links=issues.files_needing_links[file_path])
+                    selected_links[file_path] = needing_links[file_path]
 
     # Handle anchor fixes
-    if issues.files_needing_anchors:
-        print(f"\nFound {len(issues.files_needing_anchors)} files needing anchor fixes")
+    needing_anchors = issues.edits(ANCHORS)
+    breaking_links = issues.details(BREAKING)
+    if needing_anchors:
+        print(f"\nFound {len(needing_anchors)} files needing anchor fixes")
+        breaking_count = issues.count(BREAKING)
+        if breaking_count:
+            print(f"Renumbering duplicate anchors would break {breaking_count} links from other files")
         print("How would you like to handle anchor fixes?")
         print("1. Apply all anchor fixes automatically")
         print("2. Review and apply anchor fixes file by file")
@@ -130,21 +183,27 @@ def handle_documentation_fixes(docs_dir: Path, issues: DocIssues) -> None:
         mode = input("Enter your choice (1-3): ")
 
         if mode == "1":
-            for file_path in issues.files_needing_anchors:
-                apply_fixes_to_file(file_path, docs_dir, fixes_anchors=issues.files_needing_anchors[file_path])
+            selected_anchors.update(needing_anchors)
         elif mode == "2":
-            for file_path in sorted(issues.files_needing_anchors.keys()):
+            for file_path in sorted(needing_anchors.keys()):
                 print(f"\nFile: {file_path.relative_to(docs_dir)}")
                 print("Anchor fixes needed:")
-                for old, new in issues.files_needing_anchors[file_path]:
-                    print(f"  Old: {old}")
-                    print(f"  New: {new}")
+                for fix in needing_anchors[file_path]:
+                    print(f"  Old: {fix.old}")
+                    print(f"  New: {fix.new}")
+                for source, link, anchor in breaking_links.get(file_path, []):
+                    print(f"  Breaks: {link} in {source.relative_to(docs_dir)} (now #{anchor})")
                 if input(f"\nApply anchor fixes to this file? [y/N]: ").lower() == 'y':
-                    apply_fixes_to_file(file_path, docs_dir, fixes_anchors=issues.files_needing_anchors[file_path])
+                    selected_anchors[file_path] = needing_anchors[file_path]
+
+    for file_path in list(dict.fromkeys([*selected_links, *selected_anchors])):
+        apply_fixes_to_file(file_path, docs_dir, fixes_links=selected_links.get(file_path),
+                            fixes_anchors=selected_anchors.get(file_path))
 
     # Handle missing files
-    if issues.files_missing:
-        print(f"\nFound {len(issues.files_missing)} files with missing references")
+    files_missing = issues.details(MISSING)
+    if files_missing:
+        print(f"\nFound {len(files_missing)} files with missing references")
         print("How would you like to handle missing files?")
         print("1. Create all missing files automatically")
         print("2. Review and create missing files one by one")
@@ -152,61 +211,109 @@ def handle_documentation_fixes(docs_dir: Path, issues: DocIssues) -> None:
         mode = input("Enter your choice (1-3): ")
 
         if mode == "1":
-            create_missing_files(docs_dir, issues.files_missing)
+            create_missing_files(docs_dir, files_missing)
         elif mode == "2":
-            for file_path, missing in issues.files_missing.items():
+            for file_path, missing in files_missing.items():
                 print(f"\nFile {file_path.relative_to(docs_dir)} references missing files:")
                 for missing_file in missing:
                     print(f"  - {missing_file}")
                 if input(f"\nCreate missing files for this reference? [y/N]: ").lower() == 'y':
                     create_missing_files(docs_dir, {file_path: missing})
 
-def main():
+def main(argv: Optional[List[str]] = None):
     """Main entry point"""
-    logging.basicConfig(level=logging.INFO)
-
-    try:
-        root_dir = Path(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-        logger.info(f"Project root directory: {root_dir}")
-
-        os.chdir(root_dir)
-
-        config_file = root_dir / "mkdocs.yml"
-        # If not found in root, check in the docs directory
-        if not config_file.exists():
-            config_file = root_dir / "docs" / "mkdocs.yml"
-
-        if not config_file.exists():
-            logger.error(f"mkdocs.yml not found at {config_file}")
+    # Only needed to start mkdocs; `docs-tool check` imports this module without it
+    import subprocess
+    from .external_links import (ExternalLinkCache, ExternalLinkChecker, add_external_arguments,
+                                 default_external_cache_path)
+
+    rules = registered_rules()
+    parser = argparse.ArgumentParser(description='Check documentation and serve it with mkdocs')
+    add_path_arguments(parser)
+    add_cache_arguments(parser)
+    add_jobs_argument(parser)
+    add_batch_arguments(parser)
+    add_external_arguments(parser)
+    add_instrument_arguments(parser)
+    parser.add_argument('--rule', action='append', choices=list(rules), default=[], metavar='RULE',
+                        help='Also run this rule, if it is off by default; may be repeated. Rules: ' + ', '.join(rules))
+    parser.add_argument('--terms', action='append_const', dest='rule', const='terminology',
+                        help='Also check terminology, the same as --rule terminology')
+    parser.add_argument('--watch', action='store_true',
+                        help='Re-check changed files while mkdocs serve is running')
+    parser.add_argument('--poll', action='store_true',
+                        help='Watch by polling even if watchdog is installed')
+    parser.add_argument('--interval', type=float, default=1.0,
+                        help='Seconds between watch checks (default: 1.0)')
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    with session(stats=args.stats, profile=args.profile, trace=args.trace):
+        try:
+            root_dir, config_file, docs_dir = resolve_paths(args.docs_dir, args.config)
+            logger.info(f"Project root directory: {root_dir}")
+
+            os.chdir(root_dir)
+
+            if config_file is None:
+                logger.error(f"mkdocs.yml not found under {root_dir}")
+                sys.exit(1)
+
+            logger.info(f"Using mkdocs config: {config_file}")
+
+            cache = open_cache(docs_dir, enabled=not args.no_cache, clear=args.clear_cache,
+                               max_entries=args.cache_size)
+            external = None
+            external_cache = None
+            if args.check_external:
+                external = ExternalLinkChecker(per_host=args.per_host)
+                if not args.no_cache:
+                    external_cache = ExternalLinkCache(default_external_cache_path(docs_dir), ttl=args.external_ttl,
+                                                       no_response_ttl=args.no_response_ttl)
+
+            if args.apply or args.dry_run:
+                # Batch mode: fix without prompting, report and exit instead of serving
+                issues = scan_documentation_issues(docs_dir, cache=cache, jobs=resolve_jobs(args.jobs),
+                                                   external=external, external_cache=external_cache,
+                                                   rules=create_rules(docs_dir, select=args.rule))
+                manifest = apply_documentation_fixes(docs_dir, issues, select_fix_kinds(args.apply),
+                                                     dry_run=args.dry_run)
+                manifest.write(args.manifest)
+                sys.exit(1 if manifest.errors else 0)
+
+            print("\nChecking for documentation issues...")
+            response = input("Would you like to scan for potential documentation issues? [Y/n] ").lower()
+
+            if response != 'n':
+                issues = scan_documentation_issues(docs_dir, cache=cache, jobs=resolve_jobs(args.jobs),
+                                                   external=external, external_cache=external_cache,
+                                                   rules=create_rules(docs_dir, select=args.rule))
+                handle_documentation_fixes(docs_dir, issues)
+
+            stop_watch = None
+            if args.watch:
+                from .watch import start_watch_thread
+                stop_watch = start_watch_thread(docs_dir, cache=cache, interval=args.interval,
+                                                native=not args.poll, rules=create_rules(docs_dir, select=args.rule))
+
+            # Run mkdocs serve
+            logger.info("Starting mkdocs serve...")
+            try:
+                with phase('mkdocs serve'):
+                    subprocess.run(
+                        ["poetry", "run", "mkdocs", "serve", "-f", str(config_file)],
+                        check=True
+                    )
+            finally:
+                if stop_watch is not None:
+                    stop_watch.set()
+
+        except subprocess.CalledProcessError as e:
+            logger.error(f"MkDocs error: {e}")
+            sys.exit(1)
+        except Exception as e:
+            logger.error(f"Unexpected error: {e}", exc_info=True)
             sys.exit(1)
-
-        logger.info(f"Using mkdocs config: {config_file}")
-
-        if str(config_file).endswith("docs/mkdocs.yml"):
-            docs_dir = root_dir / "docs" / "src"
-        else:
-            docs_dir = root_dir / "src"
-
-        print("\nChecking for documentation issues...")
-        response = input("Would you like to scan for potential documentation issues? [Y/n] ").lower()
-
-        if response != 'n':
-            issues = scan_documentation_issues(docs_dir)
-            handle_documentation_fixes(docs_dir, issues)
-
-        # Run mkdocs serve
-        logger.info("Starting mkdocs serve...")
-        subprocess.run(
-            ["poetry", "run", "mkdocs", "serve", "-f", str(config_file)],
-            check=True
-        )
-
-    except subprocess.CalledProcessError as e:
-        logger.error(f"MkDocs error: {e}")
-        sys.exit(1)
-    except Exception as e:
-        logger.error(f"Unexpected error: {e}", exc_info=True)
-        sys.exit(1)
 
 if __name__ == "__main__":
     main()
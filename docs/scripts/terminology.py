@@ -0,0 +1,262 @@
+import re
+import sys
+import json
+import hashlib
+import argparse
+import logging
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+from .config import add_path_arguments, configure_logging, resolve_paths
+from .corpus import DocFile
+from .rules import FileContext, IssueReport, Rule, RuleEngine, format_issue, register_rule
+
+logger = logging.getLogger(__name__)
+
+# The dictionary, beside the docs directory; JSON rather than YAML so that checks need not import yaml
+TERMINOLOGY_FILE = 'terminology.json'
+# Inline code spans, which like fenced code are not prose; they do not cross a blank line
+CODE_SPAN_RE = re.compile(r'(`+)(?!`)((?:.|\n(?![ \t]*\n))+?)(?<!`)\1(?!`)')
+# Markdown outside the docs directory that follows the same terminology, relative to the project root
+EXTRA_PATTERNS = ('*.md', 'apps/*/README.md')
+
+class Term(NamedTuple):
+    """A dictionary entry, matched case-insensitively"""
+    phrase: str
+    preferred: Optional[str]  # the spelling to use, for a variant or a wrongly cased preferred term
+    reason: Optional[str]     # why a banned phrase is banned
+    exact: bool               # only report exact-case matches, as for listed variants
+
+class TermAutomaton:
+    """
+    Aho-Corasick automaton over every phrase of a dictionary.
+
+    A scan costs one state transition per character however many phrases
+    there are, where a regex per phrase would rescan the text for each.
+    """
+
+    def __init__(self, phrases: List[str]):
+        self.phrases = [phrase.lower() for phrase in phrases]
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[Tuple[int, ...]] = [()]
+        for index, phrase in enumerate(self.phrases):
+            state = 0
+            for char in phrase:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(())
+                state = next_state
+            self.output[state] += (index,)
+
+        # Breadth-first, so that the failure state of a state is complete before its children's
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                self.output[next_state] += self.output[self.fail[next_state]]
+
+    def search(self, text: str, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[int, int, int]]:
+        """(start, end, phrase index) of every match in text[start:end], which must be lowercased"""
+        goto = self.goto
+        fail = self.fail
+        output = self.output
+        phrases = self.phrases
+        state = 0
+        for position in range(start, len(text) if end is None else end):
+            char = text[position]
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                for index in output[state]:
+                    yield position + 1 - len(phrases[index]), position + 1, index
+
+def default_terminology_path(docs_dir: Path) -> Path:
+    """Location of the terminology dictionary for a documentation directory, beside its .cache"""
+    return docs_dir.parent / TERMINOLOGY_FILE
+
+def load_terms(path: Path) -> List[Term]:
+    """
+    Read a dictionary of the form
+
+        {"terms": {"Phoenix VC": ["PhoenixVC", "Phoenix-VC"]},
+         "banned": {"click here": "Describe the link target instead"}}
+
+    Variants are reported when they match exactly, preferred terms when they
+    match with another case, banned phrases whatever their case.
+    """
+    data = json.loads(path.read_text(encoding='utf-8'))
+    terms: List[Term] = []
+    for preferred, variants in data.get('terms', {}).items():
+        terms.append(Term(preferred, preferred, None, False))
+        terms.extend(Term(variant, preferred, None, True) for variant in variants)
+    for phrase, reason in data.get('banned', {}).items():
+        terms.append(Term(phrase, None, reason or None, False))
+    return terms
+
+def _is_word(char: str) -> bool:
+    return char.isalnum() or char == '_'
+
+def _lower(content: str) -> str:
+    """content lowercased without changing any offset"""
+    lowered = content.lower()
+    if len(lowered) == len(content):
+        return lowered
+    # A few characters, e.g. the dotted capital I, lowercase to two
+    return ''.join(char.lower()[:1] for char in content)
+
+@register_rule
+class TerminologyRule(Rule):
+    """Misspelled product names and banned phrases in prose: not in code, comments, front matter or link targets"""
+    name = 'terminology'
+    label = "terminology issues"
+    kinds = ('code', 'comment', 'front_matter', 'link', 'image')
+    default = False
+    version = 2
+
+    def __init__(self, path: Optional[Path] = None):
+        self.terms: List[Term] = []
+        digest = ''
+        if path is not None and path.is_file():
+            try:
+                self.terms = load_terms(path)
+                digest = hashlib.sha1(path.read_bytes()).hexdigest()[:12]
+            except Exception as e:
+                logger.error(f"Error reading {path}: {str(e)}")
+        self.automaton = TermAutomaton([term.phrase for term in self.terms])
+        if not self.terms:
+            # Nothing to look for: no file needs to be read for this rule
+            self.kinds = ()
+        self.skipped: List[Tuple[int, int]] = []
+        # Results depend on the dictionary, so a new one invalidates cached results
+        self.dictionary = digest
+
+    @classmethod
+    def create(cls, docs_dir: Path) -> 'TerminologyRule':
+        path = default_terminology_path(docs_dir)
+        if not path.is_file():
+            logger.warning(f"No terminology dictionary at {path}; nothing to check")
+        return cls(path)
+
+    @property
+    def key(self) -> str:
+        return f"{super().key}:{self.dictionary}"
+
+    def begin(self, context: FileContext) -> None:
+        self.skipped = []
+
+    def visit_code(self, token, context: FileContext) -> None:
+        self.skipped.append((token.start, token.end))
+
+    visit_comment = visit_code
+    visit_front_matter = visit_code
+
+    def visit_link(self, token, context: FileContext) -> None:
+        self.skipped.append((token.target_start, token.target_end))
+
+    visit_image = visit_link
+
+    def end(self, context: FileContext) -> None:
+        if not self.terms:
+            return
+        content = context.content
+        skipped = self.skipped
+        skipped.extend(match.span() for match in CODE_SPAN_RE.finditer(content))
+        skipped.sort()
+        lowered = _lower(content)
+
+        position = 0
+        for start, end in skipped + [(len(content), len(content))]:
+            if start > position:
+                for issue in self.scan(content, lowered, position, start):
+                    context.report(self.name, *issue)
+            position = max(position, end)
+
+    def scan(self, content: str, lowered: str, start: int, end: int) -> List[Tuple[str, int, None, str]]:
+        """(message, offset, edit, phrase) of each issue in content[start:end], longest match first"""
+        matches = []
+        for match_start, match_end, index in self.automaton.search(lowered, start, end):
+            term = self.terms[index]
+            # Whole words only: "simply" is not in "simplyfy"
+            if _is_word(term.phrase[0]) and match_start > 0 and _is_word(content[match_start - 1]):
+                continue
+            if _is_word(term.phrase[-1]) and match_end < len(content) and _is_word(content[match_end]):
+                continue
+            matches.append((match_start, -match_end, index))
+
+        issues = []
+        covered = start
+        for match_start, match_end, index in sorted(matches):
+            match_end = -match_end
+            if match_start < covered:
+                continue
+            covered = match_end
+            term = self.terms[index]
+            found = content[match_start:match_end]
+            if term.preferred is None:
+                message = f"'{found}': {term.reason}" if term.reason else f"'{found}' is a banned phrase"
+            elif term.exact and found != term.phrase or not term.exact and found == term.preferred:
+                continue
+            else:
+                message = f"'{found}' should be '{term.preferred}'"
+            issues.append((message, match_start, None, term.phrase))
+        return issues
+
+def check_terminology(paths: List[Path], rule: TerminologyRule) -> IssueReport:
+    """Scan markdown files outside of a corpus, e.g. READMEs, with the terminology rule"""
+    engine = RuleEngine([rule])
+    report = IssueReport()
+    for path in paths:
+        engine.check(None, DocFile(path), report)
+    return report
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Report misspelled product names and banned phrases')
+    add_path_arguments(parser)
+    parser.add_argument('--terms', default=None,
+                        help=f"Dictionary to use (default: {TERMINOLOGY_FILE} beside the docs directory)")
+    parser.add_argument('files', nargs='*',
+                        help='Markdown files to check (default: the docs directory, '
+                             'plus ' + ' and '.join(EXTRA_PATTERNS) + ' of the project)')
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    root_dir, _, docs_dir = resolve_paths(args.docs_dir, args.config)
+    terms_path = Path(args.terms) if args.terms else default_terminology_path(docs_dir)
+    if not terms_path.is_file():
+        logger.error(f"Dictionary {terms_path} does not exist!")
+        sys.exit(1)
+
+    if args.files:
+        paths = [Path(path).resolve() for path in args.files]
+    else:
+        paths = sorted(docs_dir.rglob('*.md'))
+        for pattern in EXTRA_PATTERNS:
+            paths.extend(sorted(root_dir.glob(pattern)))
+    issues = check_terminology(paths, TerminologyRule(terms_path))
+
+    files = issues.files(TerminologyRule.name)
+    if not files:
+        print("No terminology issues found.")
+        return
+    for file_path in sorted(files):
+        for issue in files[file_path]:
+            try:
+                rel_path = file_path.relative_to(root_dir)
+            except ValueError:
+                rel_path = file_path
+            print(f"{rel_path}:{format_issue(issue)}")
+    sys.exit(1)
+
+if __name__ == '__main__':
+    main()
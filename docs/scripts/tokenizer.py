@@ -0,0 +1,273 @@
+import re
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Pattern, Union
+
+# One alternation drives the whole scan. Line-anchored constructs come first so
+# that they win over inline ones starting at the same offset. Fences may be
+# indented arbitrarily so that code blocks nested in lists are recognized.
+MARKDOWN_RE = re.compile(r"""
+    (?=[\]`<{]|^[\[\#~\ \t])
+    (?:
+        ^[ \t]*(?:(?P<fence>`{3,})(?P<info>[^`\n]*)|(?P<tilde_fence>~{3,})(?P<tilde_info>[^\n]*))$
+      | ^[ ]{0,3}(?P<hashes>\#{1,6})(?=[ \t\r]|$)(?=(?P<heading>[^\n]*))
+      | ^[ ]{0,3}\[(?P<label>[^\]^\n][^\]\n]*)\]:[ \t]*(?P<def_target><[^>\n]*>|\S+)
+            (?:[ \t]+(?P<def_title>"[^"\n]*"|'[^'\n]*'|\([^)\n]*\)))?[ \t]*\r?$
+      | (?P<ticks>`+)
+      | (?P<comment><!--)
+      | <(?P<autolink>(?:https?|ftp)://[^\s<>]+|mailto:[^\s<>]+)>
+      | (?P<tag><[a-zA-Z][^>\n]*>)
+      | \]\([ \t]*(?P<target><[^>\n]*>|[^\s)]*)
+            (?:[ \t]+(?P<title>"[^"\n]*"|'[^'\n]*'|\([^)\n]*\)))?[ \t]*\)
+      | \]\[(?P<ref>[^\]\n]*)\]
+      | \{:?[ \t]*\#(?P<attr_id>[^\s}]+)[^}\n]*\}
+    )
+""", re.MULTILINE | re.VERBOSE)
+BACKTICKS_RE = re.compile(r'`+')
+HTML_LINK_RE = re.compile(r'<(a|img)\b[^>]*?\b(href|src)\s*=\s*(["\'])(.*?)\3', re.IGNORECASE)
+HTML_ANCHOR_RE = re.compile(r'<[a-zA-Z][\w-]*\b[^>]*?\b(id|name)\s*=\s*(["\'])(.*?)\2')
+
+class LinkToken(NamedTuple):
+    """A link or image; offsets are character offsets into the decoded text"""
+    kind: str             # 'link' or 'image'
+    style: str            # 'inline', 'reference', 'definition', 'html' or 'autolink'
+    text: str
+    target: str           # destination without <> and title; resolved for reference links
+    title: Optional[str]
+    start: int            # start of the whole construct
+    end: int
+    text_end: int         # offset of the ']' closing the link text, or start for html/autolinks
+    target_start: int
+    target_end: int
+    label: Optional[str] = None   # reference label for reference links and definitions
+
+class HeaderToken(NamedTuple):
+    """An ATX header line, without its trailing newline"""
+    level: int
+    text: str
+    start: int
+    end: int
+
+    @property
+    def kind(self) -> str:
+        return 'header'
+
+class AnchorToken(NamedTuple):
+    """An explicit anchor: a {: #id} attribute list or an HTML id/name attribute"""
+    id: str
+    start: int
+    end: int
+
+    @property
+    def kind(self) -> str:
+        return 'anchor'
+
+class CodeToken(NamedTuple):
+    """A fenced code block, from the opening fence to the closing fence"""
+    info: str
+    start: int
+    end: int
+
+    @property
+    def kind(self) -> str:
+        return 'code'
+
+class CommentToken(NamedTuple):
+    """An HTML comment, from <!-- to -->; an unclosed one runs to the end of the file"""
+    start: int
+    end: int
+
+    @property
+    def kind(self) -> str:
+        return 'comment'
+
+class FrontMatterToken(NamedTuple):
+    """A YAML front matter block at the top of the file"""
+    text: str
+    start: int
+    end: int
+
+    @property
+    def kind(self) -> str:
+        return 'front_matter'
+
+Token = Union[LinkToken, HeaderToken, AnchorToken, CodeToken, CommentToken, FrontMatterToken]
+
+def normalize_label(label: str) -> str:
+    """Reference labels match case-insensitively with collapsed whitespace"""
+    return ' '.join(label.split()).casefold()
+
+def _unwrap(destination: str) -> str:
+    if destination.startswith('<') and destination.endswith('>'):
+        return destination[1:-1]
+    return destination
+
+def _title(raw: Optional[str]) -> Optional[str]:
+    return raw[1:-1] if raw else None
+
+@lru_cache(maxsize=None)
+def _closing_fence(fence: str) -> Pattern:
+    """Pattern for a line closing a fence: the same character, at least as many times"""
+    return re.compile(rf'^[ \t]*{re.escape(fence)}{re.escape(fence[0])}*[ \t]*\r?$', re.MULTILINE)
+
+def _open_bracket(content: str, close: int) -> int:
+    """Offset of the '[' matching the ']' at close on the same line, or -1"""
+    depth = 0
+    line_start = content.rfind('\n', 0, close) + 1
+    for k in range(close - 1, line_start - 1, -1):
+        c = content[k]
+        if k > line_start and content[k - 1] == '\\':
+            continue
+        if c == ']':
+            depth += 1
+        elif c == '[':
+            if depth == 0:
+                return k
+            depth -= 1
+    return -1
+
+def _line_end(content: str, position: int) -> int:
+    """Offset of the end of the line holding position, excluding the line break"""
+    end = content.find('\n', position)
+    if end == -1:
+        end = len(content)
+    if end > position and content[end - 1] == '\r':
+        end -= 1
+    return end
+
+def _front_matter(content: str) -> Optional[FrontMatterToken]:
+    if not content.startswith('---\n'):
+        return None
+    end = content.find('\n---', 3)
+    while end != -1 and content[end + 4:end + 5] not in ('\n', ''):
+        end = content.find('\n---', end + 1)
+    if end == -1:
+        return None
+    return FrontMatterToken(content[4:end + 1], 0, end + 4)
+
+def _bracketed(content: str, match, style: str, **fields) -> Optional[LinkToken]:
+    """Link or image whose text ends at the ']' starting match, or None if no '[' opens it"""
+    opening = _open_bracket(content, match.start())
+    if opening == -1:
+        return None
+    is_image = opening > 0 and content[opening - 1] == '!'
+    return LinkToken('image' if is_image else 'link', style, content[opening + 1:match.start()],
+                     start=opening - 1 if is_image else opening, end=match.end(),
+                     text_end=match.start(), **fields)
+
+def tokenize(content: str) -> List[Token]:
+    """
+    Split markdown into typed link, image, header, anchor, code, comment and front matter tokens.
+
+    The text is scanned once, left to right, by a single regex alternation.
+    Fenced code blocks, inline code spans and HTML comments are skipped over
+    as a whole, so they never produce link, header or anchor tokens.
+    Reference-style links are resolved against the definitions of the whole
+    document. Tokens are returned in document order.
+    """
+    tokens: List[Token] = []
+    references: List[LinkToken] = []
+    length = len(content)
+    position = 0
+
+    front_matter = _front_matter(content)
+    if front_matter is not None:
+        tokens.append(front_matter)
+        position = front_matter.end
+
+    search = MARKDOWN_RE.search
+    while True:
+        match = search(content, position)
+        if match is None:
+            break
+        position = match.end()
+        group = match.lastgroup
+
+        if group == 'heading':
+            # The header spans its line; scanning continues after the hashes for inline tokens
+            heading = match.group('heading').rstrip('\r')
+            tokens.append(HeaderToken(len(match.group('hashes')), heading.strip(' \t'),
+                                      match.start(), position + len(heading)))
+        elif group in ('target', 'title'):
+            token = _bracketed(content, match, 'inline', target=_unwrap(match.group('target')),
+                               title=_title(match.group('title')), target_start=match.start('target'),
+                               target_end=match.end('target'))
+            if token is not None:
+                tokens.append(token)
+        elif group in ('info', 'tilde_info'):
+            # Jump straight to the closing fence; an unclosed fence runs to the end of the file
+            fence = match.group('fence') or match.group('tilde_fence')
+            closing = _closing_fence(fence).search(content, position)
+            position = closing.end() if closing else length
+            tokens.append(CodeToken(match.group(group).strip(), match.start(), position))
+        elif group in ('def_target', 'def_title'):
+            label = match.group('label')
+            destination = match.group('def_target')
+            tokens.append(LinkToken('link', 'definition', label, _unwrap(destination),
+                                    _title(match.group('def_title')), match.start(),
+                                    _line_end(content, match.start()), match.end('label'),
+                                    match.start('def_target'), match.end('def_target'),
+                                    normalize_label(label)))
+        elif group == 'ticks':
+            # A code span closes at the next run of exactly as many backticks on the line
+            width = len(match.group('ticks'))
+            for run in BACKTICKS_RE.finditer(content, position, _line_end(content, position)):
+                if run.end() - run.start() == width:
+                    position = run.end()
+                    break
+        elif group == 'comment':
+            close = content.find('-->', position)
+            position = length if close == -1 else close + 3
+            tokens.append(CommentToken(match.start(), position))
+        elif group == 'ref':
+            token = _bracketed(content, match, 'reference', target='', title=None,
+                               target_start=match.start('ref'), target_end=match.end('ref'))
+            if token is not None:
+                token = token._replace(label=normalize_label(match.group('ref') or token.text))
+                tokens.append(token)
+                references.append(token)
+        elif group == 'autolink':
+            tokens.append(LinkToken('link', 'autolink', match.group('autolink'), match.group('autolink'), None,
+                                    match.start(), match.end(), match.start(),
+                                    match.start('autolink'), match.end('autolink')))
+        elif group == 'tag':
+            _tokenize_tag(match.group('tag'), match.start(), tokens)
+        elif group == 'attr_id':
+            tokens.append(AnchorToken(match.group('attr_id'), match.start(), match.end()))
+
+    if references:
+        definitions: Dict[str, LinkToken] = {}
+        for token in tokens:
+            if isinstance(token, LinkToken) and token.style == 'definition':
+                definitions.setdefault(token.label, token)
+        tokens = [_resolve_reference(token, definitions)
+                  if isinstance(token, LinkToken) and token.style == 'reference' else token
+                  for token in tokens]
+
+    tokens.sort(key=lambda token: token.start)
+    return tokens
+
+def _resolve_reference(token: LinkToken, definitions: Dict[str, LinkToken]) -> LinkToken:
+    definition = definitions.get(token.label)
+    if definition is None:
+        return token
+    return token._replace(target=definition.target, title=definition.title)
+
+def _tokenize_tag(tag: str, offset: int, tokens: List[Token]) -> None:
+    """Links and anchors declared by the attributes of an HTML start tag"""
+    link = HTML_LINK_RE.match(tag)
+    if link:
+        kind = 'image' if link.group(1).lower() == 'img' else 'link'
+        tokens.append(LinkToken(kind, 'html', '', link.group(4), None, offset, offset + len(tag), offset,
+                                offset + link.start(4), offset + link.end(4)))
+    anchor = HTML_ANCHOR_RE.match(tag)
+    if anchor:
+        tokens.append(AnchorToken(anchor.group(3), offset + anchor.start(3), offset + anchor.end(3)))
+
+def link_tokens(tokens: List[Token]) -> List[LinkToken]:
+    return [token for token in tokens if isinstance(token, LinkToken)]
+
+def header_tokens(tokens: List[Token]) -> List[HeaderToken]:
+    return [token for token in tokens if isinstance(token, HeaderToken)]
+
+def anchor_tokens(tokens: List[Token]) -> List[AnchorToken]:
+    return [token for token in tokens if isinstance(token, AnchorToken)]
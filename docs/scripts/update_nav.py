@@ -1,50 +1,332 @@
 #!/usr/bin/env python3
 import os
+import re
+import sys
+import json
+import logging
+import argparse
 from pathlib import Path
 import yaml
-from typing import Dict, List, Any
-
-def get_nav_structure(docs_dir: Path) -> Dict[str, Any]:
-    """Generate navigation structure from directory layout."""
-    nav = {}
-    
-    for md_file in sorted(docs_dir.rglob('*.md')):
-        rel_path = md_file.relative_to(docs_dir)
-        parts = list(rel_path.parts)
-        
-        # Skip README.md files as they're handled specially
-        if parts[-1] == 'README.md':
-            continue
-            
-        current = nav
-        for i, part in enumerate(parts[:-1]):
-            if part not in current:
-                current[part] = {}
-            current = current[part]
-            
-        # Add the file
-        name = parts[-1].replace('.md', '').replace('-', ' ').title()
-        current[name] = str(rel_path)
-        
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from .anchors import HEADER_ATTRS_RE, heading_text
+from .cache import default_cache_path
+from .config import add_path_arguments, configure_logging, resolve_paths
+from .fileio import write_text_atomic
+from .instrument import add_instrument_arguments, count, phase, session
+
+logger = logging.getLogger(__name__)
+
+NAV_CACHE_VERSION = 1
+# Index pages that become the landing page of their directory's section
+INDEX_PAGES = ('index.md', 'README.md')
+# Pages without a weight are ordered after weighted ones, alphabetically
+DEFAULT_WEIGHT = 1000
+# How far past the front matter to look for the first H1
+MAX_HEADER_LINES = 50
+H1_RE = re.compile(r'^#\s+(.+?)\s*$')
+FENCE_RE = re.compile(r'^\s*(```|~~~)')
+# A block sequence may be written at the indentation of its key
+SEQUENCE_ITEM_RE = re.compile(r'-(\s|$)')
+# Titles that can be written as plain YAML scalars without quoting
+PLAIN_SCALAR_RE = re.compile(r"^[A-Za-z0-9(][\w .()/&,'+-]*$")
+
+class PageMeta(NamedTuple):
+    """Navigation metadata of a page: None where the page does not set it"""
+    title: Optional[str]
+    weight: Optional[float]
+
+def read_page_meta(file_path: Path) -> PageMeta:
+    """
+    Title and weight of a page, read from its YAML front matter or, for the
+    title, its first H1.
+
+    Only the front matter and the lines up to the first H1 are read, never the
+    whole file.
+    """
+    title = None
+    weight = None
+    count('files_read')
+    with open(file_path, encoding='utf-8', errors='replace') as f:
+        first = f.readline()
+        if first.rstrip() == '---':
+            front_matter = []
+            for line in f:
+                if line.rstrip() == '---':
+                    break
+                front_matter.append(line)
+            try:
+                data = yaml.safe_load(''.join(front_matter))
+            except yaml.YAMLError as e:
+                logger.debug(f"Ignoring invalid front matter in {file_path}: {str(e)}")
+                data = None
+            if isinstance(data, dict):
+                if data.get('title'):
+                    title = str(data['title'])
+                if isinstance(data.get('weight'), (int, float)):
+                    weight = data['weight']
+            lines = []
+        else:
+            lines = [first]
+
+        if title is None:
+            in_code = False
+            for line_no, line in enumerate(_chain(lines, f)):
+                if line_no >= MAX_HEADER_LINES:
+                    break
+                if FENCE_RE.match(line):
+                    in_code = not in_code
+                    continue
+                match = None if in_code else H1_RE.match(line)
+                if match:
+                    text = HEADER_ATTRS_RE.sub('', match.group(1))
+                    title = heading_text(text).strip() or None
+                    break
+    return PageMeta(title, weight)
+
+def _chain(lines: List[str], f):
+    yield from lines
+    yield from f
+
+class NavMetaCache:
+    """
+    Page metadata keyed by absolute path and validated by mtime and size.
+
+    Unlike DocCache no content hash is kept, since computing one would mean
+    reading the whole file the partial read is there to avoid.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._dirty = False
+        if path.exists():
+            try:
+                data = json.loads(path.read_text(encoding='utf-8'))
+                if data.get('version') == NAV_CACHE_VERSION:
+                    self.entries = data.get('entries', {})
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable nav cache {path}: {str(e)}")
+
+    def get(self, file_path: str, st: os.stat_result) -> PageMeta:
+        entry = self.entries.get(file_path)
+        if entry is not None and entry['mtime_ns'] == st.st_mtime_ns and entry['size'] == st.st_size:
+            count('nav_cache_hits')
+            return PageMeta(entry['title'], entry['weight'])
+        count('nav_cache_misses')
+        meta = read_page_meta(Path(file_path))
+        self.entries[file_path] = {'mtime_ns': st.st_mtime_ns, 'size': st.st_size,
+                                   'title': meta.title, 'weight': meta.weight}
+        self._dirty = True
+        return meta
+
+    def save(self, seen: Optional[set] = None) -> None:
+        """Write the cache, dropping entries of pages that no longer exist when seen is given"""
+        if seen is not None and len(seen) != len(self.entries):
+            self.entries = {key: entry for key, entry in self.entries.items() if key in seen}
+            self._dirty = True
+        if not self._dirty:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            write_text_atomic(self.path, json.dumps({'version': NAV_CACHE_VERSION, 'entries': self.entries}))
+            self._dirty = False
+        except Exception as e:
+            logger.warning(f"Could not write nav cache {self.path}: {str(e)}")
+
+def default_title(name: str) -> str:
+    """Title derived from a file or directory name, as used when a page sets none"""
+    if name.endswith('.md'):
+        name = name[:-3]
+    return name.replace('-', ' ').replace('_', ' ').title()
+
+def _sort_key(item: Tuple[Optional[float], str, Any]) -> Tuple[float, str]:
+    weight, title, _ = item
+    return (DEFAULT_WEIGHT if weight is None else weight, title.casefold())
+
+def build_nav(docs_dir: Path, cache: Optional[NavMetaCache] = None) -> List[Any]:
+    """
+    Navigation tree of every page under docs_dir, in mkdocs nav form.
+
+    Each directory becomes a section; its index.md or README.md opens the
+    section and lends it its title and weight. Entries are ordered by weight,
+    then title. The tree is walked once with os.scandir and each page costs a
+    stat plus, on a cache miss, a partial read.
+    """
+    seen = set()
+    with phase('build nav'):
+        nav = _build_section(os.path.abspath(docs_dir), os.path.abspath(docs_dir), cache, seen)[2]
+    if cache is not None:
+        cache.save(seen)
     return nav
 
-def update_mkdocs_nav(config_file: Path, docs_dir: Path):
-    """Update mkdocs.yml nav configuration."""
-    with config_file.open() as f:
-        config = yaml.safe_load(f)
-        
-    nav = get_nav_structure(docs_dir)
-    
-    # Update nav in config
-    config['nav'] = nav
-    
-    # Write updated config
-    with config_file.open('w') as f:
-        yaml.dump(config, f, allow_unicode=True, sort_keys=False)
+def _build_section(directory: str, root: str, cache: Optional[NavMetaCache],
+                   seen: set) -> Tuple[Optional[float], Optional[str], List[Any]]:
+    """Weight, title and entries of the section for directory"""
+    pages = []
+    sections = []
+    indexes = {}
+    try:
+        with os.scandir(directory) as entries:
+            entries = sorted(entries, key=lambda entry: entry.name)
+    except OSError as e:
+        logger.warning(f"Cannot read {directory}: {str(e)}")
+        return None, None, []
+
+    for entry in entries:
+        if entry.name.startswith('.'):
+            continue
+        if entry.is_dir(follow_symlinks=False):
+            weight, title, children = _build_section(entry.path, root, cache, seen)
+            if children:
+                sections.append((weight, title or default_title(entry.name), children))
+        elif entry.name.endswith('.md'):
+            seen.add(entry.path)
+            if cache is not None:
+                count('stat_calls')
+            meta = cache.get(entry.path, entry.stat()) if cache is not None else read_page_meta(Path(entry.path))
+            rel_path = Path(os.path.relpath(entry.path, root)).as_posix()
+            if entry.name in INDEX_PAGES:
+                indexes[entry.name] = (meta, rel_path)
+            else:
+                pages.append((meta.weight, meta.title or default_title(entry.name), rel_path))
+
+    # index.md wins over README.md, which is then an ordinary page
+    index = next((indexes.pop(name) for name in INDEX_PAGES if name in indexes), None)
+    for name, (meta, rel_path) in indexes.items():
+        pages.append((meta.weight, meta.title or default_title(name), rel_path))
+
+    items = sorted(pages + sections, key=_sort_key)
+    children: List[Any] = [{title: value} for _, title, value in items]
+    if index is None:
+        return None, None, children
+    meta, rel_path = index
+    if directory == root:
+        # The home page keeps an explicit entry at the top of the nav
+        children.insert(0, {meta.title or 'Home': rel_path})
+    else:
+        # A bare path first in a section is its index page (navigation.indexes)
+        children.insert(0, rel_path)
+    return meta.weight, meta.title, children
+
+def _yaml_scalar(value: str) -> str:
+    if PLAIN_SCALAR_RE.match(value) and not value.endswith(' ') and value.lower() not in (
+            'yes', 'no', 'true', 'false', 'on', 'off', 'null'):
+        return value
+    return json.dumps(value, ensure_ascii=False)
+
+def format_nav(nav: List[Any], indent: int = 2) -> List[str]:
+    """The nav as YAML lines, indented the way docs/mkdocs.yml is written"""
+    lines = []
+    prefix = ' ' * indent
+    for item in nav:
+        if isinstance(item, str):
+            lines.append(f"{prefix}- {_yaml_scalar(item)}\n")
+            continue
+        (title, value), = item.items()
+        if isinstance(value, list):
+            lines.append(f"{prefix}- {_yaml_scalar(title)}:\n")
+            lines.extend(format_nav(value, indent + 4))
+        else:
+            lines.append(f"{prefix}- {_yaml_scalar(title)}: {_yaml_scalar(value)}\n")
+    return lines
+
+def find_block(lines: List[str], key: str) -> Optional[Tuple[int, int]]:
+    """
+    First and last line of a top-level key's block in YAML config lines, or None.
+
+    The block runs up to the next top-level key, so sequence items written
+    at column 0 belong to it. It ends at its last indented line or item;
+    unindented comments and blank lines before the next key are not part of it.
+    """
+    pattern = re.compile(rf'{re.escape(key)}:(\s|$)')
+    start = next((i for i, line in enumerate(lines) if pattern.match(line)), None)
+    if start is None:
+        return None
+    last = start
+    for i in range(start + 1, len(lines)):
+        line = lines[i]
+        if not line.strip():
+            continue
+        if not line[0].isspace():
+            if line.startswith('#'):
+                continue
+            if not SEQUENCE_ITEM_RE.match(line):
+                break
+        last = i
+    return start, last
+
+def load_block(config: str, key: str) -> Any:
+    """
+    Value of one top-level key of a config, parsed on its own.
+
+    mkdocs.yml uses python tags safe_load rejects; parsing only the block
+    avoids them as well as parsing the rest of the file.
+    """
+    lines = config.splitlines(keepends=True)
+    block = find_block(lines, key)
+    if block is None:
+        return None
+    start, last = block
+    return (yaml.safe_load(''.join(lines[start:last + 1])) or {}).get(key)
+
+def replace_nav(config: str, nav: List[Any]) -> str:
+    """
+    Config text with only its nav: block replaced.
+
+    Everything else, comments, blank lines and key order included, is kept
+    byte for byte. A config without nav gets one appended.
+    """
+    lines = config.splitlines(keepends=True)
+    block = find_block(lines, 'nav')
+    new_block = ['nav:\n'] + format_nav(nav)
+    if block is None:
+        if lines and not lines[-1].endswith('\n'):
+            lines[-1] += '\n'
+        return ''.join(lines + new_block)
+    start, last = block
+    return ''.join(lines[:start] + new_block + lines[last + 1:])
+
+def update_mkdocs_nav(config_file: Path, docs_dir: Path, cache: Optional[NavMetaCache] = None,
+                      check: bool = False) -> bool:
+    """
+    Regenerate the nav of mkdocs.yml from docs_dir, patching only the nav: node.
+
+    The file is written, atomically, only when the nav changed. Returns
+    whether it changed (or, with check, would change).
+    """
+    config = config_file.read_text(encoding='utf-8')
+    updated = replace_nav(config, build_nav(docs_dir, cache))
+    if updated == config:
+        logger.info(f"Navigation in {config_file} is up to date")
+        return False
+    if check:
+        logger.info(f"Navigation in {config_file} is out of date")
+    else:
+        write_text_atomic(config_file, updated)
+        logger.info(f"Updated navigation in {config_file}")
+    return True
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Regenerate the mkdocs.yml nav from the documentation tree')
+    add_path_arguments(parser)
+    parser.add_argument('--check', action='store_true',
+                        help='Exit with status 1 if the nav is out of date instead of writing it')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Read every page instead of using the page metadata cache')
+    add_instrument_arguments(parser)
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    with session(stats=args.stats, profile=args.profile, trace=args.trace):
+        _, config_file, docs_dir = resolve_paths(args.docs_dir, args.config)
+        if config_file is None:
+            logger.error("mkdocs.yml not found")
+            sys.exit(2)
+
+        cache = None if args.no_cache else NavMetaCache(default_cache_path(docs_dir).with_name('nav-meta.json'))
+        changed = update_mkdocs_nav(config_file, docs_dir, cache=cache, check=args.check)
+        if args.check and changed:
+            sys.exit(1)
 
 if __name__ == '__main__':
-    root_dir = Path(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-    config_file = root_dir / "mkdocs.yml"
-    docs_dir = root_dir / "src"
-    
-    update_mkdocs_nav(config_file, docs_dir)
\ No newline at end of file
+    main()
@@ -0,0 +1,302 @@
+import os
+import queue
+import logging
+import threading
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from .cache import DocCache
+from .corpus import DocCorpus, DocFile
+from .rules import ANCHORS, LINKS, RULES, IssueReport, Rule, RuleEngine, create_rules, format_issue
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # pragma: no cover - optional dependency
+    FileSystemEventHandler = object
+    Observer = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL = 1.0
+
+class LinkGraph:
+    """Forward (source -> targets) and reverse (target -> sources) link index."""
+
+    def __init__(self):
+        self.forward: Dict[Path, Set[str]] = {}
+        self.reverse: Dict[str, Set[Path]] = defaultdict(set)
+
+    @classmethod
+    def build(cls, corpus: DocCorpus) -> 'LinkGraph':
+        graph = cls()
+        for doc in corpus:
+            try:
+                graph.update(doc.path, corpus.link_targets(doc))
+            except Exception as e:
+                logger.error(f"Error indexing links in {doc.path}: {str(e)}")
+        return graph
+
+    def update(self, source: Path, targets: Set[str]) -> None:
+        """Replace the outgoing links of source"""
+        for target in self.forward.get(source, set()) - targets:
+            sources = self.reverse.get(target)
+            if sources is not None:
+                sources.discard(source)
+                if not sources:
+                    del self.reverse[target]
+        for target in targets:
+            self.reverse[target].add(source)
+        self.forward[source] = targets
+
+    def remove(self, source: Path) -> None:
+        """Forget every outgoing link of a deleted source"""
+        self.update(source, set())
+        del self.forward[source]
+
+    def sources_of(self, target: str) -> Set[Path]:
+        """Files that link to target"""
+        return set(self.reverse.get(target, ()))
+
+class IncrementalChecker:
+    """
+    Keeps a corpus, its path index and its link graph up to date from change
+    notifications, and re-checks only the changed files plus the files
+    whose links point at a created or deleted path.
+    """
+
+    def __init__(self, corpus: DocCorpus, rules: Optional[List[Rule]] = None):
+        self.corpus = corpus
+        self.graph = LinkGraph.build(corpus)
+        self.engine = RuleEngine(create_rules(corpus.docs_dir) if rules is None else rules)
+
+    def apply(self, changed: Iterable[str]) -> Tuple[IssueReport, List[DocFile], List[Path]]:
+        """Process changed paths; returns the issues of re-checked files, those files and removed files"""
+        index = self.corpus.path_index
+        affected: Dict[Path, DocFile] = {}
+        removed: List[Path] = []
+
+        for path in sorted(set(changed)):
+            abs_path = os.path.abspath(path)
+            exists = os.path.exists(path)
+            created = exists and abs_path not in index.paths
+            if exists:
+                index.add(abs_path)
+            else:
+                index.discard(abs_path)
+
+            anchors_changed = False
+            if path.endswith('.md'):
+                file_path = Path(path)
+                previous_anchors = self.corpus.anchor_index.get(abs_path)
+                if exists and os.path.isfile(path):
+                    affected[file_path] = self.corpus.refresh(file_path)
+                elif file_path in self.corpus:
+                    self.corpus.remove(file_path)
+                    self.graph.remove(file_path)
+                    affected.pop(file_path, None)
+                    removed.append(file_path)
+                anchors_changed = previous_anchors != self.corpus.anchor_index.get(abs_path)
+
+            # Only a change in existence, or in the anchors a file defines,
+            # can alter the results of linking files
+            if created or not exists or anchors_changed:
+                for source in self.graph.sources_of(abs_path):
+                    doc = self.corpus.get(source)
+                    if doc is not None and source not in affected:
+                        doc.fixes.clear()
+                        affected[source] = doc
+
+        issues = IssueReport()
+        for doc in affected.values():
+            try:
+                self.graph.update(doc.path, self.corpus.link_targets(doc))
+                self.engine.check(self.corpus, doc, issues)
+            except Exception as e:
+                logger.error(f"Error checking {doc.path}: {str(e)}")
+        return issues, list(affected.values()), removed
+
+class PollingWatcher:
+    """
+    Dependency-free change detection by polling.
+
+    Markdown files are stat'ed for modifications; directories are stat'ed and
+    only re-listed when their own mtime changes, which is how created,
+    deleted and renamed entries show up. The tree is walked once, up front.
+    """
+
+    def __init__(self, root: Path):
+        self.root = str(root)
+        self._dirs: Dict[str, int] = {}
+        self._files: Dict[str, Tuple[int, int]] = {}
+        self._entries: Dict[str, Set[str]] = {}
+        self._track_dir(self.root, set())
+
+    def _track_dir(self, directory: str, changed: Set[str]) -> None:
+        """Start tracking a directory and everything below it"""
+        stack = [directory]
+        while stack:
+            current = stack.pop()
+            try:
+                self._dirs[current] = os.stat(current).st_mtime_ns
+                names = set()
+                with os.scandir(current) as entries:
+                    for entry in entries:
+                        names.add(entry.name)
+                        changed.add(entry.path)
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.name.endswith('.md'):
+                            st = entry.stat()
+                            self._files[entry.path] = (st.st_mtime_ns, st.st_size)
+                self._entries[current] = names
+            except OSError as e:
+                logger.debug(f"Cannot watch {current}: {str(e)}")
+
+    def _forget(self, path: str, changed: Set[str]) -> None:
+        """Stop tracking a deleted path and everything below it"""
+        prefix = os.path.join(path, '')
+        for tracked in [p for p in self._files if p == path or p.startswith(prefix)]:
+            del self._files[tracked]
+            changed.add(tracked)
+        for tracked in [d for d in self._dirs if d == path or d.startswith(prefix)]:
+            del self._dirs[tracked]
+            self._entries.pop(tracked, None)
+        changed.add(path)
+
+    def poll(self) -> Set[str]:
+        """Return the paths created, modified or deleted since the last poll"""
+        changed: Set[str] = set()
+
+        for directory, mtime in list(self._dirs.items()):
+            if directory not in self._dirs:
+                continue
+            try:
+                current_mtime = os.stat(directory).st_mtime_ns
+            except OSError:
+                self._forget(directory, changed)
+                continue
+            if current_mtime == mtime:
+                continue
+
+            self._dirs[directory] = current_mtime
+            try:
+                names = set(os.listdir(directory))
+            except OSError:
+                continue
+            previous = self._entries.get(directory, set())
+            for name in previous - names:
+                self._forget(os.path.join(directory, name), changed)
+            for name in names - previous:
+                path = os.path.join(directory, name)
+                changed.add(path)
+                if os.path.isdir(path):
+                    self._track_dir(path, changed)
+                elif name.endswith('.md'):
+                    try:
+                        st = os.stat(path)
+                        self._files[path] = (st.st_mtime_ns, st.st_size)
+                    except OSError:
+                        pass
+            self._entries[directory] = names
+
+        for path, signature in list(self._files.items()):
+            try:
+                st = os.stat(path)
+            except OSError:
+                self._forget(path, changed)
+                continue
+            if (st.st_mtime_ns, st.st_size) != signature:
+                self._files[path] = (st.st_mtime_ns, st.st_size)
+                changed.add(path)
+
+        return changed
+
+    def close(self) -> None:
+        pass
+
+class _QueueHandler(FileSystemEventHandler):
+    def __init__(self, events: 'queue.Queue[str]'):
+        super().__init__()
+        self.events = events
+
+    def on_any_event(self, event):
+        self.events.put(event.src_path)
+        dest_path = getattr(event, 'dest_path', None)
+        if dest_path:
+            self.events.put(dest_path)
+
+class NativeWatcher:
+    """Change notifications from the optional watchdog package."""
+
+    def __init__(self, root: Path):
+        self.events: 'queue.Queue[str]' = queue.Queue()
+        self.observer = Observer()
+        self.observer.schedule(_QueueHandler(self.events), str(root), recursive=True)
+        self.observer.start()
+
+    def poll(self) -> Set[str]:
+        changed = set()
+        while True:
+            try:
+                changed.add(self.events.get_nowait())
+            except queue.Empty:
+                return changed
+
+    def close(self) -> None:
+        self.observer.stop()
+        self.observer.join()
+
+def create_watcher(root: Path, native: bool = True):
+    """Use watchdog when installed, otherwise fall back to polling"""
+    if native and Observer is not None:
+        logger.info("Watching documentation with native filesystem events")
+        return NativeWatcher(root)
+    logger.info("Watching documentation by polling")
+    return PollingWatcher(root)
+
+def report_changes(docs_dir: Path, issues: IssueReport, checked: List[DocFile], removed: List[Path]) -> None:
+    """Log the result of an incremental re-check"""
+    for file_path in removed:
+        logger.info(f"Removed {file_path.relative_to(docs_dir)}")
+    for doc in checked:
+        rel_path = doc.path.relative_to(docs_dir)
+        found = {rule: issues.files(rule)[doc.path] for rule, cls in RULES.items()
+                 if not cls.advisory and doc.path in issues.files(rule)}
+        if not found:
+            logger.info(f"{rel_path}: no issues")
+            continue
+        logger.warning(f"{rel_path}: " + ', '.join(f"{len(items)} {RULES[rule].label}" for rule, items in found.items()))
+        # Fixes are listed by the interactive scan; everything else needs attention now
+        for rule, items in found.items():
+            if rule in (LINKS, ANCHORS):
+                continue
+            for issue in items:
+                logger.warning(f"  - {rule}: {format_issue(issue)}")
+
+def watch_docs(docs_dir: Path, cache: Optional[DocCache] = None, interval: float = DEFAULT_INTERVAL,
+               stop_event: Optional[threading.Event] = None, native: bool = True,
+               rules: Optional[List[Rule]] = None) -> None:
+    """Re-check changed documentation with rules, by default the default ones, until stop_event is set"""
+    corpus = DocCorpus.load(docs_dir, cache=cache)
+    stop_event = stop_event or threading.Event()
+    checker = IncrementalChecker(corpus, rules)
+    watcher = create_watcher(docs_dir, native=native)
+    try:
+        while not stop_event.wait(interval):
+            changed = watcher.poll()
+            if changed:
+                report_changes(docs_dir, *checker.apply(changed))
+    finally:
+        watcher.close()
+
+def start_watch_thread(docs_dir: Path, cache: Optional[DocCache] = None,
+                       interval: float = DEFAULT_INTERVAL, native: bool = True,
+                       rules: Optional[List[Rule]] = None) -> threading.Event:
+    """Run watch_docs in a daemon thread; set the returned event to stop it"""
+    stop_event = threading.Event()
+    thread = threading.Thread(target=watch_docs, name='docs-watch', daemon=True,
+                              kwargs={'docs_dir': docs_dir, 'cache': cache, 'interval': interval,
+                                      'stop_event': stop_event, 'native': native, 'rules': rules})
+    thread.start()
+    return stop_event
@@ -1,7 +1,27 @@
 import os
 import re
+import sys
+import json
+import uuid
+import argparse
 from pathlib import Path
 
+# Add repository root to Python path for the shared markdown tokenizer
+SCRIPT_DIR = Path(__file__).resolve().parent
+REPO_ROOT = SCRIPT_DIR.parent
+sys.path.append(str(REPO_ROOT))
+
+from docs.scripts.config import resolve_paths
+from docs.scripts.fileio import write_text_atomic
+from docs.scripts.patch import Edit, apply_edits
+from docs.scripts.tokenizer import link_tokens, tokenize
+
+# Link styles whose target is a path that moves with a renamed file
+LOCAL_LINK_STYLES = ('inline', 'definition', 'html')
+# A nav entry that is a page path, with or without a title: "- Title: path.md" or "- path.md"
+NAV_PAGE_RE = re.compile(r'^(\s*-\s*(?:[^:\n]+:\s*)?)([^\s:#]+\.md)\s*$')
+JOURNAL_NAME = '.rename-journal.jsonl'
+
 def should_be_uppercase(filename):
     uppercase_files = {
         'readme.md',
@@ -27,50 +47,409 @@ def convert_to_kebab_case(filename):
     
     return name + ext
 
-def rename_files(directory):
-    changes_made = False
-    files_processed = 0
-    files_renamed = 0
-    errors = []
-
-    print(f"Starting file renaming process in: {directory}")
-    print("-" * 70)
+def plan_renames(directory):
+    """
+    Map every markdown file that breaks the naming convention to its new path.
 
+    Returns (renames, collisions): renames maps old to new absolute paths and
+    collisions maps each file that cannot be renamed to the reason. A target
+    clashes when another file that stays in place already has that name,
+    compared without case so that the plan holds on case-insensitive
+    filesystems too, or when several files would get the same name. A file
+    that is renamed away frees its name, as renames go through temporary
+    names first. Nothing is renamed.
+    """
+    existing = {}
+    candidates = {}
     for root, dirs, files in os.walk(directory):
-        rel_path = os.path.relpath(root, directory)
         for filename in files:
             if filename.endswith('.md'):
-                files_processed += 1
-                old_path = os.path.join(root, filename)
-                new_filename = convert_to_kebab_case(filename)
-                new_path = os.path.join(root, new_filename)
-                
-                # Show relative path in output
-                display_path = os.path.join(rel_path, filename)
-                display_new_path = os.path.join(rel_path, new_filename)
-                
-                if old_path != new_path:
-                    try:
-                        os.rename(old_path, new_path)
-                        print(f"✓ Renamed: {display_path} -> {display_new_path}")
-                        files_renamed += 1
-                        changes_made = True
-                    except FileExistsError:
-                        error_msg = f"× Error: Cannot rename {display_path} - {display_new_path} already exists"
-                        print(error_msg)
-                        errors.append(error_msg)
-                    except Exception as e:
-                        error_msg = f"× Error processing {display_path}: {str(e)}"
-                        print(error_msg)
-                        errors.append(error_msg)
+                old_path = os.path.abspath(os.path.join(root, filename))
+                existing.setdefault(old_path.casefold(), []).append(old_path)
+                new_path = os.path.join(os.path.dirname(old_path), convert_to_kebab_case(filename))
+                if new_path != old_path:
+                    candidates[old_path] = new_path
+
+    by_target = {}
+    for old_path, new_path in candidates.items():
+        by_target.setdefault(new_path.casefold(), []).append(old_path)
+
+    collisions = {}
+    for old_path, new_path in candidates.items():
+        sources = by_target[new_path.casefold()]
+        if len(sources) > 1:
+            others = ', '.join(os.path.basename(source) for source in sources if source != old_path)
+            collisions[old_path] = f"{os.path.basename(new_path)} is also the new name of {others}"
+
+    # A file that cannot move keeps its name, which may in turn block the
+    # file that was to take it, so clashes are resolved until none is left
+    pending = sorted(candidates)
+    while pending:
+        blocked = []
+        for old_path in pending:
+            if old_path in collisions:
+                continue
+            new_path = candidates[old_path]
+            for clash in existing.get(new_path.casefold(), []):
+                if clash != old_path and (clash not in candidates or clash in collisions):
+                    collisions[old_path] = (f"{os.path.basename(new_path)} clashes with existing "
+                                            f"{os.path.basename(clash)}")
+                    blocked.extend(by_target.get(old_path.casefold(), []))
+                    break
+        pending = blocked
+
+    renames = {old_path: new_path for old_path, new_path in sorted(candidates.items())
+               if old_path not in collisions}
+    return renames, collisions
+
+def _relink(target, source_dir, renames, docs_dir):
+    """
+    The renamed file a link target points at and the target rewritten to
+    its new name, or None if the link points at anything else. Relative
+    targets are resolved against source_dir, root-relative ones (/page.md)
+    against docs_dir, as mkdocs does; either keeps its form.
+    """
+    path, sep, fragment = target.partition('#')
+    if not path or '://' in path or path.startswith(('//', 'mailto:')):
+        return None
+    if path.startswith('/'):
+        old_path = os.path.normpath(os.path.join(docs_dir, path.lstrip('/')))
+    else:
+        old_path = os.path.normpath(os.path.join(source_dir, path))
+    new_path = renames.get(old_path)
+    if new_path is None:
+        return None
+    head = path[:len(path) - len(os.path.basename(path))]
+    return old_path, f"{head}{os.path.basename(new_path)}{sep}{fragment}"
+
+def markdown_files(directory):
+    """Every markdown file under directory, mapped to itself"""
+    files = {}
+    for root, dirs, filenames in os.walk(directory):
+        for filename in filenames:
+            if filename.endswith('.md'):
+                file_path = os.path.abspath(os.path.join(root, filename))
+                files[file_path] = file_path
+    return files
+
+def plan_link_updates(directory, renames, files=None, docs_dir=None):
+    """
+    Edits to every markdown link pointing at a renamed file, keyed by the file
+    holding the link.
+
+    files maps the name each file is keyed by to the path it is read from,
+    every markdown file under directory by default. Root-relative links are
+    resolved against docs_dir, by default directory. Each file is read and
+    tokenized once and each link costs one dictionary lookup, so the pass is
+    linear in the number of files and links however many files are renamed.
+    Edits record the target of the rename they depend on, so they can be
+    dropped if that rename fails.
+    """
+    if files is None:
+        files = markdown_files(directory)
+    docs_dir = os.path.abspath(docs_dir or directory)
+    updates = {}
+    for file_path, current_path in sorted(files.items()):
+        content = Path(current_path).read_text(encoding='utf-8')
+        edits = []
+        for token in link_tokens(tokenize(content)):
+            if token.style not in LOCAL_LINK_STYLES:
+                continue
+            relinked = _relink(token.target, os.path.dirname(file_path), renames, docs_dir)
+            if relinked is None:
+                continue
+            dependency, new_target = relinked
+            old = content[token.target_start:token.target_end]
+            new = f"<{new_target}>" if old.startswith('<') else new_target
+            edits.append((dependency, Edit(old, new, token.target_start, token.target_end)))
+        if edits:
+            updates[file_path] = edits
+    return updates
+
+def plan_nav_updates(config_file, renames):
+    """Edits to the page paths of the mkdocs.yml nav that point at renamed files"""
+    content = Path(config_file).read_text(encoding='utf-8')
+    pages_dir = str(resolve_paths(config=config_file).docs_dir)
+    edits = []
+    in_nav = False
+    offset = 0
+    for line in content.splitlines(keepends=True):
+        if line.startswith('nav:'):
+            in_nav = True
+        elif in_nav and line.strip() and not line[0].isspace() and not line.startswith('#'):
+            in_nav = False
+        match = NAV_PAGE_RE.match(line.rstrip('\r\n')) if in_nav else None
+        if match:
+            relinked = _relink(match.group(2), pages_dir, renames, pages_dir)
+            if relinked is not None:
+                dependency, new_target = relinked
+                edits.append((dependency, Edit(match.group(2), new_target,
+                                               offset + match.start(2), offset + match.end(2))))
+        offset += len(line)
+    return edits
+
+def plan_updates(directory, renames, config_file=None, files=None):
+    """
+    Link edits of every markdown file plus the nav edits of mkdocs.yml, keyed
+    by file. Root-relative links are resolved against the config's docs_dir.
+    """
+    if config_file is None:
+        config_file = os.path.join(directory, 'mkdocs.yml')
+    if not os.path.exists(config_file):
+        return plan_link_updates(directory, renames, files)
+    updates = plan_link_updates(directory, renames, files, str(resolve_paths(config=config_file).docs_dir))
+    nav_edits = plan_nav_updates(config_file, renames)
+    if nav_edits:
+        updates[os.path.abspath(config_file)] = nav_edits
+    return updates
+
+def plan_to_dict(directory, renames, collisions, updates):
+    """JSON-serializable description of a rename plan, for --dry-run"""
+    def relative(path):
+        return Path(os.path.relpath(path, directory)).as_posix()
+
+    return {
+        'directory': str(directory),
+        'renames': [{'old': relative(old_path), 'new': relative(new_path)}
+                    for old_path, new_path in renames.items()],
+        'collisions': [{'path': relative(old_path), 'reason': reason}
+                       for old_path, reason in sorted(collisions.items())],
+        'links': [{'path': relative(file_path), 'edits': [edit._asdict() for _, edit in edits]}
+                  for file_path, edits in sorted(updates.items())],
+        'summary': {
+            'renames': len(renames),
+            'collisions': len(collisions),
+            'links': sum(len(edits) for edits in updates.values()),
+        },
+    }
+
+def _temp_path(path, token):
+    """Temporary name a file is moved to between its old and new names; never ends in .md"""
+    return os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.rename-{token}")
+
+def _listed(path, listings):
+    """Whether a file with exactly this name exists, whatever the case sensitivity of the filesystem"""
+    directory = os.path.dirname(path)
+    if directory not in listings:
+        try:
+            listings[directory] = set(os.listdir(directory))
+        except OSError:
+            listings[directory] = set()
+    return os.path.basename(path) in listings[directory]
+
+def _locate(entry, listings, source_key, target_key):
+    """Which of the temporary, source and target names of a journal entry its file is under, or None"""
+    for key in ('temp', source_key, target_key):
+        if _listed(entry[key], listings):
+            return key
+    return None
+
+def journal_files(directory, entries, reverse=False):
+    """
+    Every markdown file to plan link edits for while a journal is applied,
+    keyed by the name the rename moves it from and mapped to where it is now.
+
+    An interrupted run leaves files under their temporary names, which are
+    not markdown names, or already under their new ones; a fresh listing of
+    the directory would miss the former and key the latter by a name the
+    rename does not know.
+    """
+    source_key, target_key = ('new', 'old') if reverse else ('old', 'new')
+    listings = {}
+    files = {}
+    journaled = set()
+    for entry in entries:
+        journaled.update(path.casefold() for path in (entry['old'], entry['temp'], entry['new']))
+        location = _locate(entry, listings, source_key, target_key)
+        if location is not None:
+            files[entry[source_key]] = entry[location]
+    for file_path in markdown_files(directory):
+        if file_path.casefold() not in journaled:
+            files[file_path] = file_path
+    return files
+
+class RenameJournal:
+    """
+    Append-only JSON lines record of a rename run, kept next to the renamed
+    files until the run completes.
+
+    The first line holds the plan, with the temporary name of every file;
+    each following line records one completed step. A crashed or failed run
+    leaves the journal behind, and the next run resumes the plan from it (or
+    rolls it back) by looking at which of the old, temporary and new names
+    exist, so every step is safe to repeat.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def start(self, directory, renames):
+        token = uuid.uuid4().hex[:8]
+        entries = [{'old': old_path, 'temp': _temp_path(old_path, token), 'new': new_path}
+                   for old_path, new_path in renames.items()]
+        write_text_atomic(Path(self.path), json.dumps({'directory': os.path.abspath(directory),
+                                                       'entries': entries}) + '\n')
+        return entries
+
+    def load(self):
+        with open(self.path, encoding='utf-8') as f:
+            return json.loads(f.readline())['entries']
+
+    def record(self, step, entry):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'step': step, 'old': entry['old']}) + '\n')
+
+    def finish(self):
+        os.remove(self.path)
+
+def _move(source, destination, display_source, display_destination, errors):
+    try:
+        os.rename(source, destination)
+        return True
+    except Exception as e:
+        error_msg = f"× Error renaming {display_source} -> {display_destination}: {str(e)}"
+        print(error_msg)
+        errors.append(error_msg)
+        return False
+
+def apply_renames(directory, entries, journal, errors, reverse=False):
+    """
+    Move every file to its new name (or back to its old one with reverse) in
+    two phases: all files to their temporary names, then all temporary names
+    to their final names. Case-only renames and files taking a name another
+    file gives up never meet an existing file this way.
+
+    Steps already done by an interrupted run are skipped. Returns the entries
+    whose file ended up under its final name.
+    """
+    source_key, target_key = ('new', 'old') if reverse else ('old', 'new')
+    listings = {}
+    moving = []
+    done = []
+    for entry in entries:
+        location = _locate(entry, listings, source_key, target_key)
+        if location == 'temp':
+            moving.append(entry)
+        elif location == source_key:
+            moving.append(dict(entry, pending=True))
+        elif location == target_key:
+            done.append(entry)
+        else:
+            error_msg = f"× Error: {os.path.relpath(entry['old'], directory)} is missing"
+            print(error_msg)
+            errors.append(error_msg)
+
+    def display(path):
+        return os.path.relpath(path, directory)
+
+    staged = []
+    for entry in moving:
+        if entry.pop('pending', False):
+            if not _move(entry[source_key], entry['temp'], display(entry[source_key]),
+                         display(entry['temp']), errors):
+                continue
+            journal.record('temp', entry)
+        staged.append(entry)
+
+    for entry in staged:
+        if _move(entry['temp'], entry[target_key], display(entry['temp']), display(entry[target_key]), errors):
+            journal.record('rollback' if reverse else 'final', entry)
+            print(f"✓ Renamed: {display(entry[source_key])} -> {display(entry[target_key])}")
+            done.append(entry)
+        else:
+            # Put the file back under its name so the tree stays consistent
+            _move(entry['temp'], entry[source_key], display(entry['temp']), display(entry[source_key]), errors)
+    return done
+
+def apply_updates(directory, updates, renamed, errors):
+    """Rewrite each file holding links once, with the edits whose rename succeeded"""
+    links_updated = 0
+    for file_path, edits in sorted(updates.items()):
+        edits = [edit for dependency, edit in edits if dependency in renamed]
+        if not edits:
+            continue
+        current_path = renamed.get(file_path, file_path)
+        display_path = os.path.relpath(current_path, directory)
+        try:
+            content = Path(current_path).read_text(encoding='utf-8')
+            write_text_atomic(Path(current_path), apply_edits(content, edits))
+            print(f"✓ Updated {len(edits)} links in {display_path}")
+            links_updated += len(edits)
+        except Exception as e:
+            error_msg = f"× Error updating links in {display_path}: {str(e)}"
+            print(error_msg)
+            errors.append(error_msg)
+    return links_updated
+
+def rename_files(directory, config_file=None, dry_run=False, journal_path=None, rollback=False):
+    """
+    Rename markdown files to kebab-case and update every link to them.
+
+    The whole rename is planned before anything is touched: the old to new
+    mapping, the collisions, and the link and nav edits. With dry_run the
+    plan is printed as JSON and nothing else happens. Otherwise the plan is
+    written to a journal, files are renamed through temporary names, and
+    each file holding links is rewritten once, keeping only the edits whose
+    rename succeeded. The journal is removed once every step succeeded; if
+    it is still there, the next run resumes it, or undoes it with rollback.
+    """
+    journal = RenameJournal(journal_path or os.path.join(directory, JOURNAL_NAME))
+    errors = []
+
+    if rollback or (journal.exists() and not dry_run):
+        if not journal.exists():
+            print(f"Error: No rename journal found at {journal.path}")
+            return
+        entries = journal.load()
+        print(f"{'Rolling back' if rollback else 'Resuming'} the rename recorded in {journal.path}")
+        print("-" * 70)
+        collisions = {}
+    else:
+        renames, collisions = plan_renames(directory)
+        if dry_run:
+            print(json.dumps(plan_to_dict(directory, renames, collisions,
+                                          plan_updates(directory, renames, config_file)),
+                             indent=2, ensure_ascii=False))
+            return
+        print(f"Starting file renaming process in: {directory}")
+        print("-" * 70)
+        for old_path, reason in sorted(collisions.items()):
+            error_msg = f"× Error: Cannot rename {os.path.relpath(old_path, directory)} - {reason}"
+            print(error_msg)
+            errors.append(error_msg)
+        entries = journal.start(directory, renames) if renames else []
+
+    # Links are planned against the mapping being applied, reading each file
+    # wherever the journal left it; files already rewritten no longer link to
+    # old names, so planning again on resume is safe
+    if rollback:
+        mapping = {entry['new']: entry['old'] for entry in entries}
+    else:
+        mapping = {entry['old']: entry['new'] for entry in entries}
+    updates = plan_updates(directory, mapping, config_file,
+                           files=journal_files(directory, entries, reverse=rollback))
+
+    done = apply_renames(directory, entries, journal, errors, reverse=rollback)
+    renamed = {source: mapping[source] for source in
+               (entry['new'] if rollback else entry['old'] for entry in done)}
+    links_updated = apply_updates(directory, updates, renamed, errors)
+
+    if entries and len(errors) == len(collisions):
+        journal.finish()
+    elif entries:
+        print(f"\nThe rename journal was kept at {journal.path}; "
+              "run again to resume, or with --rollback to undo it.")
 
     print("\nSummary:")
     print("-" * 70)
-    print(f"Total files processed: {files_processed}")
-    print(f"Files renamed: {files_renamed}")
+    print(f"Files renamed: {len(done)}")
+    print(f"Links updated: {links_updated}")
     print(f"Errors encountered: {len(errors)}")
 
-    if not changes_made:
+    if not entries and not collisions:
         print("\nNo files needed renaming - all files follow the naming convention.")
     
     if errors:
@@ -78,13 +457,26 @@ def rename_files(directory):
         for error in errors:
             print(error)
 
-if __name__ == "__main__":
-    # Get the script's directory
-    script_dir = Path(__file__).parent.parent
-    # Construct path to docs directory
-    docs_path = script_dir / "docs"
-    
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Rename markdown files to kebab-case and update links to them')
+    parser.add_argument('directory', nargs='?', default=str(REPO_ROOT / "docs"),
+                        help='Directory to rename files in (default: docs)')
+    parser.add_argument('--config', default=None,
+                        help='mkdocs.yml whose nav is updated (default: <directory>/mkdocs.yml)')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Print the rename plan as JSON without renaming anything')
+    parser.add_argument('--journal', default=None,
+                        help=f'Rename journal used to resume or roll back a run (default: <directory>/{JOURNAL_NAME})')
+    parser.add_argument('--rollback', action='store_true',
+                        help='Undo the rename recorded in the journal')
+    args = parser.parse_args(argv)
+
+    docs_path = Path(args.directory)
     if not docs_path.exists():
         print(f"Error: Directory '{docs_path}' not found!")
     else:
-        rename_files(str(docs_path))
\ No newline at end of file
+        rename_files(str(docs_path), config_file=args.config, dry_run=args.dry_run,
+                     journal_path=args.journal, rollback=args.rollback)
+
+if __name__ == "__main__":
+    main()
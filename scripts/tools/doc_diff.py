@@ -6,15 +6,31 @@ Generates a comprehensive report of documentation changes in the repository.
 Place this script in scripts/generate/doc_diff.py
 
 Usage:
-    python3 doc_diff.py [--base COMMIT] [--head COMMIT]
+    python3 doc_diff.py [--base COMMIT] [--head COMMIT] [--stream]
+                        [--format txt|json|jsonl|md|html] [--changed-only]
 
 If not provided, --base defaults to the HEAD of the main branch (origin/main) 
 and --head defaults to the current branch's HEAD.
+
+With --stream, git output and current file contents are copied into the
+report in fixed-size chunks instead of being loaded into memory, so peak
+memory stays flat regardless of repository size.
+
+The json, jsonl, md and html formats describe each changed file with its
+line additions/deletions (git diff --numstat) and the headers whose
+sections were added, removed or modified, without embedding file contents.
+With --changed-only, unchanged files are left out of every format.
 """
 
 import os
+import re
 import sys
+import html
+import json
+import shutil
+import hashlib
 import argparse
+import tempfile
 from datetime import datetime
 import subprocess
 from pathlib import Path
@@ -24,16 +40,139 @@ SCRIPT_DIR = Path(__file__).resolve().parent
 REPO_ROOT = SCRIPT_DIR.parent.parent
 sys.path.append(str(REPO_ROOT))
 
+# Size of the chunks copied into the report in streaming mode
+CHUNK_SIZE = 1024 * 1024
+
+REPORT_FORMATS = ('txt', 'json', 'jsonl', 'md', 'html')
+
+HEADER_PATTERN = re.compile(r'^(#{1,6})\s+(.+?)(?:\s+#+)?\s*$')
+FENCE_PATTERN = re.compile(r'^\s*(```|~~~)')
+
+
+def markdown_sections(content):
+    """Map each ATX header of a markdown document to a hash of its section body.
+
+    Headers inside fenced code blocks are ignored. Repeated headers are
+    numbered ("Examples", "Examples (2)") so every section has its own key.
+    Blank lines around a body are not part of it, so appending a section
+    does not mark the one before it as modified.
+    """
+    sections = {}
+    seen = {}
+    current = None
+    body = []
+    fence = None
+
+    def close_section():
+        if current is not None:
+            lines = [i for i, line in enumerate(body) if line.strip()]
+            text = "\n".join(body[lines[0]:lines[-1] + 1]) if lines else ""
+            sections[current] = hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    for line in content.splitlines():
+        fence_match = FENCE_PATTERN.match(line)
+        if fence_match:
+            marker = fence_match.group(1)
+            if fence is None:
+                fence = marker
+            elif marker == fence:
+                fence = None
+        elif fence is None:
+            header = HEADER_PATTERN.match(line)
+            if header:
+                close_section()
+                title = f"{header.group(1)} {header.group(2)}"
+                seen[title] = seen.get(title, 0) + 1
+                current = title if seen[title] == 1 else f"{title} ({seen[title]})"
+                body = []
+                continue
+        body.append(line)
+    close_section()
+    return sections
+
+
+def diff_sections(old_content, new_content):
+    """Compare the header-level sections of two versions of a document."""
+    old_sections = markdown_sections(old_content or "")
+    new_sections = markdown_sections(new_content or "")
+    return {
+        'added': [h for h in new_sections if h not in old_sections],
+        'removed': [h for h in old_sections if h not in new_sections],
+        'modified': [h for h in new_sections if h in old_sections and old_sections[h] != new_sections[h]],
+    }
+
+
+class GitCatFile:
+    """A single long-lived `git cat-file --batch` process serving blob requests.
+
+    Every object is requested over the same pipe, so retrieving hundreds of
+    files costs one process instead of one `git show` per file.
+    """
+
+    def __init__(self, cwd):
+        self.process = subprocess.Popen(
+            ["git", "cat-file", "--batch"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            cwd=str(cwd)
+        )
+
+    def _request(self, commit, file_path):
+        """Ask for commit:file_path and return the object size, or None if it does not exist."""
+        self.process.stdin.write(f"{commit}:{file_path}\n".encode('utf-8'))
+        self.process.stdin.flush()
+        header = self.process.stdout.readline().rstrip(b"\n").split(b" ")
+        if len(header) != 3 or header[1] != b"blob":
+            # "<spec> missing", "<spec> ambiguous", or a tree/commit we cannot print
+            if len(header) == 3 and header[2].isdigit():
+                self.process.stdout.read(int(header[2]) + 1)
+            return None
+        return int(header[2])
+
+    def read(self, commit, file_path):
+        """Return the content of file_path at commit as bytes, or None."""
+        size = self._request(commit, file_path)
+        if size is None:
+            return None
+        data = self.process.stdout.read(size)
+        self.process.stdout.read(1)  # trailing newline
+        return data
+
+    def copy(self, commit, file_path, out):
+        """Copy the content of file_path at commit into out in chunks; returns bytes written."""
+        size = self._request(commit, file_path)
+        if size is None:
+            return 0
+        remaining = size
+        while remaining:
+            chunk = self.process.stdout.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            out.write(chunk)
+            remaining -= len(chunk)
+        self.process.stdout.read(1)  # trailing newline
+        return size
+
+    def close(self):
+        if self.process.poll() is None:
+            self.process.stdin.close()
+            self.process.wait()
+            self.process.stdout.close()
+
 
 class DocReportGenerator:
-    def __init__(self, base_commit=None, head_commit=None):
+    def __init__(self, base_commit=None, head_commit=None, stream=False, reports_dir=None):
+        self.stream = stream
         self.git_root = self.get_git_root()
         self.docs_dir = self.git_root / 'docs'
-        self.reports_dir = self.git_root / 'reports' / 'doc-changes'
+        self.reports_dir = Path(reports_dir) if reports_dir else self.git_root / 'reports' / 'doc-changes'
         self.reports_dir.mkdir(parents=True, exist_ok=True)
         self.is_new_repo = self.check_if_new_repo()
+        # Without --head the report describes the working tree
+        self.head_given = head_commit is not None
         self.base_commit = base_commit or self.get_main_commit()
         self.head_commit = head_commit or self.get_current_commit()
+        self._cat_file = None
 
     @staticmethod
     def run_command(command, ignore_errors=False):
@@ -54,6 +193,87 @@ class DocReportGenerator:
                 print(f"Warning: Command '{command}' returned: {e.stderr.strip()}")
             return ""
 
+    @staticmethod
+    def stream_command(command, out, ignore_errors=False):
+        """Run a shell command and copy its stdout into the binary stream out in chunks.
+
+        Returns the number of bytes written.
+        """
+        written = 0
+        with tempfile.TemporaryFile() as stderr:
+            process = subprocess.Popen(
+                command,
+                shell=True,
+                stdout=subprocess.PIPE,
+                stderr=stderr,
+                cwd=str(REPO_ROOT)
+            )
+            with process.stdout:
+                while True:
+                    chunk = process.stdout.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    out.write(chunk)
+                    written += len(chunk)
+            returncode = process.wait()
+            if returncode != 0 and not ignore_errors:
+                stderr.seek(0)
+                message = stderr.read().decode('utf-8', errors='replace').strip()
+                print(f"Warning: Command '{command}' returned: {message}")
+        return written
+
+    def write_file_content(self, f, file, commit):
+        """Write the content of a file at a commit into the report."""
+        if not self.stream:
+            content = self.get_file_content(file, commit)
+            f.write(content if content else "No previous content available\n")
+            return
+        f.flush()
+        if self.is_new_repo or not self.cat_file.copy(commit, file, f.buffer):
+            f.write("No previous content available\n")
+
+    def write_current_content(self, f, file_path):
+        """Write the current content of a file into the report."""
+        if not self.stream:
+            f.write(file_path.read_text(encoding='utf-8'))
+            return
+        f.flush()
+        with open(file_path, 'rb') as src:
+            shutil.copyfileobj(src, f.buffer, CHUNK_SIZE)
+
+    def write_diff(self, f):
+        """Write the diff between base and head commits into the report."""
+        command = f"git diff {self.base_commit} {self.head_commit} -- docs/"
+        if not self.stream:
+            f.write(self.run_command(command, ignore_errors=True))
+            return
+        f.flush()
+        self.stream_command(command, f.buffer, ignore_errors=True)
+
+    @staticmethod
+    def run_git_z(args, ignore_errors=False):
+        """Run git without a shell and split its NUL-terminated output."""
+        result = subprocess.run(["git", *args], capture_output=True, cwd=str(REPO_ROOT))
+        if result.returncode != 0:
+            if not ignore_errors:
+                print(f"Warning: Command 'git {' '.join(args)}' returned: "
+                      f"{result.stderr.decode('utf-8', errors='replace').strip()}")
+            return []
+        return [name.decode('utf-8', errors='surrogateescape') for name in result.stdout.split(b"\0") if name]
+
+    @property
+    def cat_file(self):
+        """The shared `git cat-file --batch` process, started on first use."""
+        if self._cat_file is None:
+            self._cat_file = GitCatFile(REPO_ROOT)
+        return self._cat_file
+
+    def close(self):
+        """Stop the `git cat-file --batch` process, if it was started."""
+        if self._cat_file is not None:
+            self._cat_file.close()
+            self._cat_file = None
+
     def get_git_root(self):
         """Get the root directory of the git repository."""
         root = self.run_command("git rev-parse --show-toplevel")
@@ -80,23 +300,198 @@ class DocReportGenerator:
         """Get all markdown files in the repository at a specific commit."""
         if self.is_new_repo:
             return []
-        files = self.run_command(f"git ls-tree -r --name-only {commit} -- docs/", ignore_errors=True)
-        return [f for f in files.split('\n') if f and f.endswith('.md')]
+        files = self.run_git_z(["ls-tree", "-r", "-z", "--name-only", commit, "--", "docs/"], ignore_errors=True)
+        return [f for f in files if f.endswith('.md')]
+
+    def get_modified_markdown_files(self):
+        """Get markdown files that differ between the base and head commits."""
+        files = self.run_git_z(["diff", "--name-only", "-z", self.base_commit, self.head_commit, "--", "docs/"],
+                               ignore_errors=True)
+        return [f for f in files if f.endswith('.md')]
 
     def get_current_markdown_files(self):
         """Get all current markdown files in the docs directory."""
         return [str(p.relative_to(self.git_root)) for p in self.docs_dir.rglob("*.md")]
 
+    def get_head_markdown_files(self):
+        """Get the markdown files at the head commit if one was given, otherwise those in the docs directory."""
+        if self.head_given:
+            return self.get_all_markdown_files(self.head_commit)
+        return self.get_current_markdown_files()
+
+    def get_numstat(self):
+        """Get per-file (additions, deletions) between the base and head commits.
+
+        Binary files report None for both counts.
+        """
+        if self.is_new_repo:
+            return {}
+        stats = {}
+        for record in self.run_git_z(["diff", "--numstat", "--no-renames", "-z",
+                                      self.base_commit, self.head_commit, "--", "docs/"],
+                                     ignore_errors=True):
+            added, deleted, path = record.split("\t", 2)
+            stats[path] = (None if added == "-" else int(added), None if deleted == "-" else int(deleted))
+        return stats
+
+    def get_head_content(self, file_path):
+        """Get content of a file at the head commit, or from the working tree if it is not committed."""
+        if not self.is_new_repo:
+            content = self.cat_file.read(self.head_commit, file_path)
+            if content is not None:
+                return content.decode('utf-8', errors='replace')
+        path = self.git_root / file_path
+        return path.read_text(encoding='utf-8') if path.exists() else ""
+
+    def collect_file_changes(self, changed_only=False):
+        """Describe every documentation file as a dict, changed files first in path order."""
+        old_files = set(self.get_all_markdown_files(self.base_commit))
+        current_files = set(self.get_head_markdown_files())
+        modified_files = set() if self.is_new_repo else set(self.get_modified_markdown_files())
+        numstat = self.get_numstat()
+
+        statuses = {}
+        for file in old_files - current_files:
+            statuses[file] = 'removed'
+        for file in current_files - old_files:
+            statuses[file] = 'added'
+        for file in modified_files:
+            statuses.setdefault(file, 'modified')
+        if not changed_only:
+            for file in current_files:
+                statuses.setdefault(file, 'unchanged')
+
+        for file in sorted(statuses):
+            status = statuses[file]
+            entry = {'path': file, 'status': status}
+            if status == 'unchanged':
+                yield entry
+                continue
+            additions, deletions = numstat.get(file, (None, None))
+            old_content = "" if status == 'added' else self.get_file_content(file, self.base_commit)
+            new_content = "" if status == 'removed' else self.get_head_content(file)
+            if additions is None and deletions is None and status != 'modified':
+                # Not part of the base..head diff, e.g. an uncommitted file
+                additions = len(new_content.splitlines())
+                deletions = len(old_content.splitlines())
+            entry['additions'] = additions
+            entry['deletions'] = deletions
+            entry['sections'] = diff_sections(old_content, new_content)
+            yield entry
+
+    def report_metadata(self):
+        return {
+            'generated': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'repository': self.git_root.name,
+            'base': self.base_commit,
+            'head': self.head_commit,
+            'new_repository': self.is_new_repo,
+        }
+
+    @staticmethod
+    def summarize(files, summary=None):
+        """Count files per status and total line changes, optionally adding to an existing summary."""
+        if summary is None:
+            summary = {'added': 0, 'removed': 0, 'modified': 0, 'unchanged': 0, 'additions': 0, 'deletions': 0}
+        for entry in files:
+            summary[entry['status']] += 1
+            summary['additions'] += entry.get('additions') or 0
+            summary['deletions'] += entry.get('deletions') or 0
+        return summary
+
+    def write_structured_report(self, f, report_format, changed_only=False):
+        """Write the report in one of the structured formats."""
+        metadata = self.report_metadata()
+
+        if report_format == 'jsonl':
+            # One record per line, written as files are processed
+            f.write(json.dumps({'type': 'report', **metadata}) + "\n")
+            summary = self.summarize([])
+            for entry in self.collect_file_changes(changed_only):
+                f.write(json.dumps({'type': 'file', **entry}) + "\n")
+                self.summarize([entry], summary)
+            f.write(json.dumps({'type': 'summary', **summary}) + "\n")
+            return
+
+        files = list(self.collect_file_changes(changed_only))
+        summary = self.summarize(files)
+
+        if report_format == 'json':
+            json.dump({**metadata, 'summary': summary, 'files': files}, f, indent=2)
+            f.write("\n")
+        elif report_format == 'md':
+            self.write_markdown(f, metadata, summary, files)
+        else:
+            self.write_html(f, metadata, summary, files)
+
+    @staticmethod
+    def format_count(value):
+        return "-" if value is None else str(value)
+
+    def write_markdown(self, f, metadata, summary, files):
+        f.write("# Documentation Changes Report\n\n")
+        f.write(f"- Generated: {metadata['generated']}\n")
+        f.write(f"- Repository: {metadata['repository']}\n")
+        f.write(f"- Base: `{metadata['base']}`\n")
+        f.write(f"- Head: `{metadata['head']}`\n\n")
+        f.write("## Summary\n\n")
+        f.write("| Added | Removed | Modified | Unchanged | Lines added | Lines deleted |\n")
+        f.write("|------:|--------:|---------:|----------:|------------:|--------------:|\n")
+        f.write(f"| {summary['added']} | {summary['removed']} | {summary['modified']} | {summary['unchanged']} "
+                f"| {summary['additions']} | {summary['deletions']} |\n\n")
+        f.write("## Files\n\n")
+        f.write("| File | Status | + | - | Sections added | Sections removed | Sections modified |\n")
+        f.write("|------|--------|--:|--:|----------------|------------------|-------------------|\n")
+        for entry in files:
+            sections = entry.get('sections', {})
+            cells = [", ".join(sections.get(kind, [])).replace("|", "\\|") for kind in ('added', 'removed', 'modified')]
+            f.write(f"| `{entry['path']}` | {entry['status']} | {self.format_count(entry.get('additions'))} "
+                    f"| {self.format_count(entry.get('deletions'))} | {cells[0]} | {cells[1]} | {cells[2]} |\n")
+
+    def write_html(self, f, metadata, summary, files):
+        esc = html.escape
+        f.write("<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n")
+        f.write("<title>Documentation Changes Report</title>\n</head>\n<body>\n")
+        f.write("<h1>Documentation Changes Report</h1>\n<ul>\n")
+        for key in ('generated', 'repository', 'base', 'head'):
+            f.write(f"<li>{esc(key.title())}: {esc(str(metadata[key]))}</li>\n")
+        f.write("</ul>\n<h2>Summary</h2>\n<table>\n<tr>")
+        for key in summary:
+            f.write(f"<th>{esc(key)}</th>")
+        f.write("</tr>\n<tr>")
+        for value in summary.values():
+            f.write(f"<td>{value}</td>")
+        f.write("</tr>\n</table>\n<h2>Files</h2>\n<table>\n")
+        f.write("<tr><th>File</th><th>Status</th><th>+</th><th>-</th>"
+                "<th>Sections added</th><th>Sections removed</th><th>Sections modified</th></tr>\n")
+        for entry in files:
+            sections = entry.get('sections', {})
+            cells = "".join(f"<td>{'<br>'.join(esc(h) for h in sections.get(kind, []))}</td>"
+                            for kind in ('added', 'removed', 'modified'))
+            f.write(f"<tr><td>{esc(entry['path'])}</td><td>{esc(entry['status'])}</td>"
+                    f"<td>{self.format_count(entry.get('additions'))}</td>"
+                    f"<td>{self.format_count(entry.get('deletions'))}</td>{cells}</tr>\n")
+        f.write("</table>\n</body>\n</html>\n")
+
     def get_file_content(self, file_path, commit):
         """Get content of a file at a specific commit."""
         if self.is_new_repo:
             return ""
-        return self.run_command(f"git show {commit}:{file_path}", ignore_errors=True)
+        content = self.cat_file.read(commit, file_path)
+        if content is None:
+            return ""
+        return content.decode('utf-8', errors='replace').strip()
 
-    def generate_report(self):
+    def generate_report(self, report_format='txt', changed_only=False):
         """Generate the documentation change report."""
         timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        report_file = self.reports_dir / f"doc_changes_report_{timestamp}.txt"
+        report_file = self.reports_dir / f"doc_changes_report_{timestamp}.{report_format}"
+
+        if report_format != 'txt':
+            with open(report_file, 'w', encoding='utf-8') as f:
+                self.write_structured_report(f, report_format, changed_only)
+            print(f"\nReport generated: {report_file}")
+            return report_file
         
         old_files = set(self.get_all_markdown_files(self.base_commit))
         current_files = set(self.get_current_markdown_files())
@@ -128,9 +523,9 @@ class DocReportGenerator:
                     f.write(f"- {file}\n")
             
             # Modified files (using git diff)
+            modified_files = []
             if not self.is_new_repo:
-                diff_files = self.run_command(f"git diff --name-only {self.base_commit} {self.head_commit} -- docs/", ignore_errors=True)
-                modified_files = [f for f in diff_files.split('\n') if f and f.endswith('.md')]
+                modified_files = self.get_modified_markdown_files()
                 if modified_files:
                     f.write("\nMODIFIED FILES:\n")
                     for file in sorted(modified_files):
@@ -142,36 +537,45 @@ class DocReportGenerator:
                 f.write("=" * 80 + "\n")
                 for file in sorted(removed_files | set(modified_files)):
                     f.write(f"\n--- {file} ---\n")
-                    content = self.get_file_content(file, self.base_commit)
-                    f.write(content if content else "No previous content available\n")
+                    self.write_file_content(f, file, self.base_commit)
             
             # Section 3: Current Content
             f.write("\n\n3. CURRENT CONTENT\n")
             f.write("=" * 80 + "\n")
+            if changed_only:
+                current_files = added_files | (current_files & set(modified_files))
             for file in sorted(current_files):
                 file_path = self.git_root / file
                 if file_path.exists():
                     f.write(f"\n--- {file} ---\n")
-                    f.write(file_path.read_text(encoding='utf-8'))
+                    self.write_current_content(f, file_path)
             
             # Section 4: Detailed Diff
             if not self.is_new_repo:
                 f.write("\n\n4. DETAILED DIFF (between base and head commits)\n")
                 f.write("=" * 80 + "\n")
-                diff = self.run_command(f"git diff {self.base_commit} {self.head_commit} -- docs/", ignore_errors=True)
-                f.write(diff)
+                self.write_diff(f)
         
         print(f"\nReport generated: {report_file}")
         return report_file
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(description="Generate a documentation change report for the repository.")
     parser.add_argument("--base", type=str, default=None, help="Base commit for diff (default: HEAD of main branch)")
     parser.add_argument("--head", type=str, default=None, help="Head commit for diff (default: current HEAD)")
-    args = parser.parse_args()
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream git output and file contents into the report with bounded memory")
+    parser.add_argument("--format", choices=REPORT_FORMATS, default="txt",
+                        help="Report format (default: txt)")
+    parser.add_argument("--changed-only", action="store_true",
+                        help="Leave unchanged files out of the report")
+    args = parser.parse_args(argv)
     
-    generator = DocReportGenerator(base_commit=args.base, head_commit=args.head)
-    report_file = generator.generate_report()
+    generator = DocReportGenerator(base_commit=args.base, head_commit=args.head, stream=args.stream)
+    try:
+        report_file = generator.generate_report(report_format=args.format, changed_only=args.changed_only)
+    finally:
+        generator.close()
     print(f"Documentation change report saved to: {report_file}")
 
 if __name__ == "__main__":
@@ -23,10 +23,13 @@ def print_tree(t, prefix=""):
             new_prefix = prefix + "│   "
         print_tree(t[key], new_prefix)
 
-if __name__ == '__main__':
+def main(argv=None):
     t = tree()
     for line in sys.stdin:
         line = line.strip()
         if line:
             insert_path(t, line)
-    print_tree(t)
\ No newline at end of file
+    print_tree(t)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,8 @@
+import sys
+from pathlib import Path
+
+# The documentation tooling is imported as the docs.scripts package, and the
+# repository scripts as scripts.*, both from the repository root
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
@@ -0,0 +1,104 @@
+import pytest
+
+from docs.scripts.add_anchors import get_header_changes
+from docs.scripts.anchors import (AnchorIndex, anchor_renames, collect_anchors, header_ids, heading_text, slugify,
+                                  split_fragment, unique_id)
+from docs.scripts.corpus import DocCorpus
+from docs.scripts.tokenizer import tokenize
+
+
+def write(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content, encoding='utf-8')
+    return path
+
+
+@pytest.fixture
+def docs(tmp_path):
+    docs = tmp_path / 'docs'
+    write(docs / 'index.md', '# Home {: #home }\n\n'
+                             '[setup](guide/setup.md#install), [gone](guide/setup.md#gone), '
+                             '[top](#home), [nowhere](#nowhere), [html](guide/setup.md#legacy), '
+                             '[outside](../README.md#x) and [missing](missing.md#x)\n')
+    write(docs / 'guide' / 'setup.md', '# Setup {: #setup }\n\n## Install\n\n<a name="legacy"></a>\n')
+    return docs
+
+
+def test_split_fragment():
+    assert split_fragment('page.md#top') == ('page.md', 'top')
+    assert split_fragment('page.md#') == ('page.md', '')
+    assert split_fragment('page.md') == ('page.md', None)
+
+
+def test_collect_anchors_covers_headers_and_explicit_anchors():
+    tokens = tokenize('# Title {: #custom }\n\n## Second Part\n\n<span id="raw"></span>\n\n```\n# code\n```\n')
+    assert collect_anchors(tokens) == {'custom', 'second-part', 'raw'}
+
+
+def test_index_only_checks_indexed_files():
+    index = AnchorIndex()
+    index.set('/docs/page.md', {'top'})
+    assert index.has('/docs/page.md', 'top')
+    assert not index.has('/docs/page.md', 'bottom')
+    assert index.has('/docs/other.md', 'anything')
+    index.discard('/docs/page.md')
+    assert '/docs/page.md' not in index
+
+
+def test_broken_anchors_across_the_corpus(docs):
+    corpus = DocCorpus.load(docs)
+    assert corpus.broken_anchors(corpus.files[docs / 'index.md']) == ['#nowhere', 'guide/setup.md#gone']
+
+
+def test_refresh_updates_the_index(docs):
+    corpus = DocCorpus.load(docs)
+    index = corpus.files[docs / 'index.md']
+    assert 'guide/setup.md#gone' in corpus.broken_anchors(index)
+
+    write(docs / 'guide' / 'setup.md', '# Setup {: #setup }\n\n## Install\n\n## Gone\n')
+    corpus.refresh(docs / 'guide' / 'setup.md')
+    assert corpus.broken_anchors(index) == ['#nowhere', 'guide/setup.md#legacy']
+
+
+def test_slugify_matches_the_toc_extension():
+    assert slugify('Café & Crème: naïve_test 🚀 2.0') == 'cafe-creme-naive_test-20'
+    assert slugify('日本語 Title') == 'title'
+    assert slugify('日本語 Title', unicode=True) == '日本語-title'
+
+
+def test_heading_text_strips_markup():
+    assert heading_text('The `code` and [link](x.md) **bold** &amp; <b>tag</b> ##') == 'The code and link bold & tag'
+
+
+def test_unique_id_counts_like_toc():
+    used = set()
+    assert [unique_id(anchor, used) for anchor in ['a', 'a', 'a_1', '', 'b_3', 'b_3']] == [
+        'a', 'a_1', 'a_2', '_1', 'b_3', 'b_4']
+
+
+def test_header_ids_number_duplicates_deterministically():
+    tokens = tokenize('# Intro\n\n## Setup\n\n## Setup\n\n## Setup {: #setup }\n\n'
+                      '## Usage {: #usage }\n\n## Other {: #usage }\n')
+    assert [anchor for _, anchor in header_ids(tokens)] == ['intro', 'setup_1', 'setup_2', 'setup', 'usage', 'usage']
+    assert [anchor for _, anchor in header_ids(tokens, dedupe=True)] == [
+        'intro', 'setup_1', 'setup_2', 'setup', 'usage', 'usage_1']
+
+
+def test_header_changes_pin_rendered_ids():
+    content = '# Intro\n\n## Old style {#old}\n\n## Kept {: #kept }\n\n## Twice {: #kept }\n'
+    assert [(edit.old, edit.new) for edit in get_header_changes(content)] == [
+        ('# Intro', '# Intro {: #intro}'),
+        ('## Old style {#old}', '## Old style {: #old}'),
+        ('## Twice {: #kept }', '## Twice {: #kept_1}'),
+    ]
+
+
+def test_renumbering_that_moves_an_id_is_a_rename(tmp_path):
+    content = '## A {: #x }\n\n## B {: #x }\n\n## X\n'
+    assert anchor_renames(tokenize(content)) == {'x_1': 'x_2'}
+
+    docs = tmp_path / 'docs'
+    page = write(docs / 'page.md', content)
+    source = write(docs / 'index.md', '[third](page.md#x_1) and [first](page.md#x)\n')
+    corpus = DocCorpus.load(docs)
+    assert corpus.breaking_links(corpus.files[page]) == [(source, 'page.md#x_1', 'x_2')]
@@ -0,0 +1,101 @@
+import json
+import os
+import stat
+
+import pytest
+
+from docs.scripts.batch import select_fix_kinds
+from docs.scripts.fileio import write_text_atomic
+from docs.scripts.serve_docs import main
+
+
+def write(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content, encoding='utf-8')
+    return path
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    write(tmp_path / 'mkdocs.yml', 'site_name: Test\ndocs_dir: src\n')
+    docs = tmp_path / 'src'
+    write(docs / 'index.md', '# Home {: #home }\n\n[Setup](guide/../guide/setup.md) and [new](new-page.md)\n')
+    write(docs / 'guide' / 'setup.md', '# Setup\n\n## Install\n')
+    # main() changes to the project root
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def run(project, *args):
+    manifest = project / 'manifest.json'
+    with pytest.raises(SystemExit) as exit:
+        main(['--config', str(project / 'mkdocs.yml'), '--no-cache', '--manifest', str(manifest), *args])
+    return exit.value.code, json.loads(manifest.read_text(encoding='utf-8'))
+
+
+def snapshot(directory):
+    return {path: path.read_bytes() for path in sorted(directory.rglob('*')) if path.is_file()}
+
+
+def test_select_fix_kinds():
+    assert select_fix_kinds(None) == {'links', 'anchors', 'missing'}
+    assert select_fix_kinds('all') == {'links', 'anchors', 'missing'}
+    assert select_fix_kinds('links') == {'links'}
+
+
+def test_dry_run_writes_nothing_but_the_manifest(project):
+    before = snapshot(project / 'src')
+    code, manifest = run(project, '--dry-run')
+    assert code == 0
+    assert snapshot(project / 'src') == before
+    assert manifest['dry_run']
+    assert [entry['path'] for entry in manifest['files']] == ['guide/setup.md', 'index.md']
+    assert {entry['status'] for entry in manifest['files']} == {'would-update'}
+    assert [(entry['path'], entry['status']) for entry in manifest['created']] == [('new-page.md', 'would-create')]
+
+
+def test_apply_one_kind(project):
+    code, manifest = run(project, '--apply', 'links')
+    assert code == 0
+    assert (project / 'src' / 'index.md').read_text(encoding='utf-8').startswith(
+        '# Home {: #home }\n\n[Setup](guide/setup.md)')
+    assert (project / 'src' / 'guide' / 'setup.md').read_text(encoding='utf-8') == '# Setup\n\n## Install\n'
+    assert not (project / 'src' / 'new-page.md').exists()
+    assert manifest['summary']['files_changed'] == 1
+
+
+def test_apply_all(project):
+    code, manifest = run(project, '--apply', 'all')
+    assert code == 0
+    assert (project / 'src' / 'guide' / 'setup.md').read_text(encoding='utf-8') == (
+        '# Setup {: #setup}\n\n## Install {: #install}\n')
+    assert (project / 'src' / 'new-page.md').exists()
+    assert manifest['summary']['files_created'] == 1
+
+
+def test_selected_rules_are_reported(project):
+    write(project / 'terminology.json', json.dumps({'terms': {}, 'banned': {'simply': ''}}))
+    write(project / 'src' / 'guide' / 'setup.md', '# Setup\n\n## Install\n\nSimply run it.\n')
+    assert run(project, '--dry-run')[1]['issues'] == []
+    for selection in (['--terms'], ['--rule', 'terminology']):
+        code, manifest = run(project, '--dry-run', *selection)
+        assert code == 0
+        assert manifest['issues'] == [{'path': 'guide/setup.md', 'rule': 'terminology',
+                                       'issues': [{'message': "'Simply' is a banned phrase", 'line': 5, 'column': 1}]}]
+
+
+def test_atomic_write_keeps_the_file_mode_and_leaves_no_temporary_file(tmp_path):
+    path = write(tmp_path / 'page.md', 'old\n')
+    os.chmod(path, 0o640)
+    write_text_atomic(path, 'new\n')
+    assert path.read_text(encoding='utf-8') == 'new\n'
+    assert stat.S_IMODE(path.stat().st_mode) == 0o640
+    assert os.listdir(tmp_path) == ['page.md']
+
+
+def test_failed_atomic_write_leaves_the_file_untouched(tmp_path):
+    path = write(tmp_path / 'page.md', 'old\n')
+    with pytest.raises(UnicodeEncodeError):
+        write_text_atomic(path, 'new \udc80\n')
+    assert path.read_text(encoding='utf-8') == 'old\n'
+    assert os.listdir(tmp_path) == ['page.md']
@@ -0,0 +1,84 @@
+import json
+import logging
+import re
+
+import pytest
+
+from docs.scripts import benchmark
+from docs.scripts.benchmark import BENCHMARKS, CorpusSpec, generate_corpus, page_path, run_benchmarks
+from docs.scripts.corpus import DocCorpus
+from scripts.tools import doc_diff
+
+
+def snapshot(directory):
+    return {path.relative_to(directory): path.read_bytes() for path in sorted(directory.rglob('*.md'))}
+
+
+def test_page_paths_fill_directories_in_order():
+    assert page_path(0) == 'section-000/group-00/page-000000.md'
+    assert page_path(benchmark.PAGES_PER_DIR) == 'section-000/group-01/page-000050.md'
+    assert page_path(benchmark.PAGES_PER_DIR * benchmark.DIRS_PER_SECTION) == 'section-001/group-00/page-002500.md'
+
+
+def test_equal_specs_generate_identical_corpora(tmp_path):
+    spec = CorpusSpec(120, seed=7)
+    first = snapshot(generate_corpus(tmp_path / 'a', spec))
+    assert len(first) == 121
+    assert snapshot(generate_corpus(tmp_path / 'b', spec)) == first
+    assert snapshot(generate_corpus(tmp_path / 'c', spec._replace(seed=8))) != first
+
+
+def test_spec_shapes_every_page(tmp_path):
+    spec = CorpusSpec(60, links_per_file=7, header_depth=3, fence_density=1.0, broken_ratio=0.0, sections=4)
+    docs_dir = generate_corpus(tmp_path, spec)
+    for path in docs_dir.rglob('page-*.md'):
+        content = path.read_text(encoding='utf-8')
+        assert len(re.findall(r'^See \[', content, re.MULTILINE)) == 7
+        assert content.count('```markdown') == 4
+        assert set(re.findall(r'^(#+) Section', content, re.MULTILINE)) == {'##', '###'}
+    # Without broken links, every link outside a fence resolves
+    corpus = DocCorpus.load(docs_dir)
+    assert not any(corpus.missing_links(doc) for doc in corpus)
+
+
+def test_matching_corpus_is_reused(tmp_path):
+    spec = CorpusSpec(10)
+    page = generate_corpus(tmp_path, spec) / page_path(3)
+    page.write_text('# Edited\n', encoding='utf-8')
+    generate_corpus(tmp_path, spec)
+    assert page.read_text(encoding='utf-8') == '# Edited\n'
+    generate_corpus(tmp_path, spec._replace(links_per_file=2))
+    assert page.read_text(encoding='utf-8') != '# Edited\n'
+
+
+def test_every_benchmark_runs(tmp_path, monkeypatch):
+    repo_root = doc_diff.REPO_ROOT
+    monkeypatch.chdir(tmp_path)
+    results = run_benchmarks(tmp_path, [CorpusSpec(30)], list(BENCHMARKS), memory=False)
+    assert [result['benchmark'] for result in results] == list(BENCHMARKS)
+    assert all(result['seconds'] >= 0 and result['peak_bytes'] is None for result in results)
+    # The change reports neither move the script's repository nor leave reports in the corpus
+    assert doc_diff.REPO_ROOT == repo_root
+    assert not (tmp_path / (CorpusSpec(30).name + '-git') / 'reports').exists()
+
+
+def test_main_writes_results_and_compares_with_a_baseline(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(logging.getLogger('docs.scripts.fix_links'), 'level', logging.NOTSET)
+    output = tmp_path / 'results.json'
+    argv = ['--sizes', '20', '--only', 'find_links', '--no-memory', '--work-dir', str(tmp_path / 'work')]
+    benchmark.main(argv + ['--output', str(output)])
+    results = json.loads(output.read_text(encoding='utf-8'))
+    assert results['version'] == benchmark.BENCH_VERSION
+    assert results['corpora'][0]['files'] == 20
+    assert [result['benchmark'] for result in results['results']] == ['find_links']
+
+    capsys.readouterr()
+    benchmark.main(argv + ['--compare', str(output)])
+    table = capsys.readouterr().out
+    assert 'time vs base' in table
+    assert re.search(r'^find_links\s+20\s+[\d.]+\s+-\s+[\d.]+x\s+-$', table, re.MULTILINE)
+
+
+def test_header_depth_is_validated(tmp_path):
+    with pytest.raises(SystemExit):
+        benchmark.main(['--header-depth', '7', '--work-dir', str(tmp_path)])
@@ -0,0 +1,99 @@
+import json
+import os
+
+from docs.scripts.cache import CACHE_VERSION, DocCache
+from docs.scripts.corpus import DocCorpus
+
+
+def write(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content, encoding='utf-8')
+    return path
+
+
+def stat(path):
+    st = path.stat()
+    return st.st_mtime_ns, st.st_size
+
+
+def test_entry_is_served_while_the_file_is_unchanged(tmp_path):
+    page = write(tmp_path / 'page.md', '# Page\n')
+    cache = DocCache(tmp_path / 'cache.json')
+    cache.put(page, '# Page\n', stat(page), {'anchors': ['page']})
+    cache.save()
+
+    cache = DocCache(tmp_path / 'cache.json')
+    assert cache.get(page)['tokens'] == {'anchors': ['page']}
+    assert (cache.hits, cache.misses) == (1, 0)
+
+
+def test_touched_but_unchanged_file_is_a_hit(tmp_path):
+    page = write(tmp_path / 'page.md', '# Page\n')
+    cache = DocCache(tmp_path / 'cache.json')
+    cache.put(page, '# Page\n', stat(page), {})
+    os.utime(page, ns=(1, 1))
+    assert cache.get(page) is not None
+    assert cache.entries[str(page.absolute())]['mtime_ns'] == 1
+
+
+def test_changed_file_is_a_miss(tmp_path):
+    page = write(tmp_path / 'page.md', '# Page\n')
+    cache = DocCache(tmp_path / 'cache.json')
+    cache.put(page, '# Page\n', stat(page), {})
+    write(page, '# Other page\n')
+    assert cache.get(page) is None
+    assert str(page.absolute()) not in cache.entries
+
+
+def test_oldest_entries_are_evicted(tmp_path):
+    cache = DocCache(tmp_path / 'cache.json', max_entries=2)
+    for index in range(3):
+        page = write(tmp_path / f'page{index}.md', f'# {index}\n')
+        cache.put(page, f'# {index}\n', stat(page), {})
+        cache.entries[str(page.absolute())]['used'] = index
+    cache.save()
+    assert sorted(os.path.basename(key) for key in DocCache(tmp_path / 'cache.json').entries) == ['page1.md',
+                                                                                                 'page2.md']
+
+
+def test_other_versions_are_discarded(tmp_path):
+    path = tmp_path / 'cache.json'
+    path.write_text(json.dumps({'version': CACHE_VERSION - 1, 'entries': {'x': {}}}), encoding='utf-8')
+    assert DocCache(path).entries == {}
+
+
+def test_cached_corpus_reads_nothing(tmp_path):
+    docs = tmp_path / 'docs'
+    write(docs / 'index.md', '# Home {: #home }\n\n[Guide](guide.md)\n')
+    write(docs / 'guide.md', '# Guide {: #guide }\n')
+    corpus = DocCorpus.load(docs, cache=DocCache(tmp_path / 'cache.json'))
+    corpus.analyze()
+    corpus.save_cache()
+
+    corpus = DocCorpus.load(docs, cache=DocCache(tmp_path / 'cache.json'))
+    assert all(doc._content is None for doc in corpus)
+    assert corpus.files[docs / 'index.md'].markdown_links == {'guide.md'}
+
+
+def test_file_changed_after_it_was_read_is_not_cached_as_read(tmp_path):
+    docs = tmp_path / 'docs'
+    page = write(docs / 'page.md', '# Page {: #page }\n')
+    corpus = DocCorpus.load(docs, cache=DocCache(tmp_path / 'cache.json'))
+    corpus.analyze()
+    # Edited while the run was still going
+    write(page, '# Page {: #page }\n\n[Guide](guide.md)\n')
+    corpus.save_cache()
+
+    corpus = DocCorpus.load(docs, cache=DocCache(tmp_path / 'cache.json'))
+    assert corpus.files[page].markdown_links == {'guide.md'}
+
+
+def test_content_not_read_from_disk_is_not_cached(tmp_path):
+    docs = tmp_path / 'docs'
+    page = write(docs / 'page.md', '# Page {: #page }\n')
+    cache = DocCache(tmp_path / 'cache.json')
+    corpus = DocCorpus.from_contents(docs, {page: '# Staged {: #staged }\n'})
+    corpus.cache = cache
+    corpus.analyze()
+    corpus.save_cache()
+    assert cache.entries == {}
@@ -0,0 +1,91 @@
+import pytest
+
+from docs.scripts.check_nav import check_nav, iter_nav_pages, main
+
+
+def write(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content, encoding='utf-8')
+    return path
+
+
+@pytest.fixture
+def config(tmp_path):
+    docs = tmp_path / 'src'
+    for page in ('index.md', 'guide/setup.md', 'guide/faq.md', 'drafts/idea.md', 'orphan.md', '.hidden/x.md',
+                 'snippets/part.md'):
+        write(docs / page, '# Page\n')
+    return write(tmp_path / 'mkdocs.yml',
+                 'site_name: Test\n'
+                 'docs_dir: src\n'
+                 'theme:\n  name: !!python/name:material.Theme\n'
+                 'nav:\n'
+                 '  - Home: index.md\n'
+                 '  - Guide:\n'
+                 '      - guide/setup.md#install\n'
+                 '      - FAQ: guide/./faq.md\n'
+                 '      - Again: guide/setup.md\n'
+                 '  - Gone: gone.md\n'
+                 '  - Site: https://example.com/\n'
+                 'not_in_nav: |\n'
+                 '  # drafts are linked from elsewhere\n'
+                 '  /drafts/*\n'
+                 '  part.md\n')
+
+
+def test_iter_nav_pages_skips_external_links():
+    nav = [{'Home': 'index.md'}, {'Guide': ['guide/a.md#top', {'B': 'guide/b.md'}]}, {'Ext': 'https://x.org/'},
+           'mailto:team@example.com']
+    assert list(iter_nav_pages(nav)) == [('Home', 'index.md'), ('Guide', 'guide/a.md'), ('Guide > B', 'guide/b.md')]
+
+
+def test_orphans_dead_entries_and_duplicates(config):
+    issues = check_nav(config)
+    assert issues.orphans == ['orphan.md']
+    assert issues.dead_entries == [('Gone', 'gone.md')]
+    assert issues.duplicates == {'guide/setup.md': 2}
+    assert issues
+
+
+def test_unindented_nav_and_not_in_nav(tmp_path):
+    docs = tmp_path / 'docs'
+    for page in ('index.md', 'about.md', 'drafts/idea.md'):
+        write(docs / page, '# Page\n')
+    config = write(tmp_path / 'mkdocs.yml',
+                   'nav:\n'
+                   '- Home: index.md\n'
+                   '- About: about.md\n'
+                   '- Gone: gone.md\n'
+                   'not_in_nav: /drafts/*\n'
+                   'theme: material\n')
+    issues = check_nav(config)
+    assert issues.orphans == []
+    assert issues.dead_entries == [('Gone', 'gone.md')]
+
+
+def test_main_exit_status(config, capsys):
+    with pytest.raises(SystemExit) as exit:
+        main(['--config', str(config)])
+    assert exit.value.code == 1
+    out = capsys.readouterr().out
+    assert '  - Gone: gone.md' in out
+    assert '  - guide/setup.md (2 times)' in out
+    assert '  - orphan.md' in out
+
+
+def test_orphans_alone_can_be_allowed(config, capsys):
+    text = config.read_text(encoding='utf-8')
+    config.write_text(text.replace('      - Again: guide/setup.md\n', '').replace('  - Gone: gone.md\n', ''),
+                      encoding='utf-8')
+    with pytest.raises(SystemExit) as exit:
+        main(['--config', str(config), '--allow-orphans'])
+    assert exit.value.code == 0
+    assert 'Pages missing from the nav (1)' in capsys.readouterr().out
+
+
+def test_main_records_stats_and_trace(config, tmp_path, capsys):
+    trace = tmp_path / 'trace.json'
+    with pytest.raises(SystemExit):
+        main(['--config', str(config), '--stats', '--trace', str(trace)])
+    assert 'check nav' in capsys.readouterr().err
+    assert 'check nav' in trace.read_text(encoding='utf-8')
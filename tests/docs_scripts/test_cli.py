@@ -0,0 +1,76 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from docs.scripts import cli
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+
+def write(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content, encoding='utf-8')
+    return path
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    config = write(tmp_path / 'mkdocs.yml', 'site_name: Test\ndocs_dir: src\n')
+    write(tmp_path / 'src' / 'index.md', '# Home {: #home }\n\nSimply read the [guide](guide.md).\n')
+    write(tmp_path / 'src' / 'guide.md', '# Guide {: #guide }\n')
+    write(tmp_path / 'terminology.json', json.dumps({'terms': {}, 'banned': {'simply': 'Say what to do'}}))
+    # Commands set sys.argv[0] for their usage lines
+    monkeypatch.setattr(sys, 'argv', ['docs-tool'])
+    return config
+
+
+def run(*argv):
+    with pytest.raises(SystemExit) as exit:
+        cli.main(list(argv))
+    return exit.value.code
+
+
+def test_commands_are_imported_only_when_run():
+    code = ('import sys\n'
+            'from docs.scripts import cli\n'
+            'cli.load_command("check")\n'
+            'print(sorted(name for name in ("yaml", "asyncio", "mkdocs", "docs.scripts.serve_docs") '
+            'if name in sys.modules))\n')
+    result = subprocess.run([sys.executable, '-c', code], cwd=REPO_ROOT, check=True,
+                            stdout=subprocess.PIPE, universal_newlines=True)
+    assert result.stdout.strip() == '[]'
+
+
+def test_every_command_resolves_to_a_function():
+    for name in cli.COMMANDS:
+        assert callable(cli.load_command(name)), name
+
+
+def test_check_passes_on_clean_docs(project, capsys):
+    assert run('check', '--config', str(project), '--no-cache') == 0
+    assert 'No documentation issues found.' in capsys.readouterr().out
+
+
+def test_check_fails_on_issues_unless_their_rule_is_ignored(project, capsys):
+    write(project.parent / 'src' / 'guide.md', '# Guide {: #guide }\n\n[gone](gone.md)\n')
+    assert run('check', '--config', str(project), '--no-cache') == 1
+    assert 'guide.md' in capsys.readouterr().out
+    assert run('check', '--config', str(project), '--no-cache', '--ignore', 'missing') == 0
+
+
+def test_rules_off_by_default_run_when_selected(project, capsys):
+    assert run('check', '--config', str(project), '--no-cache', '--rule', 'terminology') == 1
+    assert 'index.md' in capsys.readouterr().out
+
+
+def test_unknown_command_is_a_usage_error(capsys):
+    assert run('publish') == 2
+    assert 'invalid choice' in capsys.readouterr().err
+
+
+def test_timings_go_to_stderr(project, capsys):
+    assert run('--timings', 'check', '--config', str(project), '--no-cache') == 0
+    assert 'docs-tool check: start-up' in capsys.readouterr().err
@@ -0,0 +1,86 @@
+from collections import Counter
+
+import pytest
+
+from docs.scripts.cache import DocCache
+from docs.scripts.check_missing_files import check_missing_files
+from docs.scripts.corpus import DocCorpus
+from docs.scripts.instrument import STATS
+from docs.scripts.rules import ANCHORS, FRAGMENTS, LINKS, MISSING
+from docs.scripts.serve_docs import scan_documentation_issues
+
+
+def write(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content, encoding='utf-8')
+    return path
+
+
+@pytest.fixture
+def docs(tmp_path):
+    docs = tmp_path / 'docs'
+    write(docs / 'index.md', '# Home {: #home }\n\n[Guide](guide/../guide/setup.md#install) and [gone](gone.md)\n')
+    write(docs / 'guide' / 'setup.md', '# Setup {: #setup }\n\n## Install\n\n[Back](../index.md#nowhere)\n')
+    write(docs / 'guide' / 'faq.md', '# FAQ {: #faq }\n\n```\n[not a link](missing.md)\n```\n')
+    return docs
+
+
+@pytest.fixture
+def stats(monkeypatch):
+    monkeypatch.setattr(STATS, 'enabled', True)
+    monkeypatch.setattr(STATS, 'counters', Counter())
+    monkeypatch.setattr(STATS, 'phases', {})
+    return STATS
+
+
+def test_every_check_shares_one_read_and_tokenize_per_file(docs, stats):
+    issues = scan_documentation_issues(docs)
+    assert issues.details(MISSING) == {docs / 'index.md': ['gone.md']}
+    assert issues.details(FRAGMENTS) == {docs / 'guide' / 'setup.md': ['../index.md#nowhere']}
+    assert [edit.new for edit in issues.edits(LINKS)[docs / 'index.md']] == ['](guide/setup.md#install)']
+    assert [edit.old for edit in issues.edits(ANCHORS)[docs / 'guide' / 'setup.md']] == ['## Install']
+    assert stats.counters['files_read'] == 3
+    assert stats.phases['tokenize'][0] == 3
+
+
+def test_checkers_accept_a_shared_corpus(docs, stats):
+    corpus = DocCorpus.load(docs)
+    assert check_missing_files(docs, corpus=corpus) == check_missing_files(docs)
+    reads = stats.counters['files_read']
+    scan_documentation_issues(docs, corpus=corpus)
+    assert stats.counters['files_read'] == reads
+
+
+def test_paths_limit_the_files_checked(docs):
+    issues = scan_documentation_issues(docs, paths=[docs / 'guide' / 'setup.md'])
+    assert MISSING not in issues.rules
+    assert list(issues.details(FRAGMENTS)) == [docs / 'guide' / 'setup.md']
+
+
+def test_parallel_scan_matches_serial_scan(tmp_path, monkeypatch):
+    docs = tmp_path / 'docs'
+    for index in range(12):
+        write(docs / f'section{index % 3}' / f'page{index}.md',
+              f'# Page {index}\n\n## Part\n\n[next](../section{(index + 1) % 3}/page{index + 1}.md#part) '
+              f'[up](../index.md)\n')
+    write(docs / 'index.md', '# Home {: #home }\n')
+    # Small enough a corpus would otherwise be analyzed serially
+    monkeypatch.setattr('docs.scripts.corpus.PARALLEL_MIN_FILES', 0)
+
+    serial = scan_documentation_issues(docs)
+    parallel = scan_documentation_issues(docs, jobs=2)
+    assert parallel.rules == serial.rules
+    assert parallel.count(MISSING) == 1
+
+
+def test_parallel_results_are_cached(tmp_path, monkeypatch):
+    docs = tmp_path / 'docs'
+    for index in range(4):
+        write(docs / f'page{index}.md', f'# Page {index}\n\n[gone](gone{index}.md)\n')
+    monkeypatch.setattr('docs.scripts.corpus.PARALLEL_MIN_FILES', 0)
+    cache = DocCache(tmp_path / 'cache.json')
+    first = scan_documentation_issues(docs, cache=cache, jobs=2)
+
+    corpus = DocCorpus.load(docs, cache=DocCache(tmp_path / 'cache.json'))
+    assert all(doc.is_analyzed() for doc in corpus)
+    assert scan_documentation_issues(docs, corpus=corpus).rules == first.rules
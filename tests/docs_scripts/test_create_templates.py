@@ -0,0 +1,86 @@
+import pytest
+
+from docs.scripts.batch import ChangeManifest
+from docs.scripts.create_templates import (Template, TemplateRegistry, create_missing_files, default_registry,
+                                           load_routes, render_missing_files)
+
+
+def write(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content, encoding='utf-8')
+    return path
+
+
+@pytest.fixture
+def registry(tmp_path):
+    templates = tmp_path / 'templates'
+    write(templates / 'guide.md', '# {title}\n\n{description}\n')
+    write(templates / 'api.md', '# {title} API {: #api}\n')
+    write(templates / 'broken.md', '# {unknown}\n')
+    return TemplateRegistry(templates, routes=[('*api*', 'api'), ('*broken*', 'broken'), ('*', 'guide')])
+
+
+def test_template_fills_placeholders_and_keeps_literal_braces():
+    template = Template('t', 'import {{ {name} }}\n## Usage {: #usage}\nfn() {{}}\n')
+    assert template.fields == {'name'}
+    assert template.render({'name': 'Button'}) == 'import { Button }\n## Usage {: #usage}\nfn() {}\n'
+    with pytest.raises(KeyError):
+        template.render({})
+
+
+def test_default_templates_render():
+    content = default_registry().render('components/ui/button-group.md')
+    assert content.startswith('# Button Group\n')
+    assert "import { ButtonGroup } from '@/components/ui'" in content
+
+
+def test_first_matching_route_wins(registry):
+    assert registry.route('Reference/API/users.md') == 'api'
+    assert registry.route('guide/setup.md') == 'guide'
+    assert default_registry().route('design/tokens/colors.md') == 'token'
+    assert default_registry().route('CHANGELOG.md') == 'changelog'
+
+
+def test_render_reports_unknown_templates_and_fields(registry):
+    assert registry.render('setup.md') == '# Setup\n\nGuide for setup\n'
+    assert registry.render('setup.md', 'missing') == ''
+    assert registry.render('broken.md') == ''
+
+
+def test_load_routes(tmp_path):
+    routes = write(tmp_path / 'routes.yml', '- pattern: "*Reference*"\n  template: api\n- pattern: "*"\n'
+                                            '  template: guide\n')
+    assert load_routes(routes) == [('*reference*', 'api'), ('*', 'guide')]
+    assert load_routes(write(tmp_path / 'empty.yml', '')) == []
+
+
+def test_render_missing_files_skips_existing_pages(tmp_path, registry):
+    docs = tmp_path / 'docs'
+    write(docs / 'exists.md', '# Exists\n')
+    rendered = render_missing_files(docs, ['/exists.md', 'api/users.md', 'api/users.md'], registry)
+    assert rendered == [(docs / 'exists.md', 'guide', None),
+                        (docs / 'api' / 'users.md', 'api', '# Users API {: #api}\n')]
+
+
+def test_dry_run_records_planned_pages(tmp_path, registry):
+    docs = tmp_path / 'docs'
+    manifest = ChangeManifest(docs, dry_run=True)
+    create_missing_files(docs, {docs / 'index.md': ['api/users.md', 'broken.md']}, dry_run=True,
+                         manifest=manifest, registry=registry)
+    assert not (docs / 'api').exists()
+    assert manifest.created == [{'path': 'api/users.md', 'template': 'api', 'status': 'would-create'},
+                                {'path': 'broken.md', 'template': 'broken', 'status': 'error'}]
+
+
+def test_create_missing_files_writes_each_page(tmp_path, registry):
+    docs = tmp_path / 'docs'
+    write(docs / 'guide' / 'setup.md', '# Kept\n')
+    manifest = ChangeManifest(docs)
+    create_missing_files(docs, {docs / 'index.md': ['api/users.md', 'guide/setup.md'],
+                                docs / 'other.md': ['api/users.md', 'guide/faq.md']},
+                         manifest=manifest, registry=registry)
+    assert (docs / 'api' / 'users.md').read_text(encoding='utf-8') == '# Users API {: #api}\n'
+    assert (docs / 'guide' / 'faq.md').read_text(encoding='utf-8') == '# Faq\n\nGuide for faq\n'
+    assert (docs / 'guide' / 'setup.md').read_text(encoding='utf-8') == '# Kept\n'
+    assert [(entry['path'], entry['status']) for entry in manifest.created] == [
+        ('api/users.md', 'created'), ('guide/faq.md', 'created'), ('guide/setup.md', 'exists')]
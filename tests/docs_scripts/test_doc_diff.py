@@ -0,0 +1,185 @@
+import io
+import json
+import subprocess
+
+import pytest
+
+from scripts.tools import doc_diff
+from scripts.tools.doc_diff import DocReportGenerator, GitCatFile, diff_sections, markdown_sections
+
+BASE_GUIDE = '# Guide\n\nIntro\n\n## Setup\n\nOld steps\n\n## Usage\n\nSame\n'
+HEAD_GUIDE = '# Guide\n\nIntro\n\n## Setup\n\nNew steps\n\n## Usage\n\nSame\n\n## FAQ\n\nAnswers\n'
+
+
+def git(repo, *args):
+    return subprocess.run(['git', '-c', 'user.name=Test', '-c', 'user.email=test@example.com', *args],
+                          cwd=repo, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE).stdout
+
+
+def write(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content, encoding='utf-8')
+    return path
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    repo = tmp_path / 'repo'
+    docs = repo / 'docs'
+    write(docs / 'guide.md', BASE_GUIDE)
+    write(docs / 'old.md', '# Old\n\nGone soon\n')
+    write(docs / 'same.md', '# Same\n')
+    git(repo, 'init', '-q')
+    git(repo, 'add', '.')
+    git(repo, 'commit', '-q', '-m', 'base')
+
+    write(docs / 'guide.md', HEAD_GUIDE)
+    git(repo, 'rm', '-q', 'docs/old.md')
+    write(docs / 'new.md', '# New\n\nFresh\n')
+    git(repo, 'add', '.')
+    git(repo, 'commit', '-q', '-m', 'head')
+    # Commands run from the repository the script belongs to
+    monkeypatch.setattr(doc_diff, 'REPO_ROOT', repo)
+    return repo
+
+
+def generate(repo, **options):
+    report_format = options.pop('report_format', 'txt')
+    changed_only = options.pop('changed_only', False)
+    generator = DocReportGenerator(base_commit='HEAD~1', **options)
+    try:
+        return generator.generate_report(report_format=report_format, changed_only=changed_only).read_text(
+            encoding='utf-8')
+    finally:
+        generator.close()
+
+
+def test_streamed_report_holds_contents_and_diff(repo):
+    report = generate(repo, stream=True)
+    assert 'REMOVED FILES:\n- docs/old.md' in report
+    assert 'NEW FILES:\n- docs/new.md' in report
+    assert 'MODIFIED FILES:\n- docs/guide.md' in report
+    original = report.split('2. ORIGINAL CONTENT')[1].split('3. CURRENT CONTENT')[0]
+    assert '--- docs/old.md ---\n# Old\n\nGone soon\n' in original
+    assert 'Old steps' in original
+    current = report.split('3. CURRENT CONTENT')[1].split('4. DETAILED DIFF')[0]
+    assert '--- docs/guide.md ---\n' + HEAD_GUIDE in current
+    assert '+## FAQ' in report.split('4. DETAILED DIFF')[1]
+
+
+def test_streamed_and_buffered_reports_list_the_same_sections(repo):
+    def outline(report):
+        return [line for line in report.splitlines() if line.startswith(('---', '- ', '1.', '2.', '3.', '4.'))]
+
+    assert outline(generate(repo, stream=True)) == outline(generate(repo))
+
+
+def test_changed_only_leaves_unchanged_files_out(repo):
+    current = generate(repo, stream=True, changed_only=True).split('3. CURRENT CONTENT')[1]
+    assert '--- docs/same.md ---' not in current
+    assert '--- docs/new.md ---' in current
+
+
+def test_stream_command_copies_in_chunks(repo, monkeypatch):
+    monkeypatch.setattr(doc_diff, 'CHUNK_SIZE', 4)
+    out = io.BytesIO()
+    written = DocReportGenerator.stream_command('git show HEAD:docs/guide.md', out)
+    assert out.getvalue() == HEAD_GUIDE.encode('utf-8')
+    assert written == len(HEAD_GUIDE)
+
+
+def test_cat_file_serves_many_objects_over_one_process(repo):
+    cat_file = GitCatFile(repo)
+    try:
+        assert cat_file.read('HEAD', 'docs/guide.md') == HEAD_GUIDE.encode('utf-8')
+        assert cat_file.read('HEAD~1', 'docs/guide.md') == BASE_GUIDE.encode('utf-8')
+        assert cat_file.read('HEAD', 'docs/old.md') is None
+        # A tree is not a blob; its content is skipped so the pipe stays in step
+        assert cat_file.read('HEAD', 'docs') is None
+        assert cat_file.read('HEAD~1', 'docs/old.md') == b'# Old\n\nGone soon\n'
+    finally:
+        cat_file.close()
+    assert cat_file.process.returncode == 0
+
+
+def test_cat_file_copies_in_chunks(repo, monkeypatch):
+    monkeypatch.setattr(doc_diff, 'CHUNK_SIZE', 5)
+    cat_file = GitCatFile(repo)
+    try:
+        out = io.BytesIO()
+        assert cat_file.copy('HEAD', 'docs/guide.md', out) == len(HEAD_GUIDE)
+        assert out.getvalue() == HEAD_GUIDE.encode('utf-8')
+        assert cat_file.copy('HEAD', 'docs/missing.md', out) == 0
+        assert cat_file.read('HEAD', 'docs/same.md') == b'# Same\n'
+    finally:
+        cat_file.close()
+
+
+def test_generator_starts_one_cat_file_process(repo, monkeypatch):
+    started = []
+    original = doc_diff.GitCatFile.__init__
+
+    def counting_init(self, cwd):
+        started.append(cwd)
+        original(self, cwd)
+
+    monkeypatch.setattr(doc_diff.GitCatFile, '__init__', counting_init)
+    generate(repo)
+    assert len(started) == 1
+
+
+def test_markdown_sections_ignore_code_and_number_repeats():
+    sections = markdown_sections('# Title\n\n```\n# not a header\n```\n\n## Examples\n\na\n\n## Examples\n\nb\n')
+    assert list(sections) == ['# Title', '## Examples', '## Examples (2)']
+    assert sections['## Examples'] != sections['## Examples (2)']
+
+
+def test_markdown_sections_keep_hashes_that_are_not_a_closing_sequence():
+    sections = markdown_sections('# C#\n\n## Closed ##\n\n### F# and C# ###\n')
+    assert list(sections) == ['# C#', '## Closed', '### F# and C#']
+
+
+def test_diff_sections():
+    assert diff_sections(BASE_GUIDE, HEAD_GUIDE) == {'added': ['## FAQ'], 'removed': [],
+                                                     'modified': ['## Setup']}
+
+
+def test_json_report_describes_each_file(repo):
+    # Not committed: counted from the working tree
+    write(repo / 'docs' / 'draft.md', '# Draft\n\nOne\nTwo\n')
+    report = json.loads(generate(repo, report_format='json'))
+    files = {entry['path']: entry for entry in report['files']}
+    assert {path: entry['status'] for path, entry in files.items()} == {
+        'docs/draft.md': 'added', 'docs/guide.md': 'modified', 'docs/new.md': 'added',
+        'docs/old.md': 'removed', 'docs/same.md': 'unchanged'}
+    guide = files['docs/guide.md']
+    assert (guide['additions'], guide['deletions']) == (5, 1)
+    assert guide['sections'] == {'added': ['## FAQ'], 'removed': [], 'modified': ['## Setup']}
+    assert files['docs/old.md']['sections']['removed'] == ['# Old']
+    assert files['docs/draft.md']['additions'] == 4
+    assert 'sections' not in files['docs/same.md']
+    assert report['summary'] == {'added': 2, 'removed': 1, 'modified': 1, 'unchanged': 1,
+                                 'additions': 5 + 3 + 4, 'deletions': 1 + 3}
+
+
+def test_json_report_with_a_head_lists_files_at_that_commit(repo):
+    write(repo / 'docs' / 'draft.md', '# Draft\n')
+    (repo / 'docs' / 'same.md').unlink()
+    report = json.loads(generate(repo, head_commit='HEAD', report_format='json'))
+    assert {entry['path']: entry['status'] for entry in report['files']} == {
+        'docs/guide.md': 'modified', 'docs/new.md': 'added', 'docs/old.md': 'removed', 'docs/same.md': 'unchanged'}
+
+
+def test_jsonl_report_streams_records(repo):
+    records = [json.loads(line) for line in generate(repo, report_format='jsonl', changed_only=True).splitlines()]
+    assert [record['type'] for record in records] == ['report', 'file', 'file', 'file', 'summary']
+    assert 'docs/same.md' not in [record.get('path') for record in records]
+    assert records[-1]['unchanged'] == 0
+
+
+def test_markdown_and_html_reports(repo):
+    markdown = generate(repo, report_format='md')
+    assert '| `docs/guide.md` | modified | 5 | 1 | ## FAQ |  | ## Setup |' in markdown
+    page = generate(repo, report_format='html')
+    assert '<tr><td>docs/guide.md</td><td>modified</td><td>5</td><td>1</td><td>## FAQ</td>' in page
+    assert page.rstrip().endswith('</html>')
@@ -0,0 +1,240 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from urllib.parse import urlsplit
+
+import pytest
+
+from docs.scripts.external_links import ExternalLinkCache, ExternalLinkChecker, check_external_links
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """A local stand-in for the sites documentation links to"""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _answer(self, status, headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def _handle(self):
+        server = self.server
+        if getattr(self, 'drop_next', False):
+            # Close an idle keep-alive connection without answering, as servers do after a while
+            self.close_connection = True
+            return
+        with server.lock:
+            server.requests.append((self.command, self.path, self.headers.get('Host'), time.monotonic()))
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        try:
+            # Requests through a proxy have an absolute target
+            path = urlsplit(self.path).path if self.path.startswith('http://') else self.path
+            if path == '/ok' or path.startswith('/caf%C3%A9'):
+                self._answer(200)
+            elif path == '/drop-next':
+                self._answer(200)
+                self.drop_next = True
+            elif path == '/missing':
+                self._answer(404)
+            elif path == '/redirect':
+                self._answer(301, {'Location': '/ok'})
+            elif path == '/redirect-missing':
+                self._answer(302, {'Location': '/missing'})
+            elif path == '/loop':
+                self._answer(302, {'Location': '/loop'})
+            elif path == '/no-head':
+                self._answer(405 if self.command == 'HEAD' else 200)
+            elif path == '/forbidden':
+                self._answer(403)
+            elif path.startswith('/slow'):
+                time.sleep(0.3)
+                self._answer(200)
+            elif path == '/hang':
+                time.sleep(2)
+                self._answer(200)
+            else:
+                self._answer(500)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def do_CONNECT(self):
+        with self.server.lock:
+            self.server.requests.append((self.command, self.path, self.headers.get('Host'), time.monotonic()))
+        self._answer(403)
+        self.close_connection = True
+
+    do_HEAD = _handle
+    do_GET = _handle
+
+
+@pytest.fixture(autouse=True)
+def no_proxy_environment(monkeypatch):
+    for name in ('http_proxy', 'https_proxy', 'no_proxy', 'HTTP_PROXY', 'HTTPS_PROXY', 'NO_PROXY'):
+        monkeypatch.delenv(name, raising=False)
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    httpd.daemon_threads = True
+    httpd.lock = threading.Lock()
+    httpd.requests = []
+    httpd.active = 0
+    httpd.max_active = 0
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    httpd.base = f"http://127.0.0.1:{httpd.server_address[1]}"
+    try:
+        yield httpd
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def check(urls, **options):
+    return asyncio.run(ExternalLinkChecker(**options).check_all(urls))
+
+
+def test_ok_and_missing(server):
+    results = check([f"{server.base}/ok", f"{server.base}/missing"])
+    assert results[f"{server.base}/ok"].ok
+    assert results[f"{server.base}/ok"].status == 200
+    missing = results[f"{server.base}/missing"]
+    assert not missing.ok
+    assert missing.status == 404
+
+
+def test_redirects_are_followed(server):
+    results = check([f"{server.base}/redirect", f"{server.base}/redirect-missing"])
+    assert results[f"{server.base}/redirect"].status == 200
+    assert results[f"{server.base}/redirect"].ok
+    assert results[f"{server.base}/redirect-missing"].status == 404
+
+
+def test_redirect_loop_is_broken(server):
+    result = check([f"{server.base}/loop"])[f"{server.base}/loop"]
+    assert not result.ok
+    assert not result.responded
+    assert 'redirects' in result.error
+
+
+def test_get_after_refused_head(server):
+    result = check([f"{server.base}/no-head"])[f"{server.base}/no-head"]
+    assert result.ok
+    assert [method for method, path, _, _ in server.requests if path == '/no-head'] == ['HEAD', 'GET']
+
+
+def test_uncertain_status_is_not_broken(server):
+    assert check([f"{server.base}/forbidden"])[f"{server.base}/forbidden"].ok
+
+
+def test_timeout(server):
+    result = check([f"{server.base}/hang"], timeout=0.2)[f"{server.base}/hang"]
+    assert not result.ok
+    assert result.status is None
+    assert 'timed out' in result.error
+
+
+def test_non_latin1_target_is_percent_encoded(server):
+    url = f"{server.base}/café/日本?q=ß"
+    result = check([url])[url]
+    assert result.ok
+    assert server.requests[0][1] == '/caf%C3%A9/%E6%97%A5%E6%9C%AC?q=%C3%9F'
+
+
+def test_closed_keep_alive_connection_is_retried_on_a_new_one(server):
+    results = check([f"{server.base}/drop-next", f"{server.base}/ok"], per_host=1)
+    assert all(result.ok for result in results.values())
+    # The second HEAD went out again on a new connection rather than falling back to GET
+    assert [request[:2] for request in server.requests] == [('HEAD', '/drop-next'), ('HEAD', '/ok')]
+
+
+def test_http_proxy_gets_the_absolute_target(server):
+    results = check(['http://docs.example.invalid/ok'], proxies={'http': server.base})
+    assert results['http://docs.example.invalid/ok'].ok
+    assert server.requests[0][1:3] == ('http://docs.example.invalid/ok', 'docs.example.invalid')
+
+
+def test_https_goes_through_a_connect_tunnel(server):
+    url = 'https://docs.example.invalid/ok'
+    result = check([url], proxies={'https': server.base})[url]
+    assert not result.responded
+    assert 'refused' in result.error
+    assert server.requests[0][:2] == ('CONNECT', 'docs.example.invalid:443')
+
+
+def test_proxies_come_from_the_environment_less_no_proxy(server, monkeypatch):
+    monkeypatch.setenv('http_proxy', server.base)
+    monkeypatch.setenv('no_proxy', '127.0.0.1')
+    assert check([f"{server.base}/ok"])[f"{server.base}/ok"].ok
+    assert check(['http://docs.example.invalid/ok'])['http://docs.example.invalid/ok'].ok
+    assert [request[1] for request in server.requests] == ['/ok', 'http://docs.example.invalid/ok']
+
+
+def test_per_host_limit(server):
+    urls = [f"{server.base}/slow{i}" for i in range(6)]
+    results = check(urls, per_host=2)
+    assert all(result.ok for result in results.values())
+    assert server.max_active == 2
+
+
+def test_busy_host_does_not_hold_overall_slots(server):
+    port = server.server_address[1]
+    busy = [f"http://127.0.0.1:{port}/slow{i}" for i in range(4)]
+    other = f"http://localhost:{port}/ok"
+    started = time.monotonic()
+    results = check(busy + [other], per_host=1, concurrency=2)
+    assert all(result.ok for result in results.values())
+    other_arrival = next(arrival for _, path, host, arrival in server.requests if path == '/ok')
+    # With the overall slot taken first, the other host waited for the first slow request
+    assert other_arrival - started < 0.25
+
+
+def test_cache_hits_skip_requests(server, tmp_path):
+    cache_path = tmp_path / 'external-links.json'
+    urls = [f"{server.base}/ok", f"{server.base}/missing"]
+    first = check_external_links(urls, cache=ExternalLinkCache(cache_path))
+    requests = len(server.requests)
+
+    second = check_external_links(urls, cache=ExternalLinkCache(cache_path))
+    assert len(server.requests) == requests
+    assert second == first
+
+
+def test_expired_entries_are_requested_again(server, tmp_path):
+    cache_path = tmp_path / 'external-links.json'
+    url = f"{server.base}/ok"
+    check_external_links([url], cache=ExternalLinkCache(cache_path))
+    requests = len(server.requests)
+
+    check_external_links([url], cache=ExternalLinkCache(cache_path, ttl=0))
+    assert len(server.requests) > requests
+
+
+def test_no_response_is_cached_for_the_shorter_ttl(server, tmp_path):
+    cache_path = tmp_path / 'external-links.json'
+    url = f"{server.base}/hang"
+    checker = ExternalLinkChecker(timeout=0.2)
+    check_external_links([url], cache=ExternalLinkCache(cache_path), checker=checker)
+    requests = len(server.requests)
+
+    cached = ExternalLinkCache(cache_path).get(url)
+    assert cached is not None and not cached.responded
+    check_external_links([url], cache=ExternalLinkCache(cache_path, no_response_ttl=0), checker=checker)
+    assert len(server.requests) > requests
+
+
+def test_uncertain_results_are_not_cached(server, tmp_path):
+    cache_path = tmp_path / 'external-links.json'
+    url = f"{server.base}/forbidden"
+    check_external_links([url], cache=ExternalLinkCache(cache_path))
+    assert ExternalLinkCache(cache_path).get(url) is None
@@ -0,0 +1,63 @@
+import subprocess
+
+import pytest
+
+from docs.scripts.git_index import read_staged, staged_changes, staged_corpus
+from docs.scripts.rules import MISSING
+from docs.scripts.serve_docs import scan_documentation_issues
+
+
+def git(repo, *args):
+    subprocess.run(['git', '-c', 'user.name=Test', '-c', 'user.email=test@example.com', *args],
+                   cwd=repo, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+
+@pytest.fixture
+def repo(tmp_path):
+    repo = tmp_path / 'repo'
+    docs = repo / 'docs'
+    docs.mkdir(parents=True)
+    (docs / 'index.md').write_text('# Home\n\nSee [the guide](guide.md).\n', encoding='utf-8')
+    (docs / 'guide.md').write_text('# Guide\n', encoding='utf-8')
+    (docs / 'other.md').write_text('# Other\n', encoding='utf-8')
+    git(repo, 'init', '-q')
+    git(repo, 'add', '.')
+    git(repo, 'commit', '-q', '-m', 'base')
+    return repo
+
+
+def test_staged_changes_include_renames_and_deletions(repo):
+    docs = repo / 'docs'
+    git(repo, 'mv', 'docs/guide.md', 'docs/setup.md')
+    git(repo, 'rm', '-q', 'docs/other.md')
+    (docs / 'new.md').write_text('# New\n', encoding='utf-8')
+    git(repo, 'add', 'docs/new.md')
+
+    changes = staged_changes(repo, docs)
+    assert sorted(changes.changed) == [docs / 'new.md', docs / 'setup.md']
+    assert sorted(changes.removed) == [docs / 'guide.md', docs / 'other.md']
+
+
+def test_read_staged_ignores_the_working_tree(repo):
+    docs = repo / 'docs'
+    (docs / 'guide.md').write_text('# Staged\n', encoding='utf-8')
+    git(repo, 'add', 'docs/guide.md')
+    (docs / 'guide.md').write_text('# Unstaged\n', encoding='utf-8')
+
+    contents = read_staged(repo, [docs / 'guide.md', docs / 'absent.md'])
+    assert contents == {docs / 'guide.md': '# Staged\n'}
+
+
+def test_staged_corpus_checks_pages_linking_to_removed_files(repo):
+    docs = repo / 'docs'
+    git(repo, 'mv', 'docs/guide.md', 'docs/setup.md')
+
+    corpus, paths = staged_corpus(docs)
+    assert sorted(paths) == [docs / 'index.md', docs / 'setup.md']
+    issues = scan_documentation_issues(docs, corpus=corpus, paths=paths)
+    assert issues.details(MISSING) == {docs / 'index.md': ['guide.md']}
+
+
+def test_nothing_staged_checks_nothing(repo):
+    corpus, paths = staged_corpus(repo / 'docs')
+    assert paths == []
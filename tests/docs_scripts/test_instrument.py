@@ -0,0 +1,77 @@
+import json
+import sys
+from collections import Counter
+
+import pytest
+
+from docs.scripts.instrument import STATS, count, format_stats, phase, session
+
+
+@pytest.fixture(autouse=True)
+def stats(monkeypatch):
+    monkeypatch.setattr(STATS, 'enabled', False)
+    monkeypatch.setattr(STATS, 'tracing', False)
+    monkeypatch.setattr(STATS, 'counters', Counter())
+    monkeypatch.setattr(STATS, 'phases', {})
+    monkeypatch.setattr(STATS, 'events', [])
+    return STATS
+
+
+def test_nothing_is_recorded_outside_a_session(stats):
+    with phase('walk'):
+        count('files_read', 2)
+    assert stats.phases == {}
+    assert stats.counters == {}
+
+
+def test_stats_are_printed_to_stderr_on_exit(stats, capsys):
+    with pytest.raises(SystemExit):
+        with session(stats=True):
+            for _ in range(3):
+                with phase('read'):
+                    count('files_read')
+            sys.exit(1)
+    assert stats.phases['read'][0] == 3
+    assert not stats.enabled
+    err = capsys.readouterr().err
+    assert err.splitlines()[1].split() == ['phase', 'calls', 'total', '(ms)']
+    assert 'files_read' in err and err.rstrip().endswith('3')
+
+
+def test_format_stats_lists_the_slowest_phase_first(stats):
+    stats.phases.update({'fast': [1, 0.001], 'slow': [2, 0.5]})
+    lines = format_stats(stats).splitlines()
+    assert lines[1].split() == ['slow', '2', '500.0']
+    assert lines[2].split()[0] == 'fast'
+
+
+def test_trace_holds_phase_events_and_counters(stats, tmp_path):
+    trace = tmp_path / 'trace.json'
+    with session(trace=str(trace)):
+        with phase('scan'):
+            with phase('tokenize'):
+                count('files_read')
+    document = json.loads(trace.read_text(encoding='utf-8'))
+    events = document['traceEvents']
+    assert [event['name'] for event in events] == ['tokenize', 'scan', 'counters']
+    tokenize, scan, counters = events
+    assert scan['ts'] <= tokenize['ts'] and tokenize['dur'] <= scan['dur']
+    assert counters == dict(counters, ph='C', args={'files_read': 1})
+    assert not stats.enabled and not stats.tracing
+
+
+def test_inner_session_leaves_recording_to_the_outer_one(stats, capsys):
+    with session(stats=True):
+        with session(stats=True):
+            count('files_read')
+        assert stats.enabled
+        assert capsys.readouterr().err == ''
+    assert 'files_read' in capsys.readouterr().err
+
+
+def test_profile_is_written(tmp_path):
+    import pstats
+    profile = tmp_path / 'run.prof'
+    with session(profile=str(profile)):
+        sorted(range(1000), key=lambda n: -n)
+    assert pstats.Stats(str(profile)).total_calls > 0
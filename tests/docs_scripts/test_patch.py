@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+from docs.scripts.batch import apply_batch
+from docs.scripts.patch import Edit, OverlappingEditError, StaleEditError, apply_edits
+from docs.scripts.rules import ANCHORS, LINKS
+from docs.scripts.serve_docs import apply_documentation_fixes, scan_documentation_issues
+
+
+def edit(content, old, new, occurrence=0):
+    start = -1
+    for _ in range(occurrence + 1):
+        start = content.index(old, start + 1)
+    return Edit(old, new, start, start + len(old))
+
+
+def test_edits_are_applied_at_their_offsets():
+    content = 'a.md and a.md and a.md'
+    edits = [edit(content, 'a.md', 'b.md', 1), edit(content, 'and', '&', 1)]
+    assert apply_edits(content, edits) == 'a.md and b.md & a.md'
+
+
+def test_duplicate_edits_are_applied_once():
+    content = 'see a.md'
+    change = edit(content, 'a.md', 'b.md')
+    assert apply_edits(content, [change, change]) == 'see b.md'
+
+
+def test_stale_edit_is_rejected():
+    with pytest.raises(StaleEditError):
+        apply_edits('see c.md', [Edit('a.md', 'b.md', 4, 8)])
+
+
+def test_partial_overlap_is_rejected():
+    content = 'abcdef'
+    with pytest.raises(OverlappingEditError):
+        apply_edits(content, [edit(content, 'abcd', 'ABCD'), edit(content, 'cdef', 'CDEF')])
+
+
+def test_edit_within_another_is_applied_to_its_replacement():
+    content = '## See [guide](../guide.md) and [faq](../faq.md)\n'
+    header = content.rstrip('\n')
+    edits = [edit(content, header, header + ' {: #see-guide }'),
+             edit(content, '](../guide.md)', '](guide.md)'),
+             edit(content, '](../faq.md)', '](faq.md)')]
+    assert apply_edits(content, edits) == '## See [guide](guide.md) and [faq](faq.md) {: #see-guide }\n'
+
+
+def test_edit_within_a_rewritten_span_is_rejected():
+    content = '## Old title\n'
+    edits = [edit(content, '## Old title', '## New title'), edit(content, 'Old', 'Older')]
+    with pytest.raises(OverlappingEditError):
+        apply_edits(content, edits)
+
+
+def test_header_with_link_and_anchor_fixes(tmp_path):
+    docs = tmp_path / 'docs'
+    (docs / 'sub').mkdir(parents=True)
+    page = docs / 'sub' / 'page.md'
+    page.write_text('# Title {: #title }\n\n## See [guide](../guide.md)\n', encoding='utf-8')
+    (docs / 'sub' / 'guide.md').write_text('# Guide {: #guide }\n', encoding='utf-8')
+
+    issues = scan_documentation_issues(docs)
+    assert issues.edits(LINKS)[page] and issues.edits(ANCHORS)[page]
+    manifest = apply_documentation_fixes(docs, issues, {'links', 'anchors'})
+    assert [entry['status'] for entry in manifest.files] == ['updated']
+    assert page.read_text(encoding='utf-8') == '# Title {: #title }\n\n## See [guide](guide.md) {: #see-guide}\n'
+
+
+def test_batch_records_every_file(tmp_path):
+    docs = tmp_path / 'docs'
+    docs.mkdir()
+    good = docs / 'good.md'
+    good.write_text('see a.md\n', encoding='utf-8')
+    stale = docs / 'stale.md'
+    stale.write_text('see c.md\n', encoding='utf-8')
+
+    manifest = apply_batch(docs, {good: {'links': [Edit('a.md', 'b.md', 4, 8)]},
+                                  stale: {'links': [Edit('a.md', 'b.md', 4, 8)]}}, dry_run=True)
+    assert [(entry['path'], entry['status']) for entry in manifest.files] == [('good.md', 'would-update'),
+                                                                             ('stale.md', 'error')]
+    assert good.read_text(encoding='utf-8') == 'see a.md\n'
+    assert json.loads(json.dumps(manifest.to_dict()))['summary']['errors'] == 1
@@ -0,0 +1,72 @@
+import os
+from collections import Counter
+
+from docs.scripts.corpus import DocCorpus
+from docs.scripts.instrument import STATS
+from docs.scripts.path_index import PathIndex
+
+
+def write(path, content=''):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content, encoding='utf-8')
+    return path
+
+
+def test_walk_indexes_files_and_directories(tmp_path):
+    write(tmp_path / 'docs' / 'guide' / 'setup.md')
+    write(tmp_path / 'docs' / 'index.md')
+    index = PathIndex(tmp_path / 'docs')
+    root = str(tmp_path / 'docs')
+    assert sorted(os.path.relpath(path, root) for path in index) == ['.', 'guide', 'guide/setup.md', 'index.md']
+
+
+def test_resolve_normalizes_without_touching_the_filesystem(tmp_path):
+    index = PathIndex(tmp_path)
+    source = tmp_path / 'guide'
+    assert index.resolve('../img/./logo.png', source) == str(tmp_path / 'img' / 'logo.png')
+    assert index.resolve('setup.md', source) == str(source / 'setup.md')
+
+
+def test_exists_inside_and_outside_the_root(tmp_path, monkeypatch):
+    docs = tmp_path / 'docs'
+    write(docs / 'index.md')
+    outside = write(tmp_path / 'README.md')
+    index = PathIndex(docs)
+    assert index.exists(str(docs / 'index.md'))
+    assert not index.exists(str(docs / 'gone.md'))
+
+    monkeypatch.setattr(STATS, 'enabled', True)
+    monkeypatch.setattr(STATS, 'counters', Counter())
+    assert index.exists(str(outside))
+    assert index.exists(str(outside))
+    assert STATS.counters['stat_calls'] == 1
+
+
+def test_add_and_discard_keep_the_index_current(tmp_path):
+    docs = tmp_path / 'docs'
+    docs.mkdir()
+    index = PathIndex(docs)
+    index.add(str(docs / 'new' / 'deep' / 'page.md'))
+    assert index.exists(str(docs / 'new' / 'deep'))
+    assert index.exists(str(docs / 'new' / 'deep' / 'page.md'))
+
+    index.discard(str(docs / 'new'))
+    assert not index.exists(str(docs / 'new' / 'deep' / 'page.md'))
+    assert index.exists(str(docs))
+
+
+def test_index_of_given_paths_does_not_walk(tmp_path):
+    docs = tmp_path / 'docs'
+    write(docs / 'on-disk.md')
+    index = PathIndex(docs, [str(docs / 'staged' / 'page.md')])
+    assert index.exists(str(docs / 'staged'))
+    assert not index.exists(str(docs / 'on-disk.md'))
+
+
+def test_missing_links_use_the_index(tmp_path):
+    docs = tmp_path / 'docs'
+    page = write(docs / 'guide' / 'page.md', '[up](../index.md) [gone](gone.md) [img](../img/logo.png)\n')
+    write(docs / 'index.md', '# Home\n')
+    write(docs / 'img' / 'logo.png')
+    corpus = DocCorpus.load(docs)
+    assert corpus.missing_links(corpus.files[page]) == ['gone.md']
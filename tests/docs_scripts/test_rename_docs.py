@@ -0,0 +1,154 @@
+import json
+import os
+
+import pytest
+
+from scripts.rename_docs import (JOURNAL_NAME, RenameJournal, apply_updates, plan_renames, plan_updates,
+                                 rename_files)
+
+
+def write(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content, encoding='utf-8')
+    return path
+
+
+def read(path):
+    return path.read_text(encoding='utf-8')
+
+
+@pytest.fixture
+def docs(tmp_path):
+    docs = tmp_path / 'docs'
+    write(docs / 'index.md', '# Home\n\nSee [setup](Getting_Started.md#install) and [api](guides/ApiGuide.md).\n')
+    write(docs / 'Getting_Started.md', '# Start\n\nThen read [the api](guides/ApiGuide.md).\n')
+    write(docs / 'guides' / 'ApiGuide.md', '# API\n\nBack to [start](../Getting_Started.md).\n')
+    return docs
+
+
+def test_plan_renames_and_collisions(docs):
+    write(docs / 'getting_started.md', '# Clash\n')
+    renames, collisions = plan_renames(str(docs))
+    assert renames == {str(docs / 'guides' / 'ApiGuide.md'): str(docs / 'guides' / 'api-guide.md')}
+    assert sorted(os.path.basename(path) for path in collisions) == ['Getting_Started.md', 'getting_started.md']
+
+
+def test_plan_updates_edit_links_to_renamed_files(docs):
+    renames, _ = plan_renames(str(docs))
+    updates = plan_updates(str(docs), renames)
+    assert [edit.new for _, edit in updates[str(docs / 'index.md')]] == ['getting-started.md#install',
+                                                                         'guides/api-guide.md']
+
+
+def test_rename_updates_links_and_removes_the_journal(docs):
+    rename_files(str(docs))
+    assert sorted(path.relative_to(docs).as_posix() for path in docs.rglob('*.md')) == [
+        'getting-started.md', 'guides/api-guide.md', 'index.md']
+    assert read(docs / 'index.md') == ('# Home\n\nSee [setup](getting-started.md#install) and '
+                                       '[api](guides/api-guide.md).\n')
+    assert read(docs / 'getting-started.md') == '# Start\n\nThen read [the api](guides/api-guide.md).\n'
+    assert read(docs / 'guides' / 'api-guide.md') == '# API\n\nBack to [start](../getting-started.md).\n'
+    assert not (docs / JOURNAL_NAME).exists()
+
+
+def test_resume_updates_links_in_files_left_under_temporary_names(docs):
+    renames, _ = plan_renames(str(docs))
+    journal = RenameJournal(str(docs / JOURNAL_NAME))
+    entries = journal.start(str(docs), renames)
+    # The run was interrupted between its two phases
+    for entry in entries:
+        os.rename(entry['old'], entry['temp'])
+
+    rename_files(str(docs))
+    assert read(docs / 'getting-started.md') == '# Start\n\nThen read [the api](guides/api-guide.md).\n'
+    assert read(docs / 'guides' / 'api-guide.md') == '# API\n\nBack to [start](../getting-started.md).\n'
+    assert read(docs / 'index.md').count('getting-started.md#install') == 1
+    assert not journal.exists()
+
+
+def test_resume_after_some_files_reached_their_new_names(docs):
+    renames, _ = plan_renames(str(docs))
+    journal = RenameJournal(str(docs / JOURNAL_NAME))
+    first, second = journal.start(str(docs), renames)
+    os.rename(first['old'], first['new'])
+    os.rename(second['old'], second['temp'])
+
+    rename_files(str(docs))
+    assert read(docs / 'getting-started.md') == '# Start\n\nThen read [the api](guides/api-guide.md).\n'
+    assert read(docs / 'guides' / 'api-guide.md') == '# API\n\nBack to [start](../getting-started.md).\n'
+    assert not journal.exists()
+
+
+def test_rollback_restores_names_and_links(docs):
+    original = {path: read(path) for path in docs.rglob('*.md')}
+    renames, _ = plan_renames(str(docs))
+    rename_files(str(docs))
+
+    # The journal of a run is removed once it succeeded; write it back to undo it
+    RenameJournal(str(docs / JOURNAL_NAME)).start(str(docs), renames)
+    rename_files(str(docs), rollback=True)
+    assert {path: read(path) for path in docs.rglob('*.md')} == original
+
+
+def test_every_local_link_style_is_planned(docs):
+    page = write(docs / 'styles.md', '[a](<Getting_Started.md>) [b][ref] <a href="guides/ApiGuide.md#auth">c</a>\n'
+                                     '[d](https://example.com/Getting_Started.md) `[e](Getting_Started.md)`\n\n'
+                                     '[ref]: Getting_Started.md#top\n')
+    renames, _ = plan_renames(str(docs))
+    edits = [edit for _, edit in plan_updates(str(docs), renames)[str(page)]]
+    assert [(edit.old, edit.new) for edit in edits] == [
+        ('<Getting_Started.md>', '<getting-started.md>'),
+        ('guides/ApiGuide.md#auth', 'guides/api-guide.md#auth'),
+        ('Getting_Started.md#top', 'getting-started.md#top'),
+    ]
+
+
+def test_root_relative_links_resolve_against_docs_dir(docs):
+    page = write(docs / 'guides' / 'root.md',
+                 '[a](/Getting_Started.md#top) [b](/guides/ApiGuide.md) [c](//cdn/ApiGuide.md)\n')
+    renames, _ = plan_renames(str(docs))
+    edits = [edit for _, edit in plan_updates(str(docs), renames)[str(page)]]
+    assert [(edit.old, edit.new) for edit in edits] == [('/Getting_Started.md#top', '/getting-started.md#top'),
+                                                        ('/guides/ApiGuide.md', '/guides/api-guide.md')]
+
+    config = write(docs.parent / 'mkdocs.yml', 'site_name: Test\ndocs_dir: docs\n')
+    rename_files(str(docs.parent), config_file=str(config))
+    assert read(page) == '[a](/getting-started.md#top) [b](/guides/api-guide.md) [c](//cdn/ApiGuide.md)\n'
+
+
+def test_nav_entries_are_planned(docs):
+    config = write(docs.parent / 'mkdocs.yml', 'site_name: Test\ndocs_dir: docs\nnav:\n  - Home: index.md\n'
+                                               '  - Start: Getting_Started.md\n  - Guides:\n'
+                                               '      - guides/ApiGuide.md\ntheme: Getting_Started.md\n')
+    renames, _ = plan_renames(str(docs))
+    edits = [edit for _, edit in plan_updates(str(docs), renames, str(config))[str(config)]]
+    assert [(edit.old, edit.new) for edit in edits] == [('Getting_Started.md', 'getting-started.md'),
+                                                        ('guides/ApiGuide.md', 'guides/api-guide.md')]
+    rename_files(str(docs), config_file=str(config))
+    assert read(config) == ('site_name: Test\ndocs_dir: docs\nnav:\n  - Home: index.md\n'
+                            '  - Start: getting-started.md\n  - Guides:\n      - guides/api-guide.md\n'
+                            'theme: Getting_Started.md\n')
+
+
+def test_dry_run_prints_the_plan_and_changes_nothing(docs, capsys):
+    before = {path: read(path) for path in docs.rglob('*.md')}
+    rename_files(str(docs), dry_run=True)
+    plan = json.loads(capsys.readouterr().out)
+    assert plan['renames'] == [{'old': 'Getting_Started.md', 'new': 'getting-started.md'},
+                               {'old': 'guides/ApiGuide.md', 'new': 'guides/api-guide.md'}]
+    assert plan['summary'] == {'renames': 2, 'collisions': 0, 'links': 4}
+    assert {path: read(path) for path in docs.rglob('*.md')} == before
+    assert not (docs / JOURNAL_NAME).exists()
+
+
+def test_links_to_a_file_that_failed_to_move_are_kept(docs):
+    renames, _ = plan_renames(str(docs))
+    updates = plan_updates(str(docs), renames)
+    moved = {old: new for old, new in renames.items() if old.endswith('ApiGuide.md')}
+    os.rename(*next(iter(moved.items())))
+    errors = []
+    apply_updates(str(docs), updates, moved, errors)
+    assert errors == []
+    assert read(docs / 'index.md') == ('# Home\n\nSee [setup](Getting_Started.md#install) and '
+                                       '[api](guides/api-guide.md).\n')
+    assert read(docs / 'guides' / 'api-guide.md') == '# API\n\nBack to [start](../Getting_Started.md).\n'
@@ -0,0 +1,126 @@
+from pathlib import Path
+
+import pytest
+
+from docs.scripts.cache import DocCache
+from docs.scripts.corpus import DocCorpus
+from docs.scripts.rules import (ANCHORS, BREAKING, FRAGMENTS, LINKS, MISSING, IssueReport, Rule, RuleEngine,
+                                create_rules, format_issue)
+from docs.scripts.serve_docs import scan_documentation_issues
+
+
+class CountingRule(Rule):
+    """Reports every header and counts the tokens it is shown"""
+    name = 'counting'
+    label = "headers"
+    kinds = ('header', 'link')
+
+    def __init__(self):
+        self.visits = 0
+        self.files = 0
+
+    def begin(self, context):
+        self.files += 1
+
+    def visit_header(self, token, context):
+        self.visits += 1
+        context.report(self.name, token.text, token.start)
+
+    def visit_link(self, token, context):
+        self.visits += 1
+
+
+def write(path: Path, content: str) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content, encoding='utf-8')
+    return path
+
+
+@pytest.fixture
+def docs(tmp_path):
+    docs = tmp_path / 'docs'
+    write(docs / 'index.md', '# Home {: #home }\n\nSee [guide](guide.md#setup), [gone](gone.md) '
+                             'and [nowhere](guide.md#nowhere).\n')
+    write(docs / 'guide.md', '# Guide {: #guide }\n\n## Setup {: #setup }\n\n## Plain\n')
+    return docs
+
+
+def test_default_rules_report_existing_checks(docs):
+    issues = scan_documentation_issues(docs)
+    index = docs / 'index.md'
+    guide = docs / 'guide.md'
+    assert issues.details(MISSING) == {index: ['gone.md']}
+    assert issues.details(FRAGMENTS) == {index: ['guide.md#nowhere']}
+    assert [edit.old.strip() for edit in issues.edits(ANCHORS)[guide]] == ['## Plain']
+    assert LINKS not in issues.rules
+    assert BREAKING not in issues.rules
+
+
+def test_ported_rules_visit_tokens_and_report_positions(docs):
+    write(docs / 'sub' / 'page.md', '# Page {: #page }\n\n![self](./page.md)\n')
+    issues = scan_documentation_issues(docs)
+    index = docs / 'index.md'
+    assert [format_issue(issue) for issue in issues.files(MISSING)[index]] == ['3:30: gone.md']
+    assert [format_issue(issue) for issue in issues.files(FRAGMENTS)[index]] == ['3:50: guide.md#nowhere']
+    assert [format_issue(issue) for issue in issues.files(ANCHORS)[docs / 'guide.md']] == ['5:1: ## Plain']
+    assert [format_issue(issue) for issue in issues.files(LINKS)[docs / 'sub' / 'page.md']] == [
+        '3:7: ](./page.md) -> ](page.md)']
+
+
+def test_default_rules_read_nothing_on_a_cached_run(docs, tmp_path):
+    cache_path = tmp_path / 'doc-checks.json'
+    first = scan_documentation_issues(docs, cache=DocCache(cache_path))
+    corpus = DocCorpus.load(docs, cache=DocCache(cache_path))
+    second = scan_documentation_issues(docs, corpus=corpus)
+    assert all(doc._content is None for doc in corpus)
+    assert second.rules == first.rules
+
+
+def test_ignored_rules_do_not_run(docs):
+    issues = scan_documentation_issues(docs, rules=create_rules(docs, ignore=[MISSING, ANCHORS]))
+    assert MISSING not in issues.rules
+    assert ANCHORS not in issues.rules
+    assert FRAGMENTS in issues.rules
+
+
+def test_create_rules_rejects_unknown_names(docs):
+    with pytest.raises(ValueError):
+        create_rules(docs, select=['no-such-rule'])
+
+
+def test_token_rules_share_one_pass_and_report_positions(docs):
+    rule = CountingRule()
+    issues = scan_documentation_issues(docs, rules=[rule])
+    # 4 headers and 3 links in index.md and guide.md, each shown once
+    assert rule.files == 2
+    assert rule.visits == 7
+    found = issues.files('counting')[docs / 'guide.md']
+    assert [format_issue(issue) for issue in found] == ['1:1: Guide {: #guide }', '3:1: Setup {: #setup }',
+                                                        '5:1: Plain']
+
+
+def test_token_rule_results_are_cached(docs, tmp_path):
+    cache_path = tmp_path / 'doc-checks.json'
+    cache = DocCache(cache_path)
+    first = scan_documentation_issues(docs, cache=cache, rules=[CountingRule()])
+
+    rule = CountingRule()
+    corpus = DocCorpus.load(docs, cache=DocCache(cache_path))
+    second = scan_documentation_issues(docs, corpus=corpus, rules=[rule])
+    assert rule.files == 0
+    assert all(doc._content is None for doc in corpus)
+    assert second.files('counting') == first.files('counting')
+
+
+def test_engine_dispatches_by_token_kind(docs):
+    rule = CountingRule()
+    engine = RuleEngine([rule, *create_rules(docs, ignore=[LINKS, ANCHORS, MISSING, FRAGMENTS])])
+    assert engine.token_rules == [rule]
+    assert engine.dispatch.keys() == {'header', 'link'}
+
+
+def test_issue_report_groups_by_rule_and_file(docs):
+    issues = scan_documentation_issues(docs)
+    assert issues
+    assert issues.count(MISSING) == 1
+    assert not IssueReport()
@@ -0,0 +1,111 @@
+import json
+import random
+import re
+
+import pytest
+
+from docs.scripts.cache import DocCache
+from docs.scripts.corpus import DocCorpus
+from docs.scripts.rules import create_rules, format_issue
+from docs.scripts.serve_docs import scan_documentation_issues
+from docs.scripts.terminology import TermAutomaton, TerminologyRule, check_terminology
+
+DICTIONARY = {
+    'terms': {'Phoenix VC': ['PhoenixVC', 'Phoenix-VC']},
+    'banned': {'click here': 'Describe where the link goes instead', 'simply': ''},
+}
+
+
+@pytest.fixture
+def docs(tmp_path):
+    docs = tmp_path / 'src'
+    docs.mkdir()
+    (tmp_path / 'terminology.json').write_text(json.dumps(DICTIONARY), encoding='utf-8')
+    return docs
+
+
+def messages(tmp_path, content):
+    page = tmp_path / 'page.md'
+    page.write_text(content, encoding='utf-8')
+    report = check_terminology([page], TerminologyRule(tmp_path / 'terminology.json'))
+    return [format_issue(issue) for issue in report.files('terminology').get(page, [])]
+
+
+def test_automaton_matches_like_brute_force():
+    rng = random.Random(3)
+    for _ in range(300):
+        phrases = sorted({''.join(rng.choice('ab') for _ in range(rng.randint(1, 4))) for _ in range(6)})
+        text = ''.join(rng.choice('abc') for _ in range(60))
+        expected = sorted((match.start(), match.start() + len(phrase), index)
+                          for index, phrase in enumerate(phrases)
+                          for match in re.finditer(f'(?={phrase})', text))
+        assert sorted(TermAutomaton(phrases).search(text)) == expected
+
+
+def test_variants_preferred_case_and_banned_phrases(docs):
+    found = messages(docs.parent, '# PhoenixVC\n\nWe are phoenix vc. Simply click here.\n')
+    assert found == [
+        "1:3: 'PhoenixVC' should be 'Phoenix VC'",
+        "3:8: 'phoenix vc' should be 'Phoenix VC'",
+        "3:20: 'Simply' is a banned phrase",
+        "3:27: 'click here': Describe where the link goes instead",
+    ]
+
+
+def test_preferred_spelling_and_other_case_variants_pass(docs):
+    assert messages(docs.parent, 'Phoenix VC and phoenixvc.com\n') == []
+
+
+def test_whole_words_only(docs):
+    assert messages(docs.parent, 'simplyfy and PhoenixVCs\n') == []
+
+
+def test_code_and_link_destinations_are_skipped(docs):
+    content = ('```\nPhoenixVC\n```\n\n'
+               'Use `PhoenixVC` or [the site](https://example.com/PhoenixVC).\n'
+               '[PhoenixVC](page.md)\n')
+    assert messages(docs.parent, content) == ["6:2: 'PhoenixVC' should be 'Phoenix VC'"]
+
+
+def test_comments_and_front_matter_are_skipped(docs):
+    content = ('---\ntitle: PhoenixVC\n---\n'
+               '<!-- PhoenixVC\nsimply -->\n'
+               'PhoenixVC <!-- click here -->\n')
+    assert messages(docs.parent, content) == ["6:1: 'PhoenixVC' should be 'Phoenix VC'"]
+
+
+def test_rule_is_opt_in(docs):
+    (docs / 'index.md').write_text('# Home {: #home }\n\nPhoenixVC\n', encoding='utf-8')
+    assert 'terminology' not in scan_documentation_issues(docs).rules
+    issues = scan_documentation_issues(docs, rules=create_rules(docs, select=['terminology']))
+    assert issues.count('terminology') == 1
+
+
+def test_dictionary_is_found_from_the_docs_directory(docs, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path.parent)
+    rule = TerminologyRule.create(docs)
+    assert rule.terms
+    assert rule.kinds
+
+
+def test_missing_dictionary_reads_nothing(tmp_path):
+    rule = TerminologyRule.create(tmp_path / 'src')
+    assert not rule.terms
+    assert rule.kinds == ()
+
+
+def test_changed_dictionary_invalidates_cached_results(docs, tmp_path):
+    (docs / 'index.md').write_text('# Home {: #home }\n\nPhoenixVC and Pheonix\n', encoding='utf-8')
+    cache_path = tmp_path / 'doc-checks.json'
+    select = create_rules(docs, select=['terminology'])
+    first = scan_documentation_issues(docs, cache=DocCache(cache_path), rules=select)
+    assert first.count('terminology') == 1
+
+    DICTIONARY['banned']['pheonix'] = 'Misspelling'
+    try:
+        (tmp_path / 'terminology.json').write_text(json.dumps(DICTIONARY), encoding='utf-8')
+        corpus = DocCorpus.load(docs, cache=DocCache(cache_path))
+        second = scan_documentation_issues(docs, corpus=corpus, rules=create_rules(docs, select=['terminology']))
+    finally:
+        del DICTIONARY['banned']['pheonix']
+    assert second.count('terminology') == 2
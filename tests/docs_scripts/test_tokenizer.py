@@ -0,0 +1,83 @@
+from docs.scripts.tokenizer import (AnchorToken, CodeToken, FrontMatterToken, HeaderToken, anchor_tokens,
+                                    header_tokens, link_tokens, tokenize)
+
+
+def links(content):
+    return [(token.kind, token.style, token.text, token.target) for token in link_tokens(tokenize(content))]
+
+
+def test_inline_links_and_images():
+    content = 'See [the guide](guide.md "Guide") and ![logo](<img/logo one.png>).\n'
+    assert links(content) == [('link', 'inline', 'the guide', 'guide.md'),
+                              ('image', 'inline', 'logo', 'img/logo one.png')]
+    guide = link_tokens(tokenize(content))[0]
+    assert guide.title == 'Guide'
+    assert content[guide.start:guide.end] == '[the guide](guide.md "Guide")'
+    assert content[guide.target_start:guide.target_end] == 'guide.md'
+
+
+def test_nested_brackets_in_link_text():
+    assert links('[a [nested] text](page.md)\n') == [('link', 'inline', 'a [nested] text', 'page.md')]
+
+
+def test_reference_links_resolve_against_definitions():
+    content = 'Read [the guide][Guide Ref] or [faq][].\n\n[guide  ref]: guide.md\n[FAQ]: <faq.md> "FAQ"\n'
+    assert links(content) == [('link', 'reference', 'the guide', 'guide.md'),
+                              ('link', 'reference', 'faq', 'faq.md'),
+                              ('link', 'definition', 'guide  ref', 'guide.md'),
+                              ('link', 'definition', 'FAQ', 'faq.md')]
+
+
+def test_code_and_comments_produce_no_tokens():
+    content = ('```python\n# not a header\n[x](fenced.md)\n```\n\n'
+               '    ~~~\n    [y](tilde.md)\n    ~~~\n\n'
+               'Inline `[z](span.md)` and ``a ` [w](double.md)``.\n\n'
+               '<!-- [v](comment.md)\n# hidden -->\n'
+               '[kept](kept.md)\n')
+    tokens = tokenize(content)
+    assert links(content) == [('link', 'inline', 'kept', 'kept.md')]
+    assert header_tokens(tokens) == []
+    assert [token.info for token in tokens if isinstance(token, CodeToken)] == ['python', '']
+
+
+def test_unclosed_fence_runs_to_the_end():
+    tokens = tokenize('# Title\n\n```\n[x](a.md)\n')
+    assert isinstance(tokens[-1], CodeToken)
+    assert tokens[-1].end == len('# Title\n\n```\n[x](a.md)\n')
+    assert link_tokens(tokens) == []
+
+
+def test_headers_and_inline_tokens_within_them():
+    content = '# Title {: #title }\n\n## See [guide](guide.md)\n####### seven\n#nospace\n'
+    tokens = tokenize(content)
+    assert header_tokens(tokens) == [HeaderToken(1, 'Title {: #title }', 0, 19),
+                                     HeaderToken(2, 'See [guide](guide.md)', 21, 45)]
+    assert anchor_tokens(tokens) == [AnchorToken('title', 8, 19)]
+    assert links(content) == [('link', 'inline', 'guide', 'guide.md')]
+
+
+def test_html_links_and_anchors():
+    content = '<a href="page.md#top" id="back">back</a> <img src=\'logo.png\'> <span name="here"></span>\n'
+    assert links(content) == [('link', 'html', '', 'page.md#top'), ('image', 'html', '', 'logo.png')]
+    assert [token.id for token in anchor_tokens(tokenize(content))] == ['back', 'here']
+
+
+def test_autolinks():
+    assert links('<https://example.com/a> and <mailto:team@example.com>\n') == [
+        ('link', 'autolink', 'https://example.com/a', 'https://example.com/a'),
+        ('link', 'autolink', 'mailto:team@example.com', 'mailto:team@example.com')]
+
+
+def test_front_matter():
+    content = '---\ntitle: "[not](a-link.md)"\n---\n# Page\n'
+    tokens = tokenize(content)
+    assert tokens[0] == FrontMatterToken('title: "[not](a-link.md)"\n', 0, 33)
+    assert link_tokens(tokens) == []
+    assert header_tokens(tokens)[0].text == 'Page'
+
+
+def test_offsets_survive_crlf_and_non_ascii():
+    content = '# Café\r\n\r\nSee [naïve](naïve.md).\r\n'
+    token = link_tokens(tokenize(content))[0]
+    assert content[token.target_start:token.target_end] == 'naïve.md'
+    assert header_tokens(tokenize(content))[0].text == 'Café'
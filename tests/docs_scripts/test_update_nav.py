@@ -0,0 +1,121 @@
+import os
+
+import yaml
+
+from docs.scripts.instrument import session
+from docs.scripts.update_nav import (NavMetaCache, PageMeta, build_nav, format_nav, load_block, read_page_meta,
+                                     replace_nav, update_mkdocs_nav)
+
+CONFIG = ('site_name: Test  # keep this comment\n'
+          'docs_dir: src\n\n'
+          'nav:\n'
+          '  - Old: old.md\n'
+          '\n# Theme settings\n'
+          'theme:\n'
+          '  name: !!python/name:material.Theme\n')
+
+
+def test_read_page_meta_front_matter(tmp_path):
+    page = tmp_path / 'page.md'
+    page.write_text('---\ntitle: Getting Started\nweight: 2\n---\n\n# Ignored\n', encoding='utf-8')
+    assert read_page_meta(page) == PageMeta('Getting Started', 2)
+
+
+def test_read_page_meta_first_h1_outside_code(tmp_path):
+    page = tmp_path / 'page.md'
+    page.write_text('Intro\n\n```\n# Not a title\n```\n\n# Real Title {: #real }\n', encoding='utf-8')
+    assert read_page_meta(page) == PageMeta('Real Title', None)
+
+
+def test_read_page_meta_stops_after_header_lines(tmp_path):
+    page = tmp_path / 'page.md'
+    page.write_text('text\n' * 60 + '# Too Late\n', encoding='utf-8')
+    assert read_page_meta(page) == PageMeta(None, None)
+
+
+def test_read_page_meta_while_recording_stats(tmp_path):
+    page = tmp_path / 'page.md'
+    page.write_text('# Title\n', encoding='utf-8')
+    with session(stats=False, trace=str(tmp_path / 'trace.json')):
+        assert read_page_meta(page).title == 'Title'
+
+
+def test_build_nav_orders_by_weight_then_title(tmp_path):
+    (tmp_path / 'index.md').write_text('# Home\n', encoding='utf-8')
+    (tmp_path / 'b.md').write_text('# Beta\n', encoding='utf-8')
+    (tmp_path / 'a.md').write_text('---\nweight: 5\n---\n# Zulu\n', encoding='utf-8')
+    guide = tmp_path / 'guide'
+    guide.mkdir()
+    (guide / 'README.md').write_text('# Guide\n', encoding='utf-8')
+    (guide / 'setup.md').write_text('# Setup\n', encoding='utf-8')
+
+    nav = build_nav(tmp_path)
+
+    assert nav[0] == {'Home': 'index.md'}
+    assert nav[1] == {'Zulu': 'a.md'}
+    assert {'Guide': ['guide/README.md', {'Setup': 'guide/setup.md'}]} in nav
+    assert {'Beta': 'b.md'} in nav
+
+
+def test_build_nav_uses_cache(tmp_path):
+    docs = tmp_path / 'docs'
+    docs.mkdir()
+    (docs / 'page.md').write_text('# Page\n', encoding='utf-8')
+    cache_path = tmp_path / 'nav-meta.json'
+
+    first = build_nav(docs, NavMetaCache(cache_path))
+    assert cache_path.exists()
+    assert build_nav(docs, NavMetaCache(cache_path)) == first
+
+
+def test_build_nav_sees_changed_titles_through_the_cache(tmp_path):
+    docs = tmp_path / 'docs'
+    docs.mkdir()
+    page = docs / 'page.md'
+    page.write_text('# Page\n', encoding='utf-8')
+    cache_path = tmp_path / 'nav-meta.json'
+    build_nav(docs, NavMetaCache(cache_path))
+
+    page.write_text('# Renamed page\n', encoding='utf-8')
+    assert build_nav(docs, NavMetaCache(cache_path)) == [{'Renamed page': 'page.md'}]
+
+
+def test_format_nav_quotes_only_when_needed():
+    nav = [{'Home': 'index.md'}, {'Yes': 'yes.md'}, {'A: B': 'a.md'}, {'Guide': ['guide/index.md']}]
+    lines = format_nav(nav)
+    assert lines == ['  - Home: index.md\n', '  - "Yes": yes.md\n', '  - "A: B": a.md\n',
+                     '  - Guide:\n', '      - guide/index.md\n']
+    assert yaml.safe_load('nav:\n' + ''.join(lines))['nav'] == nav
+
+
+def test_replace_nav_keeps_the_rest_of_the_config_byte_for_byte():
+    updated = replace_nav(CONFIG, [{'Home': 'index.md'}])
+    assert updated == CONFIG.replace('  - Old: old.md\n', '  - Home: index.md\n')
+
+
+def test_replace_nav_replaces_an_unindented_nav():
+    config = 'nav:\n- Home: index.md\n# About\n- About: about.md\n\n# Theme settings\ntheme: material\n'
+    assert load_block(config, 'nav') == [{'Home': 'index.md'}, {'About': 'about.md'}]
+    updated = replace_nav(config, [{'Home': 'index.md'}])
+    assert updated == 'nav:\n  - Home: index.md\n\n# Theme settings\ntheme: material\n'
+
+
+def test_replace_nav_appends_a_missing_nav():
+    assert replace_nav('site_name: Test', [{'Home': 'index.md'}]) == 'site_name: Test\nnav:\n  - Home: index.md\n'
+
+
+def test_update_mkdocs_nav_writes_only_when_the_nav_changed(tmp_path):
+    config = tmp_path / 'mkdocs.yml'
+    config.write_text(CONFIG, encoding='utf-8')
+    docs = tmp_path / 'src'
+    docs.mkdir()
+    (docs / 'index.md').write_text('# Home\n', encoding='utf-8')
+
+    assert update_mkdocs_nav(config, docs, check=True)
+    assert config.read_text(encoding='utf-8') == CONFIG
+    assert update_mkdocs_nav(config, docs)
+    assert '  - Home: index.md\n' in config.read_text(encoding='utf-8')
+
+    os.utime(config, ns=(1, 1))
+    assert not update_mkdocs_nav(config, docs)
+    assert config.stat().st_mtime_ns == 1
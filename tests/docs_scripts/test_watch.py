@@ -0,0 +1,86 @@
+import os
+
+import pytest
+
+from docs.scripts.corpus import DocCorpus
+from docs.scripts.rules import FRAGMENTS, MISSING
+from docs.scripts.watch import IncrementalChecker, LinkGraph, PollingWatcher
+
+
+def write(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content, encoding='utf-8')
+    return path
+
+
+@pytest.fixture
+def docs(tmp_path):
+    docs = tmp_path / 'docs'
+    write(docs / 'index.md', '# Home {: #home }\n\n[Guide](guide.md#setup) and [new](new.md)\n')
+    write(docs / 'guide.md', '# Guide {: #guide }\n\n## Setup {: #setup }\n')
+    write(docs / 'other.md', '# Other {: #other }\n\n[Guide](guide.md)\n')
+    return docs
+
+
+def checked(result):
+    issues, docs, removed = result
+    return sorted(doc.path.name for doc in docs), issues
+
+
+def test_link_graph_tracks_sources_of_each_target():
+    graph = LinkGraph()
+    graph.update('a.md', {'/docs/b.md', '/docs/c.md'})
+    graph.update('d.md', {'/docs/b.md'})
+    assert graph.sources_of('/docs/b.md') == {'a.md', 'd.md'}
+    graph.update('a.md', {'/docs/c.md'})
+    assert graph.sources_of('/docs/b.md') == {'d.md'}
+    graph.remove('d.md')
+    assert graph.sources_of('/docs/b.md') == set()
+    assert 'd.md' not in graph.forward
+
+
+def test_created_file_rechecks_the_files_linking_to_it(docs):
+    checker = IncrementalChecker(DocCorpus.load(docs))
+    write(docs / 'new.md', '# New {: #new }\n')
+    names, issues = checked(checker.apply([str(docs / 'new.md')]))
+    assert names == ['index.md', 'new.md']
+    assert MISSING not in issues.rules
+
+
+def test_deleted_file_rechecks_the_files_linking_to_it(docs):
+    checker = IncrementalChecker(DocCorpus.load(docs))
+    os.remove(docs / 'guide.md')
+    issues, rechecked, removed = checker.apply([str(docs / 'guide.md')])
+    assert removed == [docs / 'guide.md']
+    assert sorted(doc.path.name for doc in rechecked) == ['index.md', 'other.md']
+    assert sorted(path.name for path in issues.details(MISSING)) == ['index.md', 'other.md']
+
+
+def test_changed_anchors_recheck_fragment_links(docs):
+    checker = IncrementalChecker(DocCorpus.load(docs))
+    write(docs / 'guide.md', '# Guide {: #guide }\n\n## Install {: #install }\n')
+    names, issues = checked(checker.apply([str(docs / 'guide.md')]))
+    assert names == ['guide.md', 'index.md', 'other.md']
+    assert issues.details(FRAGMENTS) == {docs / 'index.md': ['guide.md#setup']}
+
+
+def test_unchanged_anchors_recheck_only_the_file(docs):
+    checker = IncrementalChecker(DocCorpus.load(docs))
+    write(docs / 'guide.md', '# Guide {: #guide }\n\n## Setup {: #setup }\n\nMore text.\n')
+    names, _ = checked(checker.apply([str(docs / 'guide.md')]))
+    assert names == ['guide.md']
+
+
+def test_polling_watcher_reports_created_modified_and_deleted_paths(docs):
+    watcher = PollingWatcher(docs)
+    assert watcher.poll() == set()
+
+    page = write(docs / 'sub' / 'page.md', '# Page\n')
+    write(docs / 'guide.md', '# Guide, edited\n')
+    os.utime(docs / 'guide.md', ns=(1, 1))
+    os.remove(docs / 'other.md')
+    # Directory mtimes may not move within the filesystem's timestamp granularity
+    os.utime(docs, ns=(2, 2))
+
+    assert watcher.poll() == {str(docs / 'sub'), str(page), str(docs / 'guide.md'), str(docs / 'other.md')}
+    assert watcher.poll() == set()